@@ -2,20 +2,6 @@ import os
 import requests
 from dotenv import load_dotenv
 
-# Load your API key from .env
-load_dotenv()
-API_KEY = os.getenv("FR24_API_KEY")
-
-if not API_KEY:
-    raise ValueError("❌ FR24_API_KEY not found in .env file!")
-
-# Headers for authentication
-HEADERS = {
-    "Authorization": f"Bearer {API_KEY}",
-    "Accept": "application/json",
-    "Accept-Version": "v1"
-}
-
 # ✅ Live API endpoint
 BASE_URL = "https://fr24api.flightradar24.com/api/live/flight-positions/full"
 
@@ -25,9 +11,29 @@ params = {
     "limit": 100
 }
 
-print("Fetching live flights near SFO...")
 
-response = requests.get(BASE_URL, headers=HEADERS, params=params)
+def main():
+    # Load your API key from .env
+    load_dotenv()
+    api_key = os.getenv("FR24_API_KEY")
+
+    if not api_key:
+        raise ValueError("❌ FR24_API_KEY not found in .env file!")
+
+    # Headers for authentication
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Accept": "application/json",
+        "Accept-Version": "v1"
+    }
+
+    print("Fetching live flights near SFO...")
+
+    response = requests.get(BASE_URL, headers=headers, params=params)
+
+    print(f"Status: {response.status_code}")
+    print(response.text)
+
 
-print(f"Status: {response.status_code}")
-print(response.text)
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,12 @@
+import argparse
 import os
-import time
-import requests
 import pandas as pd
 from dotenv import load_dotenv
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+
+from fetcher import RateLimitedFetcher, FR24_RATE_PER_SEC
+from instrumentation import SIZE_BUCKETS, count, observe, timed
+from response_cache import ResponseCache
 
 load_dotenv()
 API_KEY = os.getenv("FR24_API_KEY")
@@ -15,44 +18,79 @@ HEADERS = {
 }
 
 url = "https://fr24api.flightradar24.com/api/historic/flight-positions/full"
+BOUNDS = "38.3,36.8,-123.2,-121.5"
 
-# Start around 2025-11-08 03:00 UTC (example, adjust for peak period)
-start_time = datetime(2025, 11, 8, 3, 0)
-records = []
-
-for i in range(60):  # every minute for an hour
-    target_time = start_time + timedelta(minutes=i)
-    timestamp_unix = int(target_time.timestamp())
-    print(f"⏱️ Fetching {target_time.isoformat()} ({timestamp_unix})...")
 
-    params = {
+def snapshot_params(target_time):
+    return {
         "airports": "inbound:KSFO",
-        "timestamp": timestamp_unix,
-        "bounds": "38.3,36.8,-123.2,-121.5",
+        "timestamp": int(target_time.timestamp()),
+        "bounds": BOUNDS,
     }
 
-    response = requests.get(url, headers=HEADERS, params=params)
-    if response.status_code == 200:
-        data = response.json()
-        flights = data.get("data", [])
-        print(f"✅ {len(flights)} flights at {target_time}")
-        for flight in flights:
-            records.append({
-                "timestamp": target_time.isoformat(),
-                "callsign": flight.get("callsign"),
-                "origin": flight.get("orig_icao"),
-                "altitude_ft": flight.get("alt"),
-                "speed_kt": flight.get("gspeed"),
-                "eta": flight.get("eta"),
-                "lat": flight.get("lat"),
-                "lon": flight.get("lon"),
-            })
-    else:
-        print(f"⚠️ Error {response.status_code}: {response.text}")
-
-    time.sleep(1)  # polite delay to avoid rate limits
-
-df = pd.DataFrame(records)
-filename = f"data/inbound_SFO_hour_{start_time.strftime('%Y%m%d_%H%M')}.csv"
-df.to_csv(filename, index=False)
-print(f"\n💾 Saved {len(df)} total records to {filename}")
+
+def snapshot_records(target_time, data):
+    """Flatten one historic flight-positions response into row dicts."""
+    records = []
+    for flight in data.get("data", []):
+        records.append({
+            "timestamp": target_time.isoformat(),
+            "callsign": flight.get("callsign"),
+            "origin": flight.get("orig_icao"),
+            "altitude_ft": flight.get("alt"),
+            "speed_kt": flight.get("gspeed"),
+            "track": flight.get("track"),
+            "eta": flight.get("eta"),
+            "lat": flight.get("lat"),
+            "lon": flight.get("lon"),
+        })
+    return records
+
+
+@timed()
+def fetch_snapshots(fetcher, target_times, verbose=True):
+    """
+    Fetch inbound snapshots at each time. Returns (DataFrame, n_failed);
+    snapshots that could not be fetched are counted, not retried here.
+    """
+    snapshots = fetcher.get_many(url, [snapshot_params(t) for t in target_times])
+    records, failed = [], 0
+    for target_time, data in zip(target_times, snapshots):
+        if data is None:
+            failed += 1
+            count("snapshots", result="failed")
+            continue
+        rows = snapshot_records(target_time, data)
+        count("snapshots", result="ok")
+        observe("flights_per_snapshot", len(rows), buckets=SIZE_BUCKETS)
+        if verbose:
+            print(f"✅ {len(rows)} flights at {target_time}")
+        records.extend(rows)
+    return pd.DataFrame(records), failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch per-minute FR24 inbound snapshots for KSFO")
+    # Start around 2025-11-08 03:00 UTC (example, adjust for peak period)
+    parser.add_argument("--start", default="2025-11-08T03:00", help="UTC start, ISO format")
+    parser.add_argument("--minutes", type=int, default=60, help="number of one-minute snapshots")
+    args = parser.parse_args()
+
+    start_time = datetime.fromisoformat(args.start).replace(tzinfo=timezone.utc)
+    target_times = [start_time + timedelta(minutes=i) for i in range(args.minutes)]  # every minute
+    print(f"⏱️ Fetching {len(target_times)} snapshots from {start_time.isoformat()}...")
+
+    # shared token bucket replaces the per-request sleep; retries 429/5xx with backoff
+    cache = ResponseCache()
+    with RateLimitedFetcher(headers=HEADERS, rate=FR24_RATE_PER_SEC, max_workers=4, cache=cache) as fetcher:
+        df, _ = fetch_snapshots(fetcher, target_times)
+
+    print(f"🗄️ Cache: {cache.stats()}")
+
+    filename = f"data/inbound_SFO_hour_{start_time.strftime('%Y%m%d_%H%M')}.csv"
+    df.to_csv(filename, index=False)
+    print(f"\n💾 Saved {len(df)} total records to {filename}")
+
+
+if __name__ == "__main__":
+    main()
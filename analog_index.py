@@ -0,0 +1,416 @@
+"""
+Similar-approach (analog) search over historical tracks.
+
+Every cropped approach (build_path.approach_points) is resampled onto a fixed
+grid of distances to the airport (GRID_KM, every GRID_STEP_M) as lateral
+offset from the extended centreline and altitude, both in metres (the grid
+already fixes the along-track position), and all approaches are stored as
+one contiguous float32 matrix (one row per flight, grid-point-major
+lateral,alt columns) with rows grouped by runway. Queries take the K nearest approaches into the same
+runway and report the fraction of them that went around:
+
+  - "euclidean": exact search over the resampled vectors, screened with
+    ||x||² - 2x·q + ||q||² from per-row prefix sums of squared norms (one
+    matvec over the runway's rows) and re-ranked exactly
+  - "dtw": banded dynamic time warping, pruned with LB_Keogh; candidates
+    are verified in increasing lower-bound order until the bound passes
+    the k-th best distance
+
+A live approach only covers the grid from its current distance outward, so
+both metrics compare over that span only, and against each indexed approach
+only over the part of it that approach covers too (held edge values are
+never compared); candidates covering less than MIN_OVERLAP of the span are
+skipped, and partial overlaps are scaled up to the span's length. Flights
+are identified by a stable `flight_key` (callsign_firsttimestamp), not the
+positional flight_id of one segmentation run. The index is saved as .npy
+files plus a flight table and loaded memory-mapped.
+
+    python analog_index.py build
+    python analog_index.py query --callsign UAL123 --k 25 --metric dtw
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from build_path import approach_leg, approach_points, crop_to_approach, filter_classified
+from geo import haversine_km, segment_interp, segment_starts
+from goaround_detector import altitude_ft, detect_goarounds
+from runways import DEFAULT_AIRPORT, get_airport, get_runway
+from segmentation import segment_flights
+from stability_features import flight_fingerprints
+from track_store import load_tracks
+
+INDEX_DIR = "data/analog_index"
+GRID_KM = (2.0, 18.0)   # resampled span of distance to the airport
+GRID_STEP_M = 250
+CHANNELS = ("lateral", "alt")
+DTW_WINDOW = 4          # Sakoe-Chiba band, grid points
+DTW_BATCH = 64
+MIN_OVERLAP = 0.5       # fraction of the query span a candidate must cover to be compared
+FORMAT_VERSION = 2
+
+
+def make_grid(grid_km=GRID_KM, step_m=GRID_STEP_M):
+    """Grid distances (km), nearest the airport first."""
+    lo, hi = grid_km
+    return np.round(np.arange(lo, hi + 1e-9, step_m / 1000), 6)
+
+
+def lateral_m(lat, lon, runway, airport=DEFAULT_AIRPORT):
+    """Signed offset (m, + = right of the course flown) from the runway's centreline through the airport point."""
+    x, y = get_airport(airport).to_local_xy(lat, lon)
+    course = np.radians(get_runway(airport, runway).heading_deg)
+    return x * np.cos(course) - y * np.sin(course)
+
+
+def resample_track(lat, lon, alt_ft, grid, runway, airport=DEFAULT_AIRPORT):
+    """
+    Resample one (possibly partial, live) track the way the index was built:
+    cropped to the runway's approach (crop_to_approach), then its approach leg.
+
+    Returns (vector (len(grid), 2), (lo, hi)): the grid slice [lo, hi) the
+    track actually covers; outside it values are held and should be ignored.
+    """
+    merge_lat, merge_lon = get_runway(airport, runway).merge_fix
+    track = pd.DataFrame({"flight_id": 0, "lat": np.asarray(lat, dtype=float), "lon": np.asarray(lon, dtype=float),
+                          "alt": np.asarray(alt_ft, dtype=float)})
+    track["timestamp"] = np.arange(len(track))
+    track = crop_to_approach(track, merge_lat, merge_lon, runway, airport=airport)
+    dist = track["dist_to_rwy"].to_numpy()
+    leg = approach_leg(dist, np.array([0]), len(dist)) if len(dist) else np.zeros(0, bool)
+    if leg.sum() < 2:
+        raise ValueError("need at least two approach points to resample a track")
+    lateral = lateral_m(track["lat"].to_numpy()[leg], track["lon"].to_numpy()[leg], runway, airport)
+    alt_m = track["alt"].to_numpy()[leg] * 0.3048
+    vec = segment_interp(np.zeros(leg.sum(), dtype=np.int64), dist[leg], np.column_stack([lateral, alt_m]), grid)[0]
+    lo = int(np.searchsorted(grid, dist[leg].min(), side="left"))
+    hi = int(np.searchsorted(grid, dist[leg].max(), side="right"))
+    return vec.astype(np.float32), (lo, hi)
+
+
+def lb_keogh(query, candidates, window):
+    """LB_Keogh of (m, c) query against (n, m, c) candidates: squared envelope violations."""
+    m = len(query)
+    pad = np.pad(query, ((window, window), (0, 0)), mode="edge")
+    env = np.lib.stride_tricks.sliding_window_view(pad, 2 * window + 1, axis=0)[:m]
+    # envelope in the candidates' dtype so the float32 index is never upcast
+    upper, lower = env.max(axis=-1).astype(candidates.dtype), env.min(axis=-1).astype(candidates.dtype)
+    above = candidates - upper
+    np.maximum(above, 0, out=above)
+    below = np.subtract(lower, candidates)
+    np.maximum(below, 0, out=below)
+    return (np.einsum("nij,nij->n", above, above, dtype=np.float64)
+            + np.einsum("nij,nij->n", below, below, dtype=np.float64))
+
+
+def overlap_groups(lo, hi):
+    """(lo, hi, positions) for each distinct [lo, hi) slice in the paired arrays."""
+    pair = np.asarray(lo, dtype=np.int64) * (int(np.max(hi, initial=0)) + 1) + hi
+    order = np.argsort(pair, kind="stable")
+    cuts = np.flatnonzero(np.diff(pair[order])) + 1
+    for pos in np.split(order, cuts):
+        if len(pos):
+            yield int(lo[pos[0]]), int(hi[pos[0]]), pos
+
+
+def dtw_batch(query, candidates, window, limit=np.inf):
+    """
+    Squared banded DTW distance of (m, c) query to each of (n, m, c) candidates.
+
+    Candidates whose partial alignment already costs more than `limit` are
+    abandoned early and returned as inf.
+    """
+    n, m = candidates.shape[:2]
+    # candidate-last layout: every cell of the DP below is one whole-batch vector op
+    cand = np.ascontiguousarray(candidates.transpose(1, 2, 0), dtype=np.float64)   # (m, c, n)
+    query = np.asarray(query, dtype=np.float64)[:, :, None]
+    cost = np.empty((m, 2 * window + 1, n))   # cost[i, w] = |query_i - cand_j|², j = i + w - window
+    for w, offset in enumerate(range(-window, window + 1)):
+        diff = query - cand[np.clip(np.arange(m) + offset, 0, m - 1)]
+        cost[:, w] = np.einsum("icn,icn->in", diff, diff)
+
+    # rolling DP rows: row[j + 1] = best cumulative cost aligning query[:i+1] with cand[:j+1]
+    alive = np.arange(n)
+    prev = np.full((m + 1, n), np.inf)
+    prev[0] = 0.0
+    row = np.empty_like(prev)
+    best = np.empty(n)
+    for i in range(m):
+        row.fill(np.inf)
+        for j in range(max(0, i - window), min(m, i + window + 1)):
+            np.minimum(prev[j], prev[j + 1], out=best)
+            np.minimum(best, row[j], out=best)
+            np.add(cost[i, j - i + window], best, out=row[j + 1])
+        prev, row = row, prev
+        if np.isfinite(limit) and i % 8 == 7:
+            # costs only grow along a warping path, so the row minimum bounds the final distance
+            keep = prev.min(axis=0) <= limit
+            if not keep.all():
+                alive, cost, prev = alive[keep], cost[:, :, keep], prev[:, keep]
+                row, best = np.empty_like(prev), np.empty(len(alive))
+    out = np.full(n, np.inf)
+    out[alive] = prev[m]
+    return out
+
+
+class AnalogIndex:
+    """Resampled approaches (vectors), their flights and per-runway row ranges."""
+
+    def __init__(self, vectors, flights, grid, runways, sq_cumsum=None):
+        self.vectors = vectors
+        self.flights = flights
+        self.grid = np.asarray(grid, dtype=float)
+        self.runways = runways   # {runway: (start_row, end_row)}
+        # grid slice [lo, hi) each row's track covers; values outside it are held edges
+        self.covered = flights[["grid_lo", "grid_hi"]].to_numpy(dtype=np.int64).reshape(-1, 2)
+        if sq_cumsum is None:
+            sq = np.square(vectors.reshape(len(vectors), len(self.grid), -1), dtype=np.float64).sum(axis=2)
+            sq_cumsum = np.column_stack([np.zeros(len(vectors)), np.cumsum(sq, axis=1)])
+        self.sq_cumsum = sq_cumsum
+
+    def __len__(self):
+        return len(self.vectors)
+
+    # --- build / persist ---
+    @classmethod
+    def build(cls, df, key="flight_id", airport=DEFAULT_AIRPORT, grid_km=GRID_KM, step_m=GRID_STEP_M):
+        """Index every classified approach in segmented tracks (segmentation.segment_flights)."""
+        grid = make_grid(grid_km, step_m)
+        apt = get_airport(airport)
+        _, labels = detect_goarounds(df, key=key, airport=airport)
+        df_clean, _ = filter_classified(df, key=key, airport=airport)
+
+        blocks, tables, runways, row = [], [], {}, 0
+        for rw in apt.approach_runways():
+            pts = approach_points(df_clean, rw, key=key, airport=airport)
+            if pts.empty:
+                continue
+            dist = pts["dist_to_rwy"].to_numpy()
+            leg = approach_leg(dist, segment_starts(pd.factorize(pts[key])[0]), len(dist))
+            codes, uniques = pd.factorize(pts[key][leg])
+            lateral = lateral_m(pts["lat"].to_numpy()[leg], pts["lon"].to_numpy()[leg], rw, airport)
+            alt_m = altitude_ft(pts)[leg] * 0.3048
+            vec = segment_interp(codes, dist[leg], np.column_stack([lateral, alt_m]), grid)
+            blocks.append(vec.reshape(len(vec), -1).astype(np.float32))
+
+            covered = pd.DataFrame({"code": codes, "dist": dist[leg]}).groupby("code")["dist"].agg(["min", "max"])
+            table = pd.DataFrame({key: np.asarray(uniques), "runway": rw,
+                                  "min_km": covered["min"].to_numpy(), "max_km": covered["max"].to_numpy()})
+            # as resample_track reports a query's span
+            table["grid_lo"] = np.searchsorted(grid, table["min_km"].to_numpy(), side="left")
+            table["grid_hi"] = np.searchsorted(grid, table["max_km"].to_numpy(), side="right")
+            tables.append(table)
+            runways[rw] = (row, row + len(vec))
+            row += len(vec)
+            print(f"   {rw}: {len(vec)} approaches")
+
+        flights = (pd.concat(tables, ignore_index=True) if tables
+                   else pd.DataFrame(columns=[key, "runway", "min_km", "max_km", "grid_lo", "grid_hi"]))
+        extra = [c for c in ("callsign", "start", "is_ga") if c in labels.columns]
+        flights = flights.merge(labels[[key] + extra], on=key, how="left")
+        flights = flights.merge(flight_fingerprints(df, key)[[key, "flight_key"]], on=key, how="left")
+        flights["is_ga"] = flights["is_ga"].fillna(False).astype(bool)
+        vectors = np.concatenate(blocks) if blocks else np.zeros((0, len(grid) * len(CHANNELS)), np.float32)
+        return cls(np.ascontiguousarray(vectors), flights, grid, runways)
+
+    def save(self, path=INDEX_DIR):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "vectors.npy"), self.vectors)
+        np.save(os.path.join(path, "sq_cumsum.npy"), self.sq_cumsum)
+        self.flights.to_parquet(os.path.join(path, "flights.parquet"), index=False)
+        meta = {"version": FORMAT_VERSION, "grid_km": self.grid.tolist(), "channels": list(CHANNELS),
+                "runways": {rw: list(r) for rw, r in self.runways.items()}}
+        tmp = os.path.join(path, "meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f, indent=1)
+        os.replace(tmp, os.path.join(path, "meta.json"))   # written last: marks a complete index
+
+    @classmethod
+    def load(cls, path=INDEX_DIR, mmap=True):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if meta["version"] != FORMAT_VERSION:
+            raise ValueError(f"analog index format {meta['version']} != {FORMAT_VERSION}; rebuild it")
+        mode = "r" if mmap else None
+        vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode=mode)
+        sq_cumsum = np.load(os.path.join(path, "sq_cumsum.npy"), mmap_mode=mode)
+        flights = pd.read_parquet(os.path.join(path, "flights.parquet"))
+        runways = {rw: tuple(r) for rw, r in meta["runways"].items()}
+        return cls(vectors, flights, meta["grid_km"], runways, sq_cumsum)
+
+    # --- search ---
+    def _rows(self, runway, span):
+        a, b = self.runways.get(runway, (0, 0))
+        lo, hi = span
+        c = len(CHANNELS)
+        return a, b, self.vectors[a:b, lo * c:hi * c]
+
+    def _overlap(self, a, b, span):
+        """
+        Per row a..b, the slice [lo, hi) of the query span (relative to its
+        start) that the row also covers, and whether that is enough to compare.
+        """
+        lo, hi = span
+        olo = np.clip(self.covered[a:b, 0], lo, hi) - lo
+        ohi = np.clip(self.covered[a:b, 1], lo, hi) - lo
+        usable = ohi - olo >= max(1, int(np.ceil(MIN_OVERLAP * (hi - lo))))
+        return olo, ohi, usable
+
+    def _euclidean(self, q, runway, span, k):
+        a, b, rows = self._rows(runway, span)
+        if b <= a:
+            return np.zeros(0, np.int64), np.zeros(0)
+        lo, hi = span
+        m, c = hi - lo, len(CHANNELS)
+        olo, ohi, usable = self._overlap(a, b, span)
+        n_usable = int(usable.sum())
+        if not n_usable:
+            return np.zeros(0, np.int64), np.zeros(0)
+        # screen with the norm expansion (float32 matvec), then re-rank the shortlist exactly;
+        # the few partly covered rows get their cross term over their own overlap
+        cross = rows @ q
+        partial = np.flatnonzero(usable & ((olo > 0) | (ohi < m)))
+        if len(partial):
+            per_point = np.einsum("nic,ic->ni", rows[partial].reshape(-1, m, c), q.reshape(m, c), dtype=np.float64)
+            prefix = np.column_stack([np.zeros(len(partial)), np.cumsum(per_point, axis=1)])
+            p = np.arange(len(partial))
+            cross[partial] = prefix[p, ohi[partial]] - prefix[p, olo[partial]]
+        q_prefix = np.r_[0.0, np.cumsum(np.square(q.reshape(m, c), dtype=np.float64).sum(axis=1))]
+        r = np.arange(b - a)
+        x_sq = self.sq_cumsum[a:b][r, lo + ohi] - self.sq_cumsum[a:b][r, lo + olo]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scale = m / (ohi - olo)
+            d2 = np.where(usable, (x_sq - 2 * cross + q_prefix[ohi] - q_prefix[olo]) * scale, np.inf)
+        short = min(n_usable, 4 * k)
+        cand = np.argpartition(d2, short - 1)[:short] if short < b - a else np.arange(b - a)
+        cand = cand[usable[cand]]
+        diff = rows[cand].reshape(-1, m, c).astype(np.float64) - q.reshape(m, c)
+        inside = (np.arange(m) >= olo[cand, None]) & (np.arange(m) < ohi[cand, None])
+        exact = (np.einsum("nic,nic->ni", diff, diff) * inside).sum(axis=1) * scale[cand]
+        top = np.argsort(exact, kind="stable")[:k]
+        return a + cand[top], exact[top]
+
+    @staticmethod
+    def _dtw_rows(query, rows, idx, olo, ohi, window, limit=np.inf):
+        """Banded DTW of the query to rows[idx], each over its overlap and scaled to the span."""
+        m = len(query)
+        out = np.empty(len(idx))
+        for lo, hi, pos in overlap_groups(olo[idx], ohi[idx]):
+            cand = rows[idx[pos]].reshape(len(pos), m, -1)[:, lo:hi]
+            out[pos] = dtw_batch(query[lo:hi], cand, window, limit * (hi - lo) / m) * m / (hi - lo)
+        return out
+
+    def _dtw(self, q, runway, span, k, window, chunk=16384):
+        a, b, rows = self._rows(runway, span)
+        if b <= a:
+            return np.zeros(0, np.int64), np.zeros(0)
+        m = span[1] - span[0]
+        query = q.reshape(m, -1)
+        olo, ohi, usable = self._overlap(a, b, span)
+        lb = np.full(b - a, np.inf)
+        full = usable & (olo == 0) & (ohi == m)
+        for i in range(0, b - a, chunk):
+            # fully covering rows (nearly all of them) are bounded chunk by chunk, without a gather
+            block = np.flatnonzero(full[i:i + chunk])
+            lb[i + block] = lb_keogh(query, rows[i:i + chunk].reshape(-1, m, query.shape[1]), window)[block]
+        partial = np.flatnonzero(usable & ~full)
+        for lo, hi, pos in overlap_groups(olo[partial], ohi[partial]):
+            cand = rows[partial[pos]].reshape(len(pos), m, -1)[:, lo:hi]
+            lb[partial[pos]] = lb_keogh(query[lo:hi], cand, window) * m / (hi - lo)
+        # the k-th best Euclidean distance bounds the k-th best DTW distance (the diagonal is
+        # a valid warping path), so seeding with the Euclidean top k prunes from the start
+        seed, _ = self._euclidean(q, runway, span, k)
+        seed -= a
+        best_idx, best_d = seed, self._dtw_rows(query, rows, seed, olo, ohi, window)
+        order = np.argsort(lb, kind="stable")
+        order = order[~np.isin(order, seed) & usable[order]]
+
+        i, size = 0, DTW_BATCH
+        while i < len(order):
+            batch = order[i:i + size]
+            i, size = i + size, min(size * 2, 64 * DTW_BATCH)   # grow while pruning is poor
+            kth = best_d.max() if len(best_d) == k else np.inf
+            batch = batch[lb[batch] < kth]   # lb is sorted: once empty, nothing later can qualify
+            if not len(batch):
+                break
+            d = self._dtw_rows(query, rows, batch, olo, ohi, window, kth)
+            idx, dist = np.r_[best_idx, batch], np.r_[best_d, d]
+            keep = np.argsort(dist, kind="stable")[:k]
+            best_idx, best_d = idx[keep], dist[keep]
+        return a + best_idx, best_d
+
+    def search(self, vector, runway, k=25, metric="euclidean", span=None, window=DTW_WINDOW):
+        """
+        K nearest approaches into `runway` to a resampled vector over grid slice span=(lo, hi).
+        Returns the neighbours' flight rows with a `distance` column (metres, root of summed
+        squares over the part of the span both tracks cover, scaled to the whole span).
+        """
+        lo, hi = span if span is not None else (0, len(self.grid))
+        if hi - lo < 1:
+            raise ValueError("query covers none of the index grid")
+        q = np.ascontiguousarray(np.asarray(vector, dtype=np.float32).reshape(len(self.grid), -1)[lo:hi].ravel())
+        if metric == "euclidean":
+            idx, d2 = self._euclidean(q, runway, (lo, hi), k)
+        elif metric == "dtw":
+            idx, d2 = self._dtw(q, runway, (lo, hi), k, window)
+        else:
+            raise ValueError(f"Unknown metric {metric!r}; use 'euclidean' or 'dtw'")
+        return self.flights.iloc[idx].assign(distance=np.sqrt(np.maximum(d2, 0))).reset_index(drop=True)
+
+    def query(self, lat, lon, alt_ft, runway, k=25, metric="euclidean", airport=DEFAULT_AIRPORT):
+        """Analogs of a raw (live) approach track; returns (neighbours, go-around fraction)."""
+        vector, span = resample_track(lat, lon, alt_ft, self.grid, runway, airport)
+        neighbours = self.search(vector, runway, k, metric, span)
+        ga_rate = float(neighbours["is_ga"].mean()) if len(neighbours) else float("nan")
+        return neighbours, ga_rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Similar-approach index for analog go-around prediction")
+    parser.add_argument("command", choices=["build", "query"])
+    parser.add_argument("--index", default=INDEX_DIR)
+    parser.add_argument("--callsign", help="query: use this stored flight's approach as the query")
+    parser.add_argument("--until-km", type=float, default=6.0,
+                        help="query: only use the track down to this distance, like a live approach")
+    parser.add_argument("--k", type=int, default=25)
+    parser.add_argument("--metric", default="euclidean", choices=["euclidean", "dtw"])
+    args = parser.parse_args()
+
+    if args.command == "build":
+        df, _ = segment_flights(load_tracks())
+        index = AnalogIndex.build(df)
+        index.save(args.index)
+        print(f"💾 Indexed {len(index)} approaches ({index.vectors.nbytes / 1e6:.1f} MB) -> {args.index}")
+        return
+
+    if not args.callsign:
+        parser.error("query needs --callsign")
+    index = AnalogIndex.load(args.index)
+    match = index.flights[index.flights["callsign"] == args.callsign]
+    if match.empty:
+        parser.error(f"{args.callsign} is not in the index")
+    flight = match.iloc[0]
+
+    # flight_ids are positions in this segmentation run; find the indexed flight by its stable key
+    df, _ = segment_flights(load_tracks())
+    prints = flight_fingerprints(df)
+    flight_id = prints.loc[prints["flight_key"] == flight["flight_key"], "flight_id"]
+    if flight_id.empty:
+        parser.error(f"{flight['flight_key']} is no longer in the track store; rebuild the index")
+    track = df[df["flight_id"] == flight_id.iloc[0]]
+    dist = haversine_km(track["lat"].to_numpy(dtype=float), track["lon"].to_numpy(dtype=float),
+                        get_airport().reference_point)
+    track = track[dist >= args.until_km]
+    neighbours, ga_rate = index.query(track["lat"], track["lon"], altitude_ft(track), flight["runway"],
+                                      args.k + 1, args.metric)
+    neighbours = neighbours[neighbours["flight_key"] != flight["flight_key"]].head(args.k)
+    ga_rate = float(neighbours["is_ga"].mean()) if len(neighbours) else float("nan")
+    print(neighbours.to_string(index=False))
+    print(f"🔁 {args.callsign} ({flight['runway']}): {ga_rate:.0%} of {len(neighbours)} analogs went around")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Resumable historical backfill of FR24 inbound snapshots.
+
+The date range is cut into fixed-length time shards. Worker processes take
+shards off a queue, fetch every snapshot in their shard (cadence seconds
+apart) and write it straight to a Parquet store, all drawing from one shared
+token bucket so the API rate limit holds across processes. Finished shards
+are recorded in a JSON manifest; a restarted run skips them, and a shard
+interrupted halfway is simply refetched (cached responses make that cheap)
+and overwrites its own files.
+
+    python backfill.py --start 2025-11-01 --end 2025-12-01 --cadence 60 --workers 4
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+
+import pyarrow as pa
+
+from FR24_inbound_sfo import HEADERS, fetch_snapshots
+from fetcher import FR24_RATE_PER_SEC, RateLimitedFetcher, SharedTokenBucket
+from instrumentation import drain, enable, enabled, merge, stage
+from response_cache import ResponseCache
+from track_store import write_tracks
+
+SNAPSHOT_STORE = "data/inbound_store"
+MANIFEST = "data/backfill_manifest.json"
+SHARD_HOURS = 1.0
+# every shard is cast to this, so shards with all-null columns still read back as one store
+SNAPSHOT_SCHEMA = pa.schema([
+    ("timestamp", pa.int64()),
+    ("callsign", pa.dictionary(pa.int32(), pa.string())),
+    ("origin", pa.string()),
+    ("altitude_ft", pa.float32()),
+    ("speed_kt", pa.float32()),
+    ("track", pa.float32()),
+    ("eta", pa.string()),
+    ("lat", pa.float32()),
+    ("lon", pa.float32()),
+])
+
+_fetcher = None
+
+
+def parse_utc(value):
+    ts = datetime.fromisoformat(value)
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts.astimezone(timezone.utc)
+
+
+def make_shards(start, end, cadence_s, shard_hours=SHARD_HOURS):
+    """[(shard_id, shard_start, shard_end)] covering [start, end); ids encode start and cadence."""
+    step = timedelta(hours=shard_hours)
+    shards = []
+    t = start
+    while t < end:
+        stop = min(t + step, end)
+        shards.append((f"{t.strftime('%Y%m%dT%H%M%S')}_{int(cadence_s)}s", t, stop))
+        t = stop
+    return shards
+
+
+def load_manifest(path=MANIFEST):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, path=MANIFEST):
+    """Atomic rewrite so a crash never leaves a half-written manifest."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _init_worker(bucket, threads, metrics=False):
+    """Per-process fetcher: own session and cache connection, shared token bucket."""
+    global _fetcher
+    _fetcher = RateLimitedFetcher(headers=HEADERS, max_workers=threads, cache=ResponseCache(), bucket=bucket)
+    if metrics:
+        enable()  # fresh registry, drained back to the parent after every shard
+
+
+def _run_shard(shard_id, start, end, cadence_s, root):
+    """Fetch one shard and write it; returns (shard_id, rows, failed_snapshots, metrics)."""
+    n = int((end - start).total_seconds() // cadence_s) + ((end - start).total_seconds() % cadence_s > 0)
+    times = [start + timedelta(seconds=i * cadence_s) for i in range(n)]
+    with stage("backfill_shard"):
+        df, failed = fetch_snapshots(_fetcher, times, verbose=False)
+        # fixed basename per shard: a rerun replaces the shard's files instead of duplicating rows
+        write_tracks(df, root, basename=f"shard-{shard_id}", schema=SNAPSHOT_SCHEMA)
+    return shard_id, len(df), failed, drain()
+
+
+def backfill(start, end, cadence_s=60, shard_hours=SHARD_HOURS, workers=2, threads=2,
+             rate=FR24_RATE_PER_SEC, root=SNAPSHOT_STORE, manifest_path=MANIFEST):
+    """Run (or resume) a backfill; returns the number of shards still pending."""
+    manifest = load_manifest(manifest_path)
+    shards = make_shards(start, end, cadence_s, shard_hours)
+    todo = [s for s in shards if s[0] not in manifest]
+    print(f"🧩 {len(shards)} shards, {len(shards) - len(todo)} already done, {len(todo)} to fetch")
+    if not todo:
+        return 0
+
+    bucket = SharedTokenBucket(rate)
+    started = time.monotonic()
+    pending = len(todo)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(bucket, threads, enabled())) as pool:
+        futures = {pool.submit(_run_shard, sid, s, e, cadence_s, root): sid for sid, s, e in todo}
+        for future in as_completed(futures):
+            sid = futures[future]
+            try:
+                _, rows, failed, metrics = future.result()
+                merge(metrics)
+            except Exception as e:  # leave the shard pending; the next run retries it
+                print(f"❌ Shard {sid} failed: {e}")
+                continue
+            if failed:
+                print(f"⚠️ Shard {sid}: {failed} snapshots failed, will retry on the next run")
+                continue
+            manifest[sid] = {"rows": rows, "done_at": datetime.now(timezone.utc).isoformat()}
+            save_manifest(manifest, manifest_path)
+            pending -= 1
+            done = len(todo) - pending
+            print(f"✅ Shard {sid}: {rows} rows ({done}/{len(todo)}, {time.monotonic() - started:.0f}s)")
+    return pending
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resumable sharded FR24 inbound-snapshot backfill")
+    parser.add_argument("--start", required=True, help="UTC start, ISO date/time")
+    parser.add_argument("--end", required=True, help="UTC end (exclusive), ISO date/time")
+    parser.add_argument("--cadence", type=float, default=60, help="seconds between snapshots")
+    parser.add_argument("--shard-hours", type=float, default=SHARD_HOURS)
+    parser.add_argument("--workers", type=int, default=2, help="worker processes")
+    parser.add_argument("--threads", type=int, default=2, help="request threads per worker")
+    parser.add_argument("--rate-per-min", type=float, default=FR24_RATE_PER_SEC * 60,
+                        help="API requests/minute shared by all workers")
+    parser.add_argument("--store", default=SNAPSHOT_STORE)
+    parser.add_argument("--manifest", default=MANIFEST)
+    args = parser.parse_args()
+
+    pending = backfill(parse_utc(args.start), parse_utc(args.end), args.cadence, args.shard_hours,
+                       args.workers, args.threads, args.rate_per_min / 60, args.store, args.manifest)
+    if pending:
+        print(f"⏸️ {pending} shards pending; rerun the same command to resume")
+    else:
+        print(f"💾 Backfill complete -> {args.store}")
+
+
+if __name__ == "__main__":
+    main()
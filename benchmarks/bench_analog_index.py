@@ -0,0 +1,115 @@
+"""
+Analog (similar-approach) search: query latency against a large index.
+
+Builds an AnalogIndex from synthetic tracks, enlarges it to --approaches
+rows with smooth per-approach perturbations (a lateral offset and slope
+along the grid, an altitude bias), saves and memory-maps it, then times
+k-NN queries for partial live-like tracks with both metrics and checks them
+against brute force over each row's covered overlap.
+
+Run from the repo root:
+    python -m benchmarks.bench_analog_index [--approaches 100000] [--k 25]
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from analog_index import DTW_WINDOW, MIN_OVERLAP, AnalogIndex, dtw_batch, resample_track
+from benchmarks.synthetic import generate_tracks, parse_count
+from geo import haversine_km
+from runways import get_airport
+from segmentation import segment_flights
+
+
+def enlarge(index, n, rng):
+    """About n rows: random copies of the base rows (runway mix kept), smoothly perturbed."""
+    grid = index.grid
+    blocks, tables, runways, row = [], [], {}, 0
+    total = len(index)
+    for rw, (a, b) in index.runways.items():
+        m = max(1, round(n * (b - a) / total))
+        pick = rng.integers(a, b, m)
+        vec = np.asarray(index.vectors[pick]).reshape(m, len(grid), -1).copy()
+        frac = (grid - grid[0]) / (grid[-1] - grid[0])
+        vec[:, :, 0] += rng.normal(0, 150, (m, 1)) + rng.normal(0, 300, (m, 1)) * frac
+        vec[:, :, 1] += rng.normal(0, 30, (m, 1))
+        blocks.append(vec.reshape(m, -1).astype(np.float32))
+        tables.append(index.flights.iloc[pick])
+        runways[rw] = (row, row + m)
+        row += m
+    flights = pd.concat(tables, ignore_index=True)
+    return AnalogIndex(np.concatenate(blocks), flights, grid, runways)
+
+
+def brute_force(index, vector, runway, span):
+    """Euclidean distances and squared DTW distances row by row, each over its covered overlap."""
+    a, b = index.runways[runway]
+    lo, hi = span
+    rows = np.asarray(index.vectors[a:b]).reshape(b - a, len(index.grid), -1)[:, lo:hi].astype(float)
+    q = vector[lo:hi]
+    euclid, dtw = np.full(b - a, np.inf), np.full(b - a, np.inf)
+    for i, (c_lo, c_hi) in enumerate(index.covered[a:b]):
+        o_lo, o_hi = max(c_lo, lo) - lo, min(c_hi, hi) - lo
+        if o_hi - o_lo < max(1, np.ceil(MIN_OVERLAP * (hi - lo))):
+            continue
+        scale = (hi - lo) / (o_hi - o_lo)
+        euclid[i] = np.sqrt(((rows[i, o_lo:o_hi] - q[o_lo:o_hi]) ** 2).sum() * scale)
+        dtw[i] = dtw_batch(q[o_lo:o_hi], rows[i:i + 1, o_lo:o_hi], DTW_WINDOW)[0] * scale
+    return euclid, dtw
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark analog k-NN search")
+    parser.add_argument("--points", default="1M", help="synthetic points for the base index")
+    parser.add_argument("--approaches", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--k", type=int, default=25)
+    parser.add_argument("--until-km", type=float, default=6.0, help="live track cut-off distance")
+    parser.add_argument("--check", type=int, default=3, help="queries verified by brute force")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    points, _ = generate_tracks(parse_count(args.points), seed=1)
+    df, _ = segment_flights(points)
+    base = AnalogIndex.build(df)
+    big = enlarge(base, args.approaches, rng)
+    path = tempfile.mkdtemp()
+    big.save(path)
+    index = AnalogIndex.load(path)
+    print(f"📦 {len(index)} approaches, {index.vectors.nbytes / 1e6:.1f} MB, "
+          f"{type(index.vectors).__name__} ({base.vectors.shape[1]} float32 per approach)")
+
+    ref = get_airport().reference_point
+    picks = base.flights.sample(args.queries, random_state=0)
+    timings = {"resample": [], "euclidean": [], "dtw": []}
+    for qi, (_, flight) in enumerate(picks.iterrows()):
+        track = df[df["flight_id"] == flight["flight_id"]]
+        dist = haversine_km(track["lat"].to_numpy(dtype=float), track["lon"].to_numpy(dtype=float), ref)
+        track = track[dist >= args.until_km]
+        t0 = time.perf_counter()
+        vector, span = resample_track(track["lat"], track["lon"], track["alt"], index.grid, flight["runway"])
+        timings["resample"].append(time.perf_counter() - t0)
+
+        found = {}
+        for metric in ("euclidean", "dtw"):
+            t0 = time.perf_counter()
+            found[metric] = index.search(vector, flight["runway"], args.k, metric, span)
+            timings[metric].append(time.perf_counter() - t0)
+
+        if qi < args.check:
+            euclid, dtw = brute_force(index, vector, flight["runway"], span)
+            ok_e = np.allclose(np.sort(euclid)[:args.k], found["euclidean"]["distance"], rtol=1e-4)
+            ok_d = np.allclose(np.sqrt(np.sort(dtw)[:args.k]), found["dtw"]["distance"], rtol=1e-4)
+            print(f"🔎 query {qi}: brute-force match euclidean={ok_e} dtw={ok_d}")
+
+    print(f"{'step':<12}{'median ms':>12}{'p95 ms':>10}")
+    for name, values in timings.items():
+        values = np.array(values) * 1e3
+        print(f"{name:<12}{np.median(values):>12.2f}{np.percentile(values, 95):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
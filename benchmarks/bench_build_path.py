@@ -0,0 +1,127 @@
+"""
+build_path correctness and speed against the original per-callsign implementation.
+
+The baseline below is the pre-vectorization build_path.py (groupby loop,
+one great-circle distance per point) kept as it was, with the `haversine`
+package call spelled out in math so the check needs no extra dependency.
+classify_flights and build_dense_reference must give the same runway per
+flight and the same reference paths on sfo_landing_paths.csv (flights keyed
+by callsign, as the baseline did).
+
+Run from the repo root:
+    python -m benchmarks.bench_build_path [--csv sfo_landing_paths.csv]
+"""
+import argparse
+import math
+import time
+
+import numpy as np
+import pandas as pd
+
+from build_path import MERGE_POINTS, RADIUS, SFO, TOUCHDOWN_POINTS, build_dense_reference, classify_flights
+from track_store import LEGACY_CSV
+
+
+# --- baseline implementation ---
+def haversine(p1, p2, radius_km=6371.0088):
+    """Scalar great-circle distance in km, as haversine.haversine."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (*p1, *p2))
+    d = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * radius_km * math.asin(math.sqrt(d))
+
+
+def baseline_classify_flight(sub):
+    dist_l_touch = np.sqrt((sub.lat - TOUCHDOWN_POINTS["28L"][0])**2 + (sub.lon - TOUCHDOWN_POINTS["28L"][1])**2)
+    dist_r_touch = np.sqrt((sub.lat - TOUCHDOWN_POINTS["28R"][0])**2 + (sub.lon - TOUCHDOWN_POINTS["28R"][1])**2)
+    min_l_touch = dist_l_touch.min()
+    min_r_touch = dist_r_touch.min()
+    within_r = min_r_touch < RADIUS["28R"]
+    within_l = min_l_touch < RADIUS["28L"]
+    if within_l and not within_r:
+        return "28L"
+    if within_r and not within_l:
+        return "28R"
+    if within_l and within_r:
+        return "28L" if min_l_touch <= min_r_touch else "28R"
+    return None
+
+
+def baseline_classify(df):
+    clean_groups = []
+    for callsign, sub in df.groupby("callsign"):
+        runway = baseline_classify_flight(sub)
+        if runway:
+            clean_groups.append(sub.assign(runway=runway))
+    return pd.concat(clean_groups, ignore_index=True)
+
+
+def baseline_crop_to_approach(sub, merge_lat, merge_lon, runway):
+    sub = sub.sort_values("timestamp").reset_index(drop=True)
+    sub["dist_to_rwy"] = [haversine((lat, lon), SFO) for lat, lon in zip(sub["lat"], sub["lon"])]
+    merge_dist = [haversine((lat, lon), (merge_lat, merge_lon)) for lat, lon in zip(sub["lat"], sub["lon"])]
+    merge_idx = np.argmin(merge_dist)
+    cropped = sub.loc[merge_idx:].copy()
+    if runway == "28L":
+        lon_diff = cropped["lon"].diff().fillna(0)
+        inbound = lon_diff < 0
+        if inbound.any():
+            inbound_start = inbound.idxmax()
+            cropped = cropped.loc[inbound_start:]
+        cropped = cropped[cropped["lat"] > 37.53]
+    cropped = cropped[cropped["dist_to_rwy"] > 1]
+    cropped = cropped[cropped["dist_to_rwy"] < 20]
+    return cropped
+
+
+def baseline_build_dense_reference(df, runway, bins=250):
+    merge_lat, merge_lon = MERGE_POINTS[runway]
+    grouped = []
+    for callsign, sub in df[df.runway == runway].groupby("callsign"):
+        cropped = baseline_crop_to_approach(sub, merge_lat, merge_lon, runway)
+        if len(cropped) > 5:
+            grouped.append(cropped)
+    if not grouped:
+        return pd.DataFrame()
+    df_approach = pd.concat(grouped, ignore_index=True)
+    df_approach["lon_bin"] = pd.cut(df_approach["lon"], bins=bins)
+    return (
+        df_approach.groupby("lon_bin", observed=True)[["lat", "lon"]]
+        .median()
+        .dropna()
+        .reset_index(drop=True)
+    )
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check build_path against the baseline implementation")
+    parser.add_argument("--csv", default=LEGACY_CSV)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv)
+
+    # --- Step 1: runway per flight ---
+    old_clean, t_old = timed(lambda: baseline_classify(df))
+    (row_runway, flights), t_new = timed(lambda: classify_flights(df, key="callsign"))
+    old = old_clean.groupby("callsign")["runway"].first().sort_index()
+    new = flights.dropna(subset=["runway"]).set_index("callsign")["runway"].sort_index()
+    pd.testing.assert_series_equal(old, new, check_names=False, check_index_type=False, check_dtype=False)
+    print(f"✅ classify_flights: {len(new)} flights match ({t_old:.2f}s -> {t_new:.3f}s)")
+
+    # --- Step 2: reference paths from the same classified points ---
+    tagged = pd.notna(row_runway)
+    df_clean = df[tagged].assign(runway=row_runway[tagged]).reset_index(drop=True)
+    for rw in MERGE_POINTS:
+        old_path, t_old = timed(lambda: baseline_build_dense_reference(old_clean, rw))
+        new_path, t_new = timed(lambda: build_dense_reference(df_clean, rw, key="callsign"))
+        pd.testing.assert_frame_equal(old_path, new_path)
+        print(f"✅ build_dense_reference {rw}: {len(new_path)} vertices match ({t_old:.2f}s -> {t_new:.3f}s)")
+
+
+if __name__ == "__main__":
+    main()
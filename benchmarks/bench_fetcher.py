@@ -0,0 +1,91 @@
+"""
+Throughput check for fetcher.RateLimitedFetcher against a local mock FR24 server.
+
+The mock answers after a short fixed latency, injects a 429 or 503 every few requests and logs
+the arrival time of every hit. We then check that:
+  - achieved throughput is within a few percent of the configured rate, and
+  - no one-second window ever saw more than rate + 1 requests (the burst).
+
+Run from the repo root:
+    python -m benchmarks.bench_fetcher --rate 20 --n 200
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from fetcher import RateLimitedFetcher
+
+
+def start_mock_server(fail_every=7, latency=0.05):
+    hits = []
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            with lock:
+                hits.append(time.monotonic())
+                n = len(hits)
+            time.sleep(latency)
+            if fail_every and n % fail_every == 0:
+                status = 429 if n % (2 * fail_every) == 0 else 503
+                self.send_response(status)
+                self.end_headers()
+                return
+            body = json.dumps({"tracks": [{"lat": 37.6, "lon": -122.3, "alt": 1000, "timestamp": n}]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, hits
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rate", type=float, default=20.0, help="requests/sec allowed")
+    parser.add_argument("--n", type=int, default=200, help="logical requests to issue")
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    server, hits = start_mock_server()
+    url = f"http://127.0.0.1:{server.server_port}/api/flight-tracks"
+
+    fetcher = RateLimitedFetcher(rate=args.rate, max_workers=args.workers, backoff=0.01)
+    t0 = time.monotonic()
+    results = fetcher.get_many(url, [{"flight_id": i} for i in range(args.n)])
+    elapsed = time.monotonic() - t0
+    fetcher.close()
+    server.shutdown()
+
+    hits = np.sort(np.array(hits))
+    ok = sum(r is not None for r in results)
+    achieved = (len(hits) - 1) / (hits[-1] - hits[0])
+    # max hits inside any sliding one-second window
+    per_window = np.searchsorted(hits, hits + 1.0) - np.arange(len(hits))
+    window_limit = int(np.ceil(args.rate)) + 1
+
+    print(f"requests issued : {len(hits)} ({ok}/{args.n} succeeded after retries)")
+    print(f"elapsed         : {elapsed:.2f}s")
+    print(f"achieved rate   : {achieved:.2f} req/s (limit {args.rate:.2f})")
+    print(f"max per second  : {per_window.max()} (limit {window_limit})")
+    print(f"sequential equiv: {len(hits) * (1 / args.rate + 0.05):.2f}s with sleep-after-each")
+
+    assert ok == args.n, "some requests failed despite retries"
+    assert achieved <= args.rate * 1.02, "rate limit exceeded"
+    assert achieved >= args.rate * 0.9, "running well below the allowed rate"
+    assert per_window.max() <= window_limit, "burst exceeded"
+    print("✅ rate limit respected at full throughput")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Go-around model: matrix build, time-split CV training and batched predict.
+
+Builds the training matrix from synthetic approach tracks, trains with
+parallel CV folds, then times LogisticModel.predict at several batch sizes
+(the live scorer sends one poll's aircraft on final, the nightly backfill
+the whole matrix).
+
+Run from the repo root:
+    python -m benchmarks.bench_goaround_model [--points 1M] [--folds 4]
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import generate_tracks, parse_count
+from goaround_model import LogisticModel, load_matrix, matrix_for_tracks, train
+from live_scorer import GLIDE_SLOPE, MAX_ALONG_M, THRESHOLD_CROSSING_M, GoAroundScorer, approach_state
+from ref_index import load_reference_paths
+from runways import get_airport
+from segmentation import segment_flights
+
+
+def check_glide_reference(tolerance_m=20.0):
+    """An aircraft flying the 3° path (threshold frame, as stability_features) reads glide_dev_m ~0 on every runway."""
+    apt = get_airport()
+    index = load_reference_paths()
+    for name, rw in apt.approach_runways().items():
+        ref = pd.read_csv(rw.ref_path)
+        lat, lon = np.r_[rw.threshold[0], ref["lat"]], np.r_[rw.threshold[1], ref["lon"]]
+        x = (lon - rw.threshold[1]) * apt.m_per_deg_lon
+        y = (lat - rw.threshold[0]) * apt.m_per_deg_lat
+        course = np.radians(rw.heading_deg)
+        along = -(x * np.sin(course) + y * np.cos(course))
+        alt_m = THRESHOLD_CROSSING_M + np.maximum(along, 0) * GLIDE_SLOPE
+        nan = np.full(len(lat), np.nan)
+        feats = approach_state({name: index[name]}, nan, lat, lon, alt_m, nan, nan, nan,
+                               {f: nan for f in ("t", "lat", "lon", "velocity")})
+        dev = feats["glide_dev_m"].to_numpy()[along < MAX_ALONG_M]
+        print(f"📐 {name}: glide_dev_m on the 3° path: {dev[0]:.1f} m at the threshold, max |dev| {np.abs(dev).max():.1f} m")
+        assert np.abs(dev).max() < tolerance_m, f"{name} glide deviation is biased"
+
+
+def live_polls(points, interval=10):
+    """
+    Synthetic tracks as OpenSky-style polls: the latest point per aircraft in
+    every interval, with true_track from the aircraft's previous poll (the
+    live scorer does not score aircraft without a track).
+    """
+    poll = points["timestamp"].to_numpy() // interval * interval
+    last = points.assign(poll=poll).drop_duplicates(["callsign", "poll"], keep="last")
+    x, y = get_airport().to_local_xy(last["lat"].to_numpy(), last["lon"].to_numpy())
+    same = last["callsign"].to_numpy()[1:] == last["callsign"].to_numpy()[:-1]
+    track = np.r_[np.nan, np.where(same, np.degrees(np.arctan2(np.diff(x), np.diff(y))) % 360, np.nan)]
+    states = pd.DataFrame({
+        "poll": last["poll"].to_numpy(),
+        "icao24": last["callsign"].astype(str).to_numpy(),
+        "callsign": last["callsign"].astype(str).to_numpy(),
+        "time_position": last["timestamp"].to_numpy(dtype=float),
+        "last_contact": last["timestamp"].to_numpy(dtype=float),
+        "latitude": last["lat"].to_numpy(),
+        "longitude": last["lon"].to_numpy(),
+        "baro_altitude": last["alt"].to_numpy() * 0.3048,
+        "on_ground": last["alt"].to_numpy() <= 0,
+        "velocity": np.nan,
+        "true_track": track,
+        "vertical_rate": np.nan,
+    })
+    for t, group in states.groupby("poll", sort=True):
+        yield float(t), group.drop(columns="poll")
+
+
+def check_arrivals(points, matrix_path, hours=3):
+    """Both runways must register arrivals, in the training matrix and in a live replay."""
+    X, _, flight, flights, meta = load_matrix(matrix_path)
+    col = meta["columns"].index("rwy_arrivals_prev_60m")
+    runway = flights["runway"].to_numpy()[np.asarray(flight)]
+    trained = {rw: float(np.asarray(X[runway == rw, col]).max()) for rw in ("28L", "28R")}
+
+    scorer = GoAroundScorer()
+    live = {"28L": 0.0, "28R": 0.0}
+    end = points["timestamp"].min() + hours * 3600
+    for t, states in live_polls(points[points["timestamp"] < end]):
+        feats = scorer.features(states, t)
+        for rw, n in zip(feats["runway"], feats["rwy_arrivals_prev_60m"]):
+            live[rw] = max(live[rw], n)
+    print(f"🛬 max rwy_arrivals_prev_60m: matrix {trained}, live replay ({hours} h) {live}")
+    assert all(v > 0 for v in (*trained.values(), *live.values())), "a runway never registers arrivals"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark go-around model training and inference")
+    parser.add_argument("--points", default="1M")
+    parser.add_argument("--folds", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    check_glide_reference()
+    points, _ = generate_tracks(parse_count(args.points), seed=2)
+    df, _ = segment_flights(points)
+    path = tempfile.mkdtemp()
+    matrix_for_tracks(df, path)
+    t0 = time.perf_counter()
+    matrix_for_tracks(df, path)
+    print(f"♻️ cached matrix check: {time.perf_counter() - t0:.2f}s")
+    check_arrivals(points, path)
+
+    t0 = time.perf_counter()
+    model = train(path, args.folds, workers=args.workers)
+    print(f"🧠 train + {args.folds}-fold CV: {time.perf_counter() - t0:.2f}s")
+    model.save(f"{path}/model.json")
+    model = LogisticModel.load(f"{path}/model.json")
+
+    rng = np.random.default_rng(0)
+    X = np.load(f"{path}/X.npy")
+    print(f"{'batch':>10}{'median ms':>12}{'rows/ms':>12}")
+    for batch in (100, 1_000, 10_000, 100_000):
+        rows = X[rng.integers(0, len(X), batch)].astype(float)
+        times = []
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            model.predict(rows)
+            times.append(time.perf_counter() - t0)
+        ms = np.median(times) * 1e3
+        print(f"{batch:>10}{ms:>12.3f}{batch / ms:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
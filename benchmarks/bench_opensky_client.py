@@ -0,0 +1,127 @@
+"""
+Per-poll latency and CPU of OpenSkyClient vs the old fetch_flights flow,
+against a local stub of the OpenSky token and /states/all endpoints.
+
+The old flow re-reads credentials, POSTs for a token and opens a fresh
+connection for every poll, then builds an object DataFrame. The stub adds a
+fixed delay to the token endpoint to stand in for the auth round-trip.
+
+Run from the repo root:
+    python -m benchmarks.bench_opensky_client [--polls 200] [--aircraft 300]
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+import requests
+
+from fetch_live_data import COLUMNS, OpenSkyClient
+
+
+def make_states(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        [f"a{i:05x}", f"UAL{i:<5}", "United States", 1.7e9, 1.7e9,
+         float(rng.uniform(-123, -122)), float(rng.uniform(37, 38)), float(rng.uniform(0, 10000)),
+         False, float(rng.uniform(50, 250)), float(rng.uniform(0, 360)), float(rng.normal()),
+         None, None if i % 7 == 0 else 1000.0, "1200", False, 0]
+        for i in range(n)
+    ]
+
+
+def start_stub(n_aircraft, auth_delay):
+    counts = {"token": 0, "states": 0}
+    body = json.dumps({"time": 1700000000, "states": make_states(n_aircraft)}).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+
+        def _send(self, payload):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            counts["token"] += 1
+            time.sleep(auth_delay)
+            self._send(json.dumps({"access_token": f"tok{counts['token']}", "expires_in": 1800}).encode())
+
+        def do_GET(self):
+            counts["states"] += 1
+            self._send(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, counts
+
+
+def old_fetch_flights(creds_path, auth_url, api_url, bbox=(-123.5, -121.5, 36.5, 38.5)):
+    """The pre-client flow, kept verbatim apart from the URLs."""
+    with open(creds_path) as f:
+        creds = json.load(f)
+    response = requests.post(auth_url, data={
+        "grant_type": "client_credentials", "client_id": creds["clientId"], "client_secret": creds["clientSecret"]
+    })
+    token = response.json()["access_token"]
+    url = f"{api_url}/states/all?lamin={bbox[2]}&lomin={bbox[0]}&lamax={bbox[3]}&lomax={bbox[1]}"
+    response = requests.get(url, headers={"Authorization": f"Bearer {token}"})
+    return pd.DataFrame(response.json()["states"], columns=COLUMNS)
+
+
+def timed(fn, polls):
+    wall, cpu = [], []
+    for _ in range(polls):
+        w0, c0 = time.perf_counter(), time.process_time()
+        fn()
+        wall.append(time.perf_counter() - w0)
+        cpu.append(time.process_time() - c0)
+    return np.array(wall) * 1000, np.array(cpu) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--polls", type=int, default=200)
+    parser.add_argument("--aircraft", type=int, default=300)
+    parser.add_argument("--auth-delay", type=float, default=0.05, help="seconds added by the stub token endpoint")
+    args = parser.parse_args()
+
+    server, counts = start_stub(args.aircraft, args.auth_delay)
+    base = f"http://127.0.0.1:{server.server_port}"
+    creds = os.path.join(tempfile.mkdtemp(), "credentials.json")
+    with open(creds, "w") as f:
+        json.dump({"clientId": "id", "clientSecret": "secret"}, f)
+
+    old_wall, old_cpu = timed(lambda: old_fetch_flights(creds, f"{base}/token", f"{base}/api"), args.polls)
+    old_tokens = counts["token"]
+
+    client = OpenSkyClient(creds, auth_url=f"{base}/token", api_url=f"{base}/api")
+    client.get_token()  # warm-up: the first poll always authenticates
+    new_wall, new_cpu = timed(lambda: client.fetch_states(), args.polls)
+    df_wall, _ = timed(lambda: client.fetch_flights(), args.polls)
+    client.close()
+    server.shutdown()
+
+    print(f"{args.polls} polls, {args.aircraft} aircraft per poll")
+    print(f"{'':<26}{'p50 ms':>9}{'p99 ms':>9}{'cpu ms':>9}")
+    for name, wall, cpu in [("old fetch_flights", old_wall, old_cpu),
+                            ("client.fetch_states", new_wall, new_cpu),
+                            ("client.fetch_flights", df_wall, None)]:
+        cpu_txt = f"{np.mean(cpu):>9.2f}" if cpu is not None else f"{'':>9}"
+        print(f"{name:<26}{np.percentile(wall, 50):>9.2f}{np.percentile(wall, 99):>9.2f}{cpu_txt}")
+    print(f"token requests: old {old_tokens}, client {counts['token'] - old_tokens}")
+
+
+if __name__ == "__main__":
+    main()
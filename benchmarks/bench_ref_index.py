@@ -0,0 +1,82 @@
+"""
+Batched nearest-segment queries: KD-tree ReferencePath.query vs brute force.
+
+Points are scattered around the 28L/28R paths (~500 m lateral spread).
+The shipped paths only have ~100 segments, so a densified copy (--densify
+vertices per segment) is also indexed to show how both scale with path size.
+
+Run from the repo root:
+    python -m benchmarks.bench_ref_index [--n 1000000] [--densify 50]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from geo import EARTH_RADIUS_KM
+from ref_index import REF_PATHS, THRESHOLDS, ReferencePath, load_reference_paths
+
+
+def densify(lat, lon, factor):
+    s = np.arange(len(lat))
+    fine = np.linspace(0, len(lat) - 1, (len(lat) - 1) * factor + 1)
+    return np.interp(fine, s, lat), np.interp(fine, s, lon)
+
+
+def scatter_points(ref, n, rng, spread_m=500):
+    seg = rng.integers(0, len(ref.length), n)
+    t = rng.random(n)
+    x = ref.ax[seg] + t * ref.dx[seg] + rng.normal(0, spread_m, n)
+    y = ref.ay[seg] + t * ref.dy[seg] + rng.normal(0, spread_m, n)
+    k = np.radians(1.0) * EARTH_RADIUS_KM * 1000
+    return ref.origin[0] + y / k, ref.origin[1] + x / (k * np.cos(np.radians(ref.origin[0])))
+
+
+def run(ref, label, lat, lon, n_brute):
+    t0 = time.perf_counter()
+    fast = ref.query(lat, lon)
+    t_fast = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    slow = ref.query_brute(lat[:n_brute], lon[:n_brute])
+    t_slow = (time.perf_counter() - t0) * len(lat) / n_brute
+
+    err = fast["dist_m"][:n_brute] - slow["dist_m"]
+    print(f"{label}: {len(ref.length)} segments, {len(lat):,} points")
+    print(f"   kd-tree : {t_fast:.3f}s ({len(lat) / t_fast / 1e6:.2f} M pts/s)")
+    print(f"   brute   : {t_slow:.3f}s (extrapolated from {n_brute:,})")
+    print(f"   speedup : {t_slow / t_fast:.1f}x, max dist error = {err.max():.3f} m (bound {ref.slack:.2f} m)")
+    assert err.min() > -1e-6 and err.max() <= ref.slack + 1e-6, "kd-tree error outside bound"
+
+
+def check_threshold_origin(tolerance_m=1.0):
+    """along_track_m from load_reference_paths must be ~0 at every runway threshold."""
+    for rw, ref in load_reference_paths().items():
+        along = ref.query([THRESHOLDS[rw][0]], [THRESHOLDS[rw][1]], exact=True)["along_track_m"][0]
+        print(f"{rw}: along_track_m at threshold = {along:.2f} m")
+        assert abs(along) < tolerance_m, f"{rw} along-track origin is {along:.0f} m from the threshold"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=1_000_000)
+    parser.add_argument("--densify", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    check_threshold_origin()
+    rng = np.random.default_rng(args.seed)
+    for rw, path in REF_PATHS.items():
+        ref_csv = pd.read_csv(path)
+        ref = ReferencePath(ref_csv["lat"], ref_csv["lon"], name=rw, threshold=THRESHOLDS[rw])
+        lat, lon = scatter_points(ref, args.n, rng)
+        run(ref, rw, lat, lon, min(args.n, 100_000))
+
+        dense = ReferencePath(*densify(ref_csv["lat"].to_numpy(), ref_csv["lon"].to_numpy(), args.densify),
+                              name=f"{rw} x{args.densify}", threshold=THRESHOLDS[rw])
+        run(dense, dense.name, lat, lon, min(args.n, 5_000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Snapshot log: size of a day of polls, replay speed and seek latency.
+
+Simulates a day of 10-second OpenSky polls over the `balanced` bbox
+(--aircraft concurrent aircraft on straight legs, values rounded like the
+API reports them), records them with SnapshotWriter, checks that replay
+reproduces every poll, and compares the log with one Parquet file per poll
+(live_scorer's old --record format).
+
+Run from the repo root:
+    python -m benchmarks.bench_snapshot_log [--hours 24] [--aircraft 150]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from bbox_utils import get_bbox
+from snapshot_log import OUTPUT_COLUMNS, SnapshotReader, SnapshotWriter
+
+START_TIME = 1_762_905_600   # 2025-11-12 00:00 UTC
+COUNTRIES = ["United States", "Canada", "Mexico", "Japan", "United Kingdom", "Germany"]
+
+
+def simulate_polls(hours, aircraft, interval=10.0, seed=0):
+    """Yield (poll_time, states DataFrame) with ~`aircraft` aircraft in the bbox at any time."""
+    rng = np.random.default_rng(seed)
+    lon0, lon1, lat0, lat1 = get_bbox("balanced")
+    n_polls = int(hours * 3600 / interval)
+    lifetime = rng.uniform(600, 3000, 50_000)                      # seconds in the bbox
+    births = np.cumsum(rng.exponential(lifetime.mean() / aircraft, 50_000)) - lifetime.mean()
+    lat = rng.uniform(lat0, lat1, 50_000)
+    lon = rng.uniform(lon0, lon1, 50_000)
+    track = rng.uniform(0, 360, 50_000)
+    speed = rng.uniform(60, 250, 50_000)
+    alt = rng.uniform(300, 11000, 50_000)
+    vrate = rng.choice([0.0, -5.0, 7.0], 50_000)
+    names = np.array([f"{i:06x}" for i in range(50_000)])
+    callsigns = np.array([f"SYN{i % 4000:04d}" for i in range(50_000)])
+    country = rng.choice(COUNTRIES, 50_000)
+    squawk = np.array([f"{v:04d}" for v in rng.integers(1000, 7777, 50_000)])
+    for p in range(n_polls):
+        now = START_TIME + p * interval
+        age = p * interval - births
+        live = np.flatnonzero((age >= 0) & (age < lifetime))
+        dt = age[live]
+        rad = np.radians(track[live])
+        lat_now = lat[live] + np.cos(rad) * speed[live] * dt / 111_000
+        lon_now = lon[live] + np.sin(rad) * speed[live] * dt / 88_000
+        baro = np.clip(alt[live] + vrate[live] * dt, 0, 13000)
+        lag = rng.integers(0, 6, len(live))
+        states = pd.DataFrame({
+            "icao24": names[live],
+            "callsign": callsigns[live],
+            "origin_country": country[live],
+            "time_position": (now - lag).astype(float),
+            "last_contact": (now - np.minimum(lag, rng.integers(0, 3, len(live)))).astype(float),
+            "longitude": lon_now.round(4),
+            "latitude": lat_now.round(4),
+            "baro_altitude": baro.round(2),
+            "on_ground": baro <= 0,
+            "velocity": (speed[live] + rng.normal(0, 0.5, len(live))).round(2),
+            "true_track": track[live].round(2),
+            "vertical_rate": np.where(baro > 0, vrate[live], 0.0).round(2),
+            "geo_altitude": np.where(rng.random(len(live)) < 0.05, np.nan, (baro + 30).round(2)),
+            "squawk": squawk[live],
+            "spi": False,
+            "position_source": np.zeros(len(live), dtype=np.int8),
+        })
+        yield now, states
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the snapshot log")
+    parser.add_argument("--hours", type=float, default=24)
+    parser.add_argument("--aircraft", type=int, default=150)
+    parser.add_argument("--parquet-sample", type=int, default=200, help="polls written as Parquet for comparison")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, "day.snap")
+    polls = list(simulate_polls(args.hours, args.aircraft))
+    rows = sum(len(s) for _, s in polls)
+
+    t0 = time.perf_counter()
+    with SnapshotWriter(path) as writer:
+        for poll_time, states in polls:
+            writer.append(poll_time, states)
+    write_s = time.perf_counter() - t0
+    size = os.path.getsize(path)
+
+    parquet_bytes = 0
+    for poll_time, states in polls[:args.parquet_sample]:
+        f = os.path.join(tmp, f"snap_{int(poll_time)}.parquet")
+        states.assign(poll_time=poll_time).to_parquet(f, index=False)
+        parquet_bytes += os.path.getsize(f)
+    parquet_day = parquet_bytes / min(args.parquet_sample, len(polls)) * len(polls)
+
+    t0 = time.perf_counter()
+    reader = SnapshotReader(path)
+    open_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    replayed = list(reader.read())
+    replay_s = time.perf_counter() - t0
+
+    exact = len(replayed) == len(polls) and all(
+        t == pt and got.equals(want[OUTPUT_COLUMNS].reset_index(drop=True))
+        for (t, got), (pt, want) in zip(replayed, polls)
+    )
+    span = polls[-1][0] - polls[0][0] + 10
+    rng = np.random.default_rng(1)
+    seeks = []
+    for t in rng.uniform(polls[0][0], polls[-1][0], 50):
+        t0 = time.perf_counter()
+        reader.at(t)
+        seeks.append(time.perf_counter() - t0)
+    reader.close()
+
+    print(f"📼 {len(polls)} polls, {rows} state vectors ({rows / len(polls):.0f} per poll)")
+    print(f"💾 log {size / 1e6:.2f} MB ({size / rows:.1f} B/state) vs Parquet-per-poll ~{parquet_day / 1e6:.1f} MB")
+    print(f"✍️ write {write_s:.2f}s ({write_s / len(polls) * 1e3:.2f} ms/poll)")
+    print(f"▶️ open {open_s * 1e3:.1f} ms, replay {replay_s:.2f}s = {span / replay_s:,.0f}x real time, "
+          f"round-trip exact: {exact}")
+    print(f"⏩ seek (at) median {np.median(seeks) * 1e3:.1f} ms, max {np.max(seeks) * 1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Load-time and memory comparison: legacy sfo_landing_paths.csv vs the Parquet track store.
+
+Run from the repo root:
+    python -m benchmarks.bench_track_store [--repeat 20]
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+import pyarrow as pa
+
+import track_store
+
+
+def measure(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    # tracemalloc only sees Python/NumPy allocations; Arrow buffers come from its own pool
+    arrow_before = pa.total_allocated_bytes()
+    tracemalloc.start()
+    df = fn()
+    peak = tracemalloc.get_traced_memory()[1] + max(0, pa.total_allocated_bytes() - arrow_before)
+    tracemalloc.stop()
+    return min(times), peak, df.memory_usage(deep=True).sum(), len(df)
+
+
+def dir_size(root):
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(root) for f in files)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--csv", default=track_store.LEGACY_CSV)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    root = os.path.join(tempfile.mkdtemp(), "track_store")
+    track_store.convert_csv(args.csv, root)
+    bbox = (-123.2, -121.5, 36.8, 38.3)
+
+    cases = {
+        "csv (read_csv)": lambda: pd.read_csv(args.csv),
+        "csv + parse ts + bbox": lambda: (
+            lambda d: d[d.lon.between(bbox[0], bbox[1]) & d.lat.between(bbox[2], bbox[3])]
+        )(pd.read_csv(args.csv, parse_dates=["timestamp"])),
+        "store (all)": lambda: track_store.read_tracks(root),
+        "store (bbox pushdown)": lambda: track_store.read_tracks(root, bbox=bbox),
+    }
+
+    print(f"on disk: csv {os.path.getsize(args.csv) / 1e6:.2f} MB, store {dir_size(root) / 1e6:.2f} MB\n")
+    print(f"{'case':<24}{'rows':>9}{'best ms':>10}{'peak MB':>10}{'frame MB':>10}")
+    for name, fn in cases.items():
+        best, peak, frame, rows = measure(fn, args.repeat)
+        print(f"{name:<24}{rows:>9}{best * 1e3:>10.1f}{peak / 1e6:>10.2f}{frame / 1e6:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Pipeline benchmark suite on synthetic approach traffic.
+
+Generates deterministic tracks (benchmarks.synthetic) at each requested
+scale and times every stage — store load, segmentation, classify_flights,
+crop_to_approach, build_dense_reference, go-around detection, density
+features and API response parsing — reporting the best wall time over
+--repeat runs and the peak memory of one traced run (Python/NumPy via
+tracemalloc plus Arrow's pool). Results are written to
+benchmarks/results/<commit>.json so a later run can --compare against them.
+
+Run from the repo root:
+    python -m benchmarks.run_benchmarks --scales 10k,1M
+    python -m benchmarks.run_benchmarks --scales 1M --compare HEAD~1
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pyarrow as pa
+
+import build_path
+import track_store
+from benchmarks.synthetic import fr24_snapshot, generate_tracks, opensky_states, parse_count
+from density_features import density_features
+from fetch_live_data import decode_states
+from FR24_inbound_sfo import snapshot_records
+from goaround_detector import detect_goarounds
+from segmentation import segment_flights
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+REGRESSION = 1.25   # flag stages this much slower than the baseline...
+MIN_DELTA_S = 0.005  # ...and by more than this, so millisecond jitter is not flagged
+
+
+def measure(fn, repeat):
+    """(best seconds, peak bytes) for fn(); the traced run is extra and not timed."""
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    arrow_before = pa.total_allocated_bytes()
+    tracemalloc.start()
+    result = fn()
+    # Arrow buffers still referenced by the result (tracemalloc does not see Arrow's pool)
+    arrow = max(0, pa.total_allocated_bytes() - arrow_before)
+    peak = tracemalloc.get_traced_memory()[1] + arrow
+    tracemalloc.stop()
+    del result
+    return min(times), peak
+
+
+def stages(n_points, seed=0):
+    """Build inputs once per scale and return {stage: zero-arg callable}."""
+    points, _ = generate_tracks(n_points, seed)
+    root = os.path.join(tempfile.mkdtemp(), "track_store")
+    track_store.write_tracks(points, root)
+
+    segmented, _ = segment_flights(points)
+    df_clean, _ = build_path.filter_classified(segmented)
+    df_28r = df_clean[df_clean["runway"] == "28R"]
+    merge_lat, merge_lon = build_path.MERGE_POINTS["28R"]
+
+    # one landing time per flight (last point) for the density features
+    last = np.r_[np.flatnonzero(np.diff(segmented["flight_id"].to_numpy())), len(segmented) - 1]
+    landing_t = segmented["timestamp"].to_numpy()[last]
+    landing_rw = build_path.classify_flights(segmented)[0][last]
+
+    n_msgs = max(1, n_points // 100)
+    states = opensky_states(min(n_msgs, 20_000), seed)
+    snapshot = fr24_snapshot(min(n_msgs, 20_000), seed)
+    snapshot_time = datetime.fromtimestamp(int(points["timestamp"].iloc[0]), timezone.utc)
+
+    return {
+        "load (track store)": lambda: track_store.read_tracks(root),
+        "segment_flights": lambda: segment_flights(points),
+        "classify_flights": lambda: build_path.classify_flights(segmented),
+        "crop_to_approach 28R": lambda: build_path.crop_to_approach(df_28r, merge_lat, merge_lon, "28R"),
+        "build_dense_reference 28R": lambda: build_path.build_dense_reference(df_clean, "28R"),
+        "detect_goarounds": lambda: detect_goarounds(segmented),
+        "density_features": lambda: density_features(landing_t, None, landing_rw),
+        f"decode_states ({len(states)})": lambda: decode_states(states),
+        f"fr24 snapshot_records ({len(snapshot['data'])})": lambda: snapshot_records(snapshot_time, snapshot),
+    }
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                               capture_output=True, text=True).stdout.strip()
+        return out.stdout.strip() + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def load_baseline(ref):
+    """Results for a commit ref (resolved via git) or a results JSON path."""
+    path = ref if ref.endswith(".json") else None
+    if path is None:
+        try:
+            sha = subprocess.run(["git", "rev-parse", "--short", ref], capture_output=True, text=True,
+                                 check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            sha = ref
+        path = os.path.join(RESULTS_DIR, f"{sha}.json")
+        if not os.path.exists(path):  # a run on a working tree based on that commit
+            path = os.path.join(RESULTS_DIR, f"{sha}-dirty.json")
+    if not os.path.exists(path):
+        print(f"⚠️ No stored results for {ref} ({path})")
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every pipeline stage on synthetic traffic")
+    parser.add_argument("--scales", default="10k,100k", help="comma-separated point counts, e.g. 10k,1M,50M")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--compare", help="commit ref or results JSON to compare against")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    baseline = load_baseline(args.compare) if args.compare else None
+    commit = git_commit()
+    results = {
+        "commit": commit,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "scales": {},
+    }
+
+    for scale in args.scales.split(","):
+        n = parse_count(scale)
+        print(f"\n📏 {scale} points ({n})")
+        print(f"{'stage':<34}{'best ms':>10}{'peak MB':>10}{'vs base':>10}")
+        rows = {}
+        for name, fn in stages(n, args.seed).items():
+            best, peak = measure(fn, args.repeat)
+            rows[name] = {"seconds": best, "peak_bytes": peak}
+            ratio = ""
+            base = (baseline or {}).get("scales", {}).get(str(n), {}).get(name)
+            if base:
+                r = best / base["seconds"]
+                slower = r > REGRESSION and best - base["seconds"] > MIN_DELTA_S
+                ratio = f"{r:.2f}x" + (" ⚠️" if slower else "")
+            print(f"{name:<34}{best * 1e3:>10.1f}{peak / 1e6:>10.1f}{ratio:>10}")
+        results["scales"][str(n)] = rows
+
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{commit}.json")
+        with open(path, "w") as f:
+            json.dump(results, f, indent=1)
+        print(f"\n💾 Saved results -> {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Deterministic synthetic inbound traffic onto KSFO 28L/28R.
+
+Each flight enters 40–80 km out to the east/south-east, flies to the
+runway's merge fix, follows the shipped reference path down a 3° glide to
+the threshold and either rolls out on the ground (alt 0) or goes around:
+climbing out straight ahead to 3000 ft and leaving the area. Positions get
+lateral noise that tapers to zero at the classification gate (the runway's
+`touchdown` point, which every flight samples exactly) and altitude jitter.
+Everything is generated with whole-array NumPy ops, so 50M points take
+seconds, and the same (n_points, seed) always gives the same frame.
+
+    python -m benchmarks.synthetic --points 1M --out /tmp/synthetic.parquet
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from runways import DEFAULT_AIRPORT, get_airport
+
+CADENCE_S = 4           # seconds between points
+SPEED_MS = 75.0         # ground speed on approach, m/s
+FT_PER_M_GLIDE = np.tan(np.radians(3.0)) / 0.3048
+CRUISE_CAP_FT = 11000
+ROLLOUT_M = 2500
+GA_CLIMB_FT_PER_M = 0.09   # ~550 ft/nm
+GA_LEVEL_FT = 3000
+GA_EXIT_M = 20000
+START_TIME = 1_762_905_600  # 2025-11-12T00:00Z
+MEAN_SEPARATION_S = 90
+
+
+def parse_count(value):
+    """'10k' / '2.5M' / '50000' -> int."""
+    value = str(value).strip()
+    scale = {"k": 1_000, "m": 1_000_000}.get(value[-1].lower(), 1)
+    return int(float(value[:-1] if scale > 1 else value) * scale)
+
+
+def _runway_path(apt, name):
+    """Shared local-xy polyline (merge fix -> gate -> threshold -> GA exit) and key distances."""
+    rw = apt.runways[name]
+    ref = pd.read_csv(rw.ref_path)
+    # ref paths are lon-sorted with vertex 0 at the runway end; fly them east -> west
+    east_to_west = ref.iloc[::-1]
+    east_to_west = east_to_west[east_to_west["lon"] < rw.merge_fix[1]]
+    gate_lat, gate_lon = rw.touchdown
+    lat = np.r_[rw.merge_fix[0], east_to_west["lat"].to_numpy(), gate_lat]
+    lon = np.r_[rw.merge_fix[1], east_to_west["lon"].to_numpy(), gate_lon]
+    x, y = apt.to_local_xy(lat, lon)
+    # keep the gate in lon order along the path so it is flown through, not jumped to
+    order = np.r_[0, 1 + np.argsort(-lon[1:], kind="stable")]
+    x, y = x[order], y[order]
+
+    heading = np.radians(rw.heading_deg)
+    ext = np.array([np.sin(heading), np.cos(heading)]) * GA_EXIT_M
+    x, y = np.r_[x, x[-1] + ext[0]], np.r_[y, y[-1] + ext[1]]
+    cum = np.r_[0, np.cumsum(np.hypot(np.diff(x), np.diff(y)))]
+
+    gx, gy = apt.to_local_xy(gate_lat, gate_lon)
+    gate_d = cum[np.argmin(np.hypot(x - gx, y - gy))]
+    # the ref paths run on past the threshold down the runway; touch down at its projection
+    tx, ty = apt.to_local_xy(*rw.threshold)
+    dx, dy = np.diff(x[:-1]), np.diff(y[:-1])
+    t = np.clip(((tx - x[:-2]) * dx + (ty - y[:-2]) * dy) / np.maximum(dx ** 2 + dy ** 2, 1e-12), 0, 1)
+    seg = np.argmin(np.hypot(x[:-2] + t * dx - tx, y[:-2] + t * dy - ty))
+    threshold_d = cum[seg] + t[seg] * np.hypot(dx[seg], dy[seg])
+    return x, y, cum, gate_d, threshold_d
+
+
+def generate_tracks(n_points, seed=0, ga_rate=0.05, noise_m=40.0, airport=DEFAULT_AIRPORT,
+                    runways=("28L", "28R")):
+    """
+    Return (points, flights): `points` has callsign/lat/lon/alt/timestamp
+    columns like the FR24 tracks (exactly n_points rows); `flights` has the
+    ground truth runway and is_ga per callsign.
+    """
+    rng = np.random.default_rng(seed)
+    apt = get_airport(airport)
+    step = SPEED_MS * CADENCE_S
+    paths = {name: _runway_path(apt, name) for name in runways}
+
+    # --- per-flight parameters (enough flights to cover n_points) ---
+    n_flights = max(1, int(n_points / (70_000 / step)) + 2)
+    rw_idx = rng.integers(0, len(runways), n_flights)
+    is_ga = rng.random(n_flights) < ga_rate
+    entry_km = rng.uniform(40, 80, n_flights)
+    entry_bearing = np.radians(rng.uniform(80, 160, n_flights))   # east .. south-south-east
+    start = START_TIME + np.cumsum(rng.exponential(MEAN_SEPARATION_S, n_flights)).astype(np.int64)
+
+    merge_x = np.array([paths[r][0][0] for r in runways])[rw_idx]
+    merge_y = np.array([paths[r][1][0] for r in runways])[rw_idx]
+    entry_x = merge_x + np.sin(entry_bearing) * entry_km * 1000
+    entry_y = merge_y + np.cos(entry_bearing) * entry_km * 1000
+    entry_len = np.hypot(merge_x - entry_x, merge_y - entry_y)
+    gate_d = np.array([paths[r][3] for r in runways])[rw_idx] + entry_len
+    threshold_d = np.array([paths[r][4] for r in runways])[rw_idx] + entry_len
+    end_d = np.where(is_ga, np.array([paths[r][2][-1] for r in runways])[rw_idx] + entry_len,
+                     threshold_d + ROLLOUT_M)
+
+    # --- sample grid anchored on the gate so every flight has a point exactly there ---
+    first = gate_d - np.floor(gate_d / step) * step
+    counts = (np.floor((end_d - first) / step) + 1).astype(np.int64)
+    flight = np.repeat(np.arange(n_flights), counts)
+    j = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    d = first[flight] + j * step
+
+    # --- positions: entry leg, then the runway's shared polyline ---
+    x = np.empty(len(d))
+    y = np.empty(len(d))
+    on_entry = d < entry_len[flight]
+    frac = d[on_entry] / entry_len[flight][on_entry]
+    fe = flight[on_entry]
+    x[on_entry] = entry_x[fe] + frac * (merge_x[fe] - entry_x[fe])
+    y[on_entry] = entry_y[fe] + frac * (merge_y[fe] - entry_y[fe])
+    for k, name in enumerate(runways):
+        px, py, cum = paths[name][:3]
+        sel = ~on_entry & (rw_idx[flight] == k)
+        along = d[sel] - entry_len[flight][sel]
+        x[sel] = np.interp(along, cum, px)
+        y[sel] = np.interp(along, cum, py)
+
+    # lateral noise, zero at the gate and on the ground
+    to_gate = np.abs(d - gate_d[flight])
+    sigma = noise_m * np.clip(to_gate / 3000, 0, 1)
+    x += rng.normal(0, 1, len(d)) * sigma
+    y += rng.normal(0, 1, len(d)) * sigma
+
+    # --- altitude: 3° glide to the threshold, then ground roll or climb-out ---
+    to_threshold = threshold_d[flight] - d
+    alt = np.minimum(np.maximum(to_threshold, 0) * FT_PER_M_GLIDE, CRUISE_CAP_FT)
+    alt += rng.normal(0, 25, len(d)) * (to_threshold > 0)
+    low_d = threshold_d - 200 / FT_PER_M_GLIDE   # go around at ~200 ft
+    past_low = d > low_d[flight]
+    ga_pts = is_ga[flight] & past_low
+    alt[ga_pts] = np.minimum(200 + (d[ga_pts] - low_d[flight][ga_pts]) * GA_CLIMB_FT_PER_M, GA_LEVEL_FT)
+    alt = np.where(~is_ga[flight] & (to_threshold <= 0), 0, np.maximum(alt, 0))
+
+    lat = apt.reference_point[0] + y / apt.m_per_deg_lat
+    lon = apt.reference_point[1] + x / apt.m_per_deg_lon
+    callsigns = np.array([f"SYN{i:06d}" for i in range(n_flights)])
+
+    points = pd.DataFrame({
+        "callsign": pd.Categorical.from_codes(flight, categories=callsigns),
+        "lat": lat,
+        "lon": lon,
+        "alt": np.round(alt).astype(np.int32),
+        "timestamp": start[flight] + j * CADENCE_S,
+    }).iloc[:n_points].reset_index(drop=True)
+    used = int(flight[min(n_points, len(flight)) - 1]) + 1
+    flights = pd.DataFrame({
+        "callsign": callsigns[:used],
+        "runway": np.array(runways)[rw_idx[:used]],
+        "is_ga": is_ga[:used],
+    })
+    return points, flights
+
+
+def opensky_states(n, seed=0):
+    """Synthetic /states/all `states` rows (list of lists) for decode benchmarks."""
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(36.5, 38.5, n).round(4)
+    lon = rng.uniform(-123.5, -121.5, n).round(4)
+    return [
+        [f"a{i:05x}", f"SYN{i:04d}  ", "United States", START_TIME, START_TIME, lon[i], lat[i],
+         1500.0, False, 80.0, 298.0, -4.0, None, 1520.0, "1200", False, 0]
+        for i in range(n)
+    ]
+
+
+def fr24_snapshot(n, seed=0):
+    """Synthetic FR24 historic flight-positions response with n flights."""
+    rng = np.random.default_rng(seed)
+    return {"data": [
+        {"fr24_id": f"3a{i:06x}", "callsign": f"SYN{i:04d}", "orig_icao": "KLAX",
+         "alt": int(a), "gspeed": 150, "track": 298, "eta": None, "lat": la, "lon": lo}
+        for i, (a, la, lo) in enumerate(zip(rng.integers(0, 11000, n),
+                                             rng.uniform(36.8, 38.3, n), rng.uniform(-123.2, -121.5, n)))
+    ]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic 28L/28R approach tracks")
+    parser.add_argument("--points", default="100k")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--ga-rate", type=float, default=0.05)
+    parser.add_argument("--out", help="write points to CSV or Parquet (by extension)")
+    args = parser.parse_args()
+
+    points, flights = generate_tracks(parse_count(args.points), args.seed, args.ga_rate)
+    print(f"🛩️ {len(points)} points, {len(flights)} flights "
+          f"({flights['runway'].value_counts().to_dict()}, {int(flights['is_ga'].sum())} go-arounds)")
+    if args.out:
+        if args.out.endswith(".parquet"):
+            points.to_parquet(args.out, index=False)
+        else:
+            points.to_csv(args.out, index=False)
+        print(f"💾 Saved -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,121 +1,197 @@
-import math
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
 
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import cartopy.crs as ccrs
-from haversine import haversine
 
-# Load flight data
-df = pd.read_csv("sfo_landing_paths.csv")
+from geo import haversine_km, segment_first, segment_starts
+from instrumentation import count, drain, enable, enabled, merge, stage, timed
+from segmentation import segment_flights
+from runways import DEFAULT_AIRPORT, REGISTRY, get_airport, get_runway
+from track_store import load_tracks, to_epoch_seconds
 
-# --- Step 1: Define merge checkpoints ---
-MERGE_POINTS = {
-    "28L": (37.545, -122.215),   # slightly south, left runway
-    "28R": (37.561, -122.191)    # slightly north, right runway
-}
-TOUCHDOWN_POINTS = {
-    "28L": (37.612, -122.359),  
-    "28R": (37.57, -122.22)
-}
-RADIUS = {"28L": 0.0005, "28R": 0.0005}
+# --- Step 1: Define merge checkpoints (from runways.json) ---
+_SFO = get_airport(DEFAULT_AIRPORT)
+MERGE_POINTS = {name: rw.merge_fix for name, rw in _SFO.approach_runways().items()}
+TOUCHDOWN_POINTS = {name: rw.touchdown for name, rw in _SFO.approach_runways().items()}
+RADIUS = {name: rw.radius_deg for name, rw in _SFO.approach_runways().items()}
+SFO = _SFO.reference_point
 
 
 def in_circle(lat, lon, center, r=RADIUS):
     return np.sqrt((lat - center[0])**2 + (lon - center[1])**2) < r
 
-def classify_flight(sub):
-    # --- distance to merge zones ---
-    dist_l_merge = np.sqrt((sub.lat - MERGE_POINTS["28L"][0])**2 + (sub.lon - MERGE_POINTS["28L"][1])**2)
-    dist_r_merge = np.sqrt((sub.lat - MERGE_POINTS["28R"][0])**2 + (sub.lon - MERGE_POINTS["28R"][1])**2)
-
-    # --- distance to touchdown points ---
-    dist_l_touch = np.sqrt((sub.lat - TOUCHDOWN_POINTS["28L"][0])**2 + (sub.lon - TOUCHDOWN_POINTS["28L"][1])**2)
-    dist_r_touch = np.sqrt((sub.lat - TOUCHDOWN_POINTS["28R"][0])**2 + (sub.lon - TOUCHDOWN_POINTS["28R"][1])**2)
-
-    # Minimum distances (for reference)
-    min_l_merge = dist_l_merge.min()
-    min_r_merge = dist_r_merge.min()
-    min_l_touch = dist_l_touch.min()
-    min_r_touch = dist_r_touch.min()
-
-    # --- classification logic ---
-    within_r = min_r_touch < RADIUS["28R"]  # 28R still uses merge classification
-
-    # 28L: classify based on landing (touchdown) position
-    within_l = min_l_touch < RADIUS["28L"]  # ~0.7 NM, strict touchdown proximity
-
-    if within_l and not within_r:
-        return "28L"
-    if within_r and not within_l:
-        return "28R"
-    if within_l and within_r:
-        # rare: choose whichever it approached closer to at touchdown
-        return "28L" if min_l_touch <= min_r_touch else "28R"
-
-    return None
-
-# --- Step 2: Classify each aircraft ---
-clean_groups = []
-counts = {"28L": 0, "28R": 0, "excluded": 0}
-
-for callsign, sub in df.groupby("callsign"):
-    runway = classify_flight(sub)
-    if runway:
-        counts[runway] += 1
-        sub = sub.assign(runway=runway)
-        clean_groups.append(sub)
-    else:
-        counts["excluded"] += 1
 
-df_clean = pd.concat(clean_groups, ignore_index=True)
-print(f"✅ Filtered dataset: {len(df_clean)} points, {df_clean.callsign.nunique()} flights total.")
-print(f"   28L: {counts['28L']} flights, 28R: {counts['28R']} flights, excluded: {counts['excluded']}")
+def _is_segmented(df, key):
+    """True if df comes from segment_flights: one contiguous, time-ordered slice per flight."""
+    return key == "flight_id" and df[key].is_monotonic_increasing
 
-# --- Step 3: Build smoothed reference path per runway ---
-SFO = (37.6188, -122.375)
 
-def crop_to_approach(sub, merge_lat, merge_lon, runway):
-    sub = sub.sort_values("timestamp").reset_index(drop=True)
-    sub["dist_to_rwy"] = [haversine((lat, lon), SFO) for lat, lon in zip(sub["lat"], sub["lon"])]
+@timed()
+def classify_flights(df, key="flight_id", airport=DEFAULT_AIRPORT):
+    """
+    Tag every flight with a runway in one vectorized pass (any number of runways).
+
+    Distances from all points to every MERGE/TOUCHDOWN point are computed as
+    (n_points, n_runways) arrays and reduced to per-flight minimums with
+    np.minimum.reduceat over points sorted by flight code. A flight is assigned
+    the runway whose touchdown point it passed within RADIUS of; if several
+    qualify, the one it came closest to wins.
+
+    Returns (row_runway, flights): a per-row runway array aligned with df
+    (None = excluded) and a per-flight summary frame.
+    """
+    runways = get_airport(airport).approach_runways()
+    names = list(runways)
+    codes, uniques = pd.factorize(df[key])
+    valid = codes >= 0
+    if _is_segmented(df, key):
+        order = np.arange(len(df))  # already contiguous per flight
+    else:
+        order = np.argsort(codes, kind="stable")[np.count_nonzero(~valid):]  # drop null keys (sorted first)
+    sorted_codes = codes[order]
+    starts = segment_starts(sorted_codes)
+
+    lat = df["lat"].to_numpy(dtype=float)[order, None]
+    lon = df["lon"].to_numpy(dtype=float)[order, None]
+    touch = np.array([runways[r].touchdown for r in names])
+    merge = np.array([runways[r].merge_fix for r in names])
+    radius = np.array([runways[r].radius_deg for r in names])
+
+    # --- distance to merge zones / touchdown points, all runways at once ---
+    dist_merge = np.sqrt((lat - merge[:, 0])**2 + (lon - merge[:, 1])**2)
+    dist_touch = np.sqrt((lat - touch[:, 0])**2 + (lon - touch[:, 1])**2)
+
+    # Minimum distances per flight (rows follow the sorted flight codes)
+    min_merge = np.minimum.reduceat(dist_merge, starts, axis=0) if len(starts) else dist_merge[:0]
+    min_touch = np.minimum.reduceat(dist_touch, starts, axis=0) if len(starts) else dist_touch[:0]
+
+    # --- classification logic: strict touchdown proximity, closest wins on overlap ---
+    within = min_touch < radius
+    best = np.where(within, min_touch, np.inf).argmin(axis=1)
+    flight_runway = np.where(within.any(axis=1), np.array(names, dtype=object)[best], None)
+
+    flights = pd.DataFrame({key: uniques[sorted_codes[starts]], "runway": flight_runway})
+    for k, rw in enumerate(names):
+        flights[f"min_merge_{rw}"] = min_merge[:, k]
+        flights[f"min_touch_{rw}"] = min_touch[:, k]
+
+    # scatter back to rows via the flight codes (no per-group copies)
+    by_code = np.empty(len(uniques), dtype=object)
+    by_code[sorted_codes[starts]] = flight_runway
+    row_runway = np.full(len(df), None, dtype=object)
+    row_runway[valid] = by_code[codes[valid]]
+    if enabled():
+        _count_classified(flight_runway, np.diff(np.r_[starts, len(sorted_codes)]), airport)
+    return row_runway, flights
+
+
+def _count_classified(flight_runway, sizes, airport):
+    """Instrumentation: flights per runway and why the rest were excluded."""
+    tagged = pd.notna(flight_runway)
+    for rw, n in pd.Series(flight_runway[tagged]).value_counts().items():
+        count("classified_flights", int(n), airport=airport, runway=rw)
+    single = ~tagged & (sizes < 2)
+    count("excluded_flights", int(single.sum()), airport=airport, reason="single_point")
+    count("excluded_flights", int((~tagged & ~single).sum()), airport=airport, reason="no_touchdown_pass")
+
+
+def filter_classified(df, key="flight_id", airport=DEFAULT_AIRPORT):
+    """Keep only flights that classify onto a runway, tagged with a `runway` column."""
+    row_runway, flights = classify_flights(df, key=key, airport=airport)
+    tagged = pd.notna(row_runway)
+    df_clean = df[tagged].assign(runway=row_runway[tagged]).reset_index(drop=True)
+    counts = flights["runway"].value_counts().to_dict()
+    counts["excluded"] = int(flights["runway"].isna().sum())
+
+    print(f"✅ {airport}: {len(df_clean)} points, {df_clean[key].nunique()} flights total.")
+    print("   " + ", ".join(f"{rw}: {counts.get(rw, 0)} flights" for rw in get_airport(airport).approach_runways())
+          + f", excluded: {counts['excluded']}")
+    return df_clean, counts
 
-    # --- determine starting point (merge zone or later) ---
-    merge_dist = [haversine((lat, lon), (merge_lat, merge_lon)) for lat, lon in zip(sub["lat"], sub["lon"])]
-    merge_idx = np.argmin(merge_dist)
-    cropped = sub.loc[merge_idx:].copy()
+
+# --- Step 3: Build smoothed reference path per runway ---
+def crop_to_approach(df, merge_lat, merge_lon, runway, key="flight_id", airport=DEFAULT_AIRPORT):
+    """
+    Crop every flight in df to its final-approach segment in one array pass.
+
+    Per flight: start at the point closest to the merge fix, for runways with
+    `inbound_turn` (28L) skip the overflight until the track turns inbound
+    (westbound), then keep the approach window (1–20 km) before the airport.
+    """
+    apt = get_airport(airport)
+    rw = get_runway(airport, runway)
+    near_km, far_km = apt.approach_window_km
+    if _is_segmented(df, key):
+        df = df.reset_index(drop=True)
+    else:
+        df = df.sort_values([key, "timestamp"], kind="stable").reset_index(drop=True)
+    n = len(df)
+    codes = pd.factorize(df[key])[0]
+    starts = segment_starts(codes)
+    sizes = np.diff(np.r_[starts, n])
+    rows = np.arange(n)
+
+    lat = df["lat"].to_numpy(dtype=float)
+    lon = df["lon"].to_numpy(dtype=float)
+    dist = haversine_km(lat, lon, [apt.reference_point, (merge_lat, merge_lon)])
+    df["dist_to_rwy"] = dist[:, 0]
+    merge_dist = dist[:, 1]
+
+    # --- determine starting point (merge zone or later): first per-flight argmin ---
+    seg_min = np.minimum.reduceat(merge_dist, starts) if n else merge_dist
+    merge_idx = segment_first(merge_dist == np.repeat(seg_min, sizes), starts, n)
+    start_idx = merge_idx
 
     # --- 28L special case ---
-    if runway == "28L":
+    if rw.inbound_turn:
         # remove early overflight: before turning inbound (when longitude increasing eastward)
-        lon_diff = cropped["lon"].diff().fillna(0)
-        inbound = lon_diff < 0  # moving west
-        if inbound.any():
-            inbound_start = inbound.idxmax()
-            cropped = cropped.loc[inbound_start:]
+        after_merge = rows > np.repeat(merge_idx, sizes)
+        inbound = after_merge & (np.diff(lon, prepend=np.nan) < 0)  # moving west
+        inbound_start = segment_first(inbound, starts, n)
+        start_idx = np.where(inbound_start < n, inbound_start, merge_idx)
 
+    keep = rows >= np.repeat(start_idx, sizes)
+    if rw.min_lat is not None:
         # remove false loops south of the final path
-        cropped = cropped[cropped["lat"] > 37.53]
+        keep &= lat > rw.min_lat
 
     # --- stop after passing the runway ---
-    cropped = cropped[cropped["dist_to_rwy"] > 1]  # >1 km before runway
-    cropped = cropped[cropped["dist_to_rwy"] < 20]  # within ~20 km of runway
+    keep &= (df["dist_to_rwy"].to_numpy() > near_km) & (df["dist_to_rwy"].to_numpy() < far_km)
+
+    return df[keep].reset_index(drop=True)
+
+
+def approach_points(df, runway, key="flight_id", airport=DEFAULT_AIRPORT):
+    """Cropped approach points of every flight tagged `runway` that has more than 5 of them."""
+    merge_lat, merge_lon = get_runway(airport, runway).merge_fix
+    df_approach = crop_to_approach(df[df.runway == runway], merge_lat, merge_lon, runway, key=key, airport=airport)
 
-    return cropped
+    # drop flights with too few approach points to be meaningful
+    codes = pd.factorize(df_approach[key])[0]
+    if len(codes):
+        per_flight = np.bincount(codes)
+        count("excluded_flights", int((per_flight <= 5).sum()), airport=airport, reason="short_approach")
+        df_approach = df_approach[per_flight[codes] > 5].reset_index(drop=True)
+    return df_approach
 
 
-def build_dense_reference(df, runway, bins=250):
+def approach_leg(dist, starts, n):
+    """Rows up to each flight's closest point to the airport (drops a climb-out back through the window)."""
+    sizes = np.diff(np.r_[starts, n])
+    seg_min = np.minimum.reduceat(dist, starts) if n else dist
+    closest = segment_first(dist == np.repeat(seg_min, sizes), starts, n)
+    return np.arange(n) <= np.repeat(closest, sizes)
+
+
+def build_dense_reference(df, runway, bins=250, key="flight_id", airport=DEFAULT_AIRPORT):
     """Build smooth path only from approach segments."""
-    merge_lat, merge_lon = MERGE_POINTS[runway]
-    grouped = []
-    for callsign, sub in df[df.runway == runway].groupby("callsign"):
-        cropped = crop_to_approach(sub, merge_lat, merge_lon, runway)
-        if len(cropped) > 5:
-            grouped.append(cropped)
-
-    if not grouped:
-        return pd.DataFrame()
+    df_approach = approach_points(df, runway, key=key, airport=airport)
 
-    df_approach = pd.concat(grouped, ignore_index=True)
+    if df_approach.empty:
+        return pd.DataFrame()
 
     # Bin longitudinally, but keep many bins for density
     df_approach["lon_bin"] = pd.cut(df_approach["lon"], bins=bins)
@@ -127,39 +203,142 @@ def build_dense_reference(df, runway, bins=250):
     )
     return path
 
-runways = {}
-for rw in ["28L", "28R"]:
-    path = build_dense_reference(df_clean, rw)
-    if not path.empty:
-        runways[rw] = path
-        path.to_csv(f"ref_path_{rw}.csv", index=False)
-        print(f"✅ Built reference path for {rw}: {len(path)} points (final approach only).")
-    else:
-        print(f"⚠️ No valid approach path for {rw}.")
-
-print("\nRunway summary:")
-for k, v in runways.items():
-    print(f"  {k}: {len(v)} reference points (approach phase)")
-
-
-df_all = pd.read_csv("sfo_landing_paths.csv")
-path_28L = pd.read_csv("ref_path_28L.csv")
-path_28R = pd.read_csv("ref_path_28R.csv")
-
-# Create plot
-plt.figure(figsize=(9, 9))
-ax = plt.axes(projection=ccrs.PlateCarree())
-ax.set_extent([-123.2, -121.5, 36.8, 38.3])
-ax.coastlines()
-ax.gridlines(draw_labels=True)
-
-# Plot raw points (black)
-plt.scatter(df_all["lon"], df_all["lat"], s=1, color="black", alpha=0.3, transform=ccrs.PlateCarree(), label="All Flights")
-
-# Plot runway reference paths
-plt.plot(path_28L["lon"], path_28L["lat"], color="red", linewidth=2.5, label="Runway 28L Path", transform=ccrs.PlateCarree())
-plt.plot(path_28R["lon"], path_28R["lat"], color="blue", linewidth=2.5, label="Runway 28R Path", transform=ccrs.PlateCarree())
 
-plt.title("SFO Inbound Flight Paths with Runway 28L and 28R References", fontsize=12)
-plt.legend(loc="lower left")
-plt.show()
+def plot_references(df_all, airport=DEFAULT_AIRPORT, bbox=(-123.2, -121.5, 36.8, 38.3), zoom=11):
+    """Raw tracks as one rasterized density image with the runway reference paths on top."""
+    import cartopy.crs as ccrs
+    import matplotlib.pyplot as plt
+
+    from render import draw_density, frame_version, render_grid
+
+    lon, lat = df_all["lon"].to_numpy(dtype=float), df_all["lat"].to_numpy(dtype=float)
+    flight = df_all["flight_id"].to_numpy() if "flight_id" in df_all.columns else None
+    grid = render_grid(lon, lat, bbox, zoom, flight, version=frame_version(lon, lat))
+    ref_paths = {
+        f"Runway {name} Path": pd.read_csv(rw.ref_path)
+        for name, rw in get_airport(airport).approach_runways().items()
+        if rw.ref_path and os.path.exists(rw.ref_path)
+    }
+
+    # Create plot
+    plt.figure(figsize=(9, 9))
+    ax = plt.axes(projection=ccrs.PlateCarree())
+    ax.set_extent(bbox)
+    ax.coastlines()
+    ax.gridlines(draw_labels=True)
+    draw_density(ax, grid, bbox, ref_paths=ref_paths, transform=ccrs.PlateCarree())
+
+    plt.title("SFO Inbound Flight Paths with Runway 28L and 28R References", fontsize=12)
+    plt.show()
+
+
+# --- Step 4: Fan out (airport, runway) builds over a process pool ---
+def _to_shared(arrays):
+    """Copy named arrays into shared memory once; workers map them read-only."""
+    handles, specs = [], {}
+    for name, arr in arrays.items():
+        arr = np.ascontiguousarray(arr)
+        shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        np.ndarray(arr.shape, arr.dtype, buffer=shm.buf)[:] = arr
+        handles.append(shm)
+        specs[name] = (shm.name, arr.shape, arr.dtype.str)
+    return handles, specs
+
+
+def _build_worker(specs, airport, runway, runway_code, bins, metrics=False):
+    if metrics:
+        enable()  # fresh registry (a forked worker inherits the parent's); drained back with the result
+    shms = {name: shared_memory.SharedMemory(name=spec[0]) for name, spec in specs.items()}
+    view = None
+    try:
+        view = {name: np.ndarray(spec[1], np.dtype(spec[2]), buffer=shms[name].buf)
+                for name, spec in specs.items()}
+        mask = view[f"runway_{airport}"] == runway_code
+        sub = pd.DataFrame({
+            "flight": view["flight"][mask],
+            "lat": view["lat"][mask],
+            "lon": view["lon"][mask],
+            "timestamp": view["timestamp"][mask],
+        })
+        sub["runway"] = runway
+        with stage("build_dense_reference", airport=airport, runway=runway):
+            path = build_dense_reference(sub, runway, bins=bins, key="flight", airport=airport)
+        return airport, runway, path, drain()
+    finally:
+        del view
+        for shm in shms.values():
+            shm.close()
+
+
+@timed()
+def build_references(df, airports=None, bins=250, workers=None, key="flight_id"):
+    """
+    Classify flights per airport, then build every (airport, runway) reference
+    path in parallel. Track columns are placed in shared memory once instead of
+    pickling a DataFrame per task. Returns {(airport, runway): path}.
+    """
+    airports = airports or list(REGISTRY)
+    arrays = {
+        "flight": pd.factorize(df[key])[0].astype(np.int32),
+        "lat": df["lat"].to_numpy(dtype=np.float64),
+        "lon": df["lon"].to_numpy(dtype=np.float64),
+        "timestamp": to_epoch_seconds(df["timestamp"]),
+    }
+    tasks = []
+    for icao in airports:
+        names = list(get_airport(icao).approach_runways())
+        row_runway, _ = classify_flights(df, key=key, airport=icao)
+        arrays[f"runway_{icao}"] = pd.Categorical(row_runway, categories=names).codes.astype(np.int16)
+        tasks += [(icao, name, i) for i, name in enumerate(names)]
+
+    handles, specs = _to_shared(arrays)
+    try:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            futures = [pool.submit(_build_worker, specs, icao, name, code, bins, enabled())
+                       for icao, name, code in tasks]
+            results = {}
+            for future in futures:
+                icao, name, path, metrics = future.result()
+                merge(metrics)
+                results[(icao, name)] = path
+    finally:
+        for shm in handles:
+            shm.close()
+            shm.unlink()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build reference approach paths per runway")
+    parser.add_argument("--airports", help="comma-separated ICAO codes (default: all in runways.json)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--bins", type=int, default=250)
+    parser.add_argument("--no-plot", action="store_true")
+    args = parser.parse_args()
+
+    # Load flight data (columnar store, falling back to the legacy CSV), split into flights
+    with stage("load_tracks"):
+        tracks = load_tracks()
+    df, _ = segment_flights(tracks)
+    airports = args.airports.split(",") if args.airports else None
+    paths = build_references(df, airports, bins=args.bins, workers=args.workers)
+
+    runways = {}
+    for (icao, rw), path in paths.items():
+        if not path.empty:
+            runways[(icao, rw)] = path
+            path.to_csv(get_runway(icao, rw).ref_path, index=False)
+            print(f"✅ Built reference path for {icao} {rw}: {len(path)} points (final approach only).")
+        else:
+            print(f"⚠️ No valid approach path for {icao} {rw}.")
+
+    print("\nRunway summary:")
+    for (icao, rw), v in runways.items():
+        print(f"  {icao} {rw}: {len(v)} reference points (approach phase)")
+
+    if not args.no_plot:
+        plot_references(df)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Single entry point for the pipeline scripts.
+
+    goaround <command> [options]      # after `pip install -e .`
+    python cli.py <command> [options]
+
+Each command is a module's own main() with its usual options
+(`goaround build-paths --help`). The module is imported only when its
+command runs, so `goaround --help` and the light commands never load the
+plotting or geo stacks.
+
+Options before the command switch on instrumentation for the run:
+
+    goaround --metrics data/metrics build-paths          # metrics.jsonl + goaround.prom
+    goaround --metrics data/metrics --profile classify_flights --trace-memory build_matrix model build
+"""
+import importlib
+import os
+import sys
+import time
+
+# command -> (module, description)
+COMMANDS = {
+    "analogs": ("analog_index", "build or query the similar-approach index"),
+    "backfill": ("backfill", "resumable sharded FR24 inbound-snapshot backfill"),
+    "build-paths": ("build_path", "build runway reference approach paths"),
+    "features": ("features_synthetic_density", "streaming traffic-density features"),
+    "fetch-inbound": ("FR24_inbound_sfo", "fetch FR24 inbound SFO snapshots"),
+    "fetch-tracks-2019": ("fetch_landingpaths", "fetch OpenSky tracks for 2019 KSFO landings"),
+    "goarounds": ("goaround_detector", "detect go-arounds in stored tracks"),
+    "incremental": ("incremental_reference", "fold new tracks into the reference paths"),
+    "live": ("main", "fetch live flights and extract KSFO go-arounds"),
+    "model": ("goaround_model", "build the training matrix, train or batch-score the go-around model"),
+    "plot-paths": ("plot_sfo_landing_paths", "fetch recent FR24 tracks and plot them"),
+    "plot-runways": ("plot", "plot inbound snapshots by guessed runway"),
+    "render": ("render", "render a density map of the stored tracks"),
+    "score": ("live_scorer", "live go-around risk scoring"),
+    "segment": ("segmentation", "split stored tracks into flights"),
+    "snapshots": ("snapshot_log", "record live polls to a compact snapshot log, or inspect one"),
+    "shrink": ("track_filter", "clip and simplify stored tracks"),
+    "stability": ("stability_features", "per-approach stability features (cached)"),
+    "store": ("track_store", "convert the legacy CSV into the track store"),
+}
+
+
+# instrumentation options accepted before the command -> enable() keyword
+GLOBAL_OPTIONS = {"--metrics": "metrics", "--profile": "profile", "--trace-memory": "trace_memory"}
+
+
+def usage():
+    width = max(map(len, COMMANDS))
+    lines = ["usage: goaround [--metrics DIR] [--profile STAGES] [--trace-memory STAGES] <command> [options]",
+             "", "commands:"]
+    lines += [f"  {name:<{width}}  {desc}" for name, (_, desc) in COMMANDS.items()]
+    return "\n".join(lines)
+
+
+def enable_instrumentation(command, options):
+    """Record stage timings/counters for this run into the --metrics directory."""
+    import instrumentation
+
+    out = options.get("metrics") or "data/metrics"
+    stages = lambda key: [s for s in options.get(key, "").split(",") if s]
+    return instrumentation.enable(
+        jsonl=os.path.join(out, "metrics.jsonl"), prom=os.path.join(out, "goaround.prom"),
+        profile=stages("profile"), trace_memory=stages("trace_memory"), profile_dir=out,
+        run=f"{command}-{time.strftime('%Y%m%dT%H%M%S')}",
+    )
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    options = {}
+    while argv and argv[0] in GLOBAL_OPTIONS and len(argv) > 1:
+        options[GLOBAL_OPTIONS[argv[0]]] = argv[1]
+        argv = argv[2:]
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        return 0
+    command, rest = argv[0], argv[1:]
+    if command not in COMMANDS:
+        print(f"❌ Unknown command {command!r}\n\n{usage()}", file=sys.stderr)
+        return 2
+
+    registry = enable_instrumentation(command, options) if options else None
+    module = importlib.import_module(COMMANDS[command][0])
+    # the module's argparse reads sys.argv; make its usage line read `goaround <command>`
+    sys.argv = [f"goaround {command}"] + rest
+    try:
+        return module.main()
+    finally:
+        if registry is not None:
+            import instrumentation
+
+            instrumentation.flush()
+            print(f"📈 Metrics -> {registry.jsonl}, {registry.prom}\n{instrumentation.summary()}")
+            instrumentation.disable()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""
+Sliding-window traffic density around each landing.
+
+For every arrival, count the other arrivals at the same airport (and on the
+same runway) within trailing and leading windows such as ±5/15/60 minutes.
+Timestamps are sorted once per call and every window is two np.searchsorted
+passes, so all windows together are O(n log n) with no merges; event_counts
+does the lookups for a batch of events against keys sorted once, so a
+streaming pipeline can count chunk by chunk. LiveDensity
+gives the same trailing counts incrementally for a live arrival stream, and
+trailing_counts the batch equivalent for arbitrary query times.
+"""
+from bisect import bisect_left, insort
+from collections import defaultdict, deque
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_WINDOWS_MIN = (5, 15, 60)
+
+
+def window_counts(times, windows_s, groups=None):
+    """
+    Trailing/leading event counts per window, excluding the event itself.
+
+    times:     int64 epoch seconds (any order)
+    windows_s: window lengths in seconds
+    groups:    optional int codes; events only count others in the same group
+    Returns {("prev"|"next", w): int32 array aligned with `times`}.
+    """
+    times = np.asarray(times, dtype=np.int64)
+    n = len(times)
+    if n == 0:
+        return {(side, w): np.zeros(0, dtype=np.int32) for w in windows_s for side in ("prev", "next")}
+
+    # fold the group into the sort key so one sorted array serves every group
+    t0, stride = fold_params(times, windows_s)
+    key = fold_keys(times, groups, t0, stride)
+    order = np.argsort(key)
+    sorted_key = key[order]
+
+    out = {}
+    for col, counts in event_counts(sorted_key, sorted_key, windows_s).items():
+        aligned = np.empty(n, dtype=np.int32)
+        aligned[order] = counts
+        out[col] = aligned
+    return out
+
+
+def fold_params(times, windows_s):
+    """(t0, stride) for fold_keys: groups `stride` apart can never fall in each other's windows."""
+    return int(times.min()), int(times.max() - times.min()) + 2 * int(max(windows_s)) + 1
+
+
+def fold_keys(times, groups, t0, stride):
+    """Sort keys with the group code folded in: group * stride + (t - t0)."""
+    key = np.asarray(times, dtype=np.int64) - t0
+    return key if groups is None else key + np.asarray(groups, dtype=np.int64) * stride
+
+
+def event_counts(sorted_key, query_key, windows_s):
+    """
+    window_counts for events looked up by key: `query_key` are keys of events
+    that are themselves in the sorted `sorted_key` (each excludes itself), so
+    a batch of events can be counted against all of them.
+    Returns {("prev"|"next", w): int32 array aligned with `query_key`}.
+    """
+    lo_self = np.searchsorted(sorted_key, query_key, side="left")
+    hi_self = np.searchsorted(sorted_key, query_key, side="right")
+    out = {}
+    for w in windows_s:
+        w = int(w)
+        out[("prev", w)] = (hi_self - np.searchsorted(sorted_key, query_key - w, side="left") - 1).astype(np.int32)
+        out[("next", w)] = (np.searchsorted(sorted_key, query_key + w, side="right") - lo_self - 1).astype(np.int32)
+    return out
+
+
+def trailing_counts(event_times, query_times, windows_s, event_groups=None, query_groups=None):
+    """
+    Events in [t - w, t) before each query time, per window (same group only when given).
+
+    Same folded-key idea as window_counts, for queries that are not events
+    themselves (e.g. every track point against the arrival times).
+    Returns {w: int32 array aligned with `query_times`}.
+    """
+    event_times = np.asarray(event_times, dtype=np.int64)
+    query_times = np.asarray(query_times, dtype=np.int64)
+    if len(event_times) == 0 or len(query_times) == 0:
+        return {w: np.zeros(len(query_times), dtype=np.int32) for w in windows_s}
+
+    max_w = int(max(windows_s))
+    t0 = min(event_times.min(), query_times.min())
+    stride = int(max(event_times.max(), query_times.max()) - t0) + 2 * max_w + 1
+    event_key = event_times - t0
+    query_key = query_times - t0
+    if event_groups is not None:
+        event_key = event_key + np.asarray(event_groups, dtype=np.int64) * stride
+        query_key = query_key + np.asarray(query_groups, dtype=np.int64) * stride
+    event_key = np.sort(event_key)
+
+    end = np.searchsorted(event_key, query_key, side="left")
+    return {w: (end - np.searchsorted(event_key, query_key - int(w), side="left")).astype(np.int32)
+            for w in windows_s}
+
+
+def density_features(times, airports=None, runways=None, windows_min=DEFAULT_WINDOWS_MIN):
+    """
+    Arrival-density columns for every landing.
+
+    `times` are epoch seconds; `airports`/`runways` are array-likes aligned with
+    them (None = single airport / no runway split). Missing times get -1.
+    Columns: arrivals_{prev,next}_{w}m and, with runways, rwy_arrivals_{prev,next}_{w}m.
+    """
+    times = np.asarray(times, dtype=np.int64)
+    valid = times >= 0
+    windows_s = [int(w) * 60 for w in windows_min]
+    airport_codes = pd.factorize(pd.Series(airports))[0] if airports is not None else np.zeros(len(times), np.int64)
+
+    cols = {}
+    per_airport = window_counts(times[valid], windows_s, airport_codes[valid])
+    for (side, w), counts in per_airport.items():
+        full = np.full(len(times), -1, dtype=np.int32)
+        full[valid] = counts
+        cols[f"arrivals_{side}_{w // 60}m"] = full
+
+    if runways is not None:
+        # combined (airport, runway) code; rows without a runway are left at -1
+        rw = pd.Series(runways)
+        pair_codes = pd.factorize(pd.Series(airport_codes).astype(str) + "|" + rw.astype(str))[0]
+        rw_valid = valid & rw.notna().to_numpy()
+        per_runway = window_counts(times[rw_valid], windows_s, pair_codes[rw_valid])
+        for (side, w), counts in per_runway.items():
+            full = np.full(len(times), -1, dtype=np.int32)
+            full[rw_valid] = counts
+            cols[f"rwy_arrivals_{side}_{w // 60}m"] = full
+    return pd.DataFrame(cols)
+
+
+class LiveDensity:
+    """
+    Incremental trailing-window counts for a live stream of arrivals.
+
+    Keeps each (airport, runway) key's recent arrival times sorted and drops
+    anything older than the largest window.
+    """
+
+    def __init__(self, windows_min=DEFAULT_WINDOWS_MIN):
+        self.windows_s = [int(w) * 60 for w in windows_min]
+        self.horizon = max(self.windows_s)
+        self.events = defaultdict(deque)
+
+    def _prune(self, q, now):
+        while q and q[0] < now - self.horizon:
+            q.popleft()
+
+    def add(self, t, airport="", runway=None):
+        """Record an arrival (out-of-order arrivals are inserted in place)."""
+        for key in ((airport, None), (airport, runway)) if runway is not None else ((airport, None),):
+            q = self.events[key]
+            if q and t < q[-1]:
+                items = list(q)
+                insort(items, t)
+                self.events[key] = q = deque(items)
+            else:
+                q.append(t)
+            self._prune(q, q[-1])
+
+    def counts(self, t, airport="", runway=None):
+        """Arrivals in the trailing windows before t (airport-wide and, if given, per runway)."""
+        out = {}
+        keys = [("arrivals", (airport, None))]
+        if runway is not None:
+            keys.append(("rwy_arrivals", (airport, runway)))
+        for prefix, key in keys:
+            times = list(self.events.get(key, ()))
+            end = bisect_left(times, t)
+            for w in self.windows_s:
+                out[f"{prefix}_prev_{w // 60}m"] = end - bisect_left(times, t - w)
+        return out
@@ -1,56 +1,245 @@
 # features_synthetic_density.py
+#
+# Two-pass streaming feature pipeline over the go-around dataset.
+#   pass 1: read row batches, hash-aggregate landings per (airport, hour)
+#           and per (airport, hour, runway), and collect the landing times
+#   between: sort the landing times once per grouping (airport, and
+#            airport+runway) with the group folded into the key
+#   pass 2: re-read the batches, count each batch's sliding-window arrivals
+#           (±5/15/60 min by default) against the sorted keys with
+#           density_features.event_counts, attach them and the derived
+#           features and append each batch to one Parquet file
+# Memory is bounded by the chunk size, the aggregate tables and two sorted
+# int64 keys per landing, so the full multi-airport go_arounds_augmented.csv
+# runs as well as KSFO alone. Pass 1 also settles one dtype per column
+# (csv_dtypes) so every pass-2 batch parses, and writes, the same schema.
+#
+#   python features_synthetic_density.py --input data/go_arounds_augmented.csv
+#   python features_synthetic_density.py --airports KSFO --plot
+
+import argparse
 
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-
-sfo = pd.read_csv("data/sfo_goarounds.csv", low_memory=False)
-
-# Clean & time parsing
-sfo["time"] = pd.to_datetime(sfo["time"], utc=True, errors="coerce")
-sfo["hour"] = sfo["time"].dt.hour
-sfo["date"] = sfo["time"].dt.date
-
-# Hourly landing density (approximate traffic)
-hourly_counts = (
-    sfo.groupby(["date", "hour"])["icao24"]
-    .count()
-    .reset_index(name="traffic_density_hour")
-)
-
-sfo = sfo.merge(hourly_counts, on=["date", "hour"], how="left")
-
-# Runway-specific density
-if "runway" in sfo.columns:
-    runway_counts = (
-        sfo.groupby(["date", "hour", "runway"])["icao24"]
-        .count()
-        .reset_index(name="runway_activity")
-    )
-    sfo = sfo.merge(runway_counts, on=["date", "hour", "runway"], how="left")
-
-# Training-flight indicator
-sfo["is_training_flight"] = (sfo["n_approaches"] > 2).astype(int)
-
-# Synthetic Poisson traffic metric (adds small stochastic variation)
-rng = np.random.default_rng(seed=42)
-sfo["synthetic_density"] = rng.poisson(
-    lam=(sfo["traffic_density_hour"] / sfo["traffic_density_hour"].mean()).fillna(1)
-)
-
-# Inspect results
-print(sfo[["time", "runway", "has_ga", "traffic_density_hour",
-           "runway_activity", "synthetic_density"]].head())
-
-# Save feature-enriched version
-sfo.to_csv("data/sfo_goarounds_features.csv", index=False)
-print("💾 Saved enriched dataset -> data/sfo_goarounds_features.csv")
-
-
-plt.figure(figsize=(6,4))
-sfo.groupby("runway_activity")["has_ga"].mean().plot(marker="o")
-plt.title("Go-around rate vs. runway traffic density")
-plt.xlabel("Runway activity (flights/hour)")
-plt.ylabel("Go-around rate")
-plt.grid(True, alpha=0.3)
-plt.show()
\ No newline at end of file
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from density_features import DEFAULT_WINDOWS_MIN, event_counts, fold_keys, fold_params
+
+INPUT = "data/sfo_goarounds.csv"
+OUTPUT = "data/sfo_goarounds_features.parquet"
+CHUNK_ROWS = 500_000
+# always text, whatever a batch holds (an all-empty batch would otherwise parse as float)
+TEXT_COLUMNS = {"time": "string", "airport": "string", "icao24": "string", "callsign": "string", "runway": "string"}
+DERIVED_COLUMNS = {"hour", "date", "hour_key", "epoch_s"}
+
+
+def iter_chunks(path, airports=None, chunk_rows=CHUNK_ROWS, dtypes=None):
+    """Yield parsed row batches, optionally restricted to some airports."""
+    dtypes = {**TEXT_COLUMNS, **(dtypes or {})}
+    for chunk in pd.read_csv(path, chunksize=chunk_rows, low_memory=False, dtype=dtypes):
+        if "airport" not in chunk.columns:
+            chunk["airport"] = ""
+        if airports:
+            chunk = chunk[chunk["airport"].isin(airports)]
+            if chunk.empty:
+                continue
+        # Clean & time parsing (vectorized ISO parse, bad values -> NaT)
+        chunk["time"] = pd.to_datetime(chunk["time"], utc=True, errors="coerce", format="ISO8601")
+        chunk["hour"] = chunk["time"].dt.hour
+        chunk["date"] = chunk["time"].dt.date
+        # one int key per calendar hour; NaT -> -1 never matches a real hour
+        hours = (chunk["time"] - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(hours=1)
+        chunk["hour_key"] = hours.fillna(-1).astype("int64")
+        seconds = (chunk["time"] - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(seconds=1)
+        chunk["epoch_s"] = seconds.fillna(-1).astype("int64")
+        yield chunk
+
+
+def csv_dtypes(kinds, has_nulls):
+    """
+    One read_csv dtype per column from the dtype kinds pandas inferred for
+    each batch (batches where the column was all empty are not counted).
+    """
+    dtypes = {}
+    for col, seen in kinds.items():
+        if seen and seen <= {"b"} and not has_nulls[col]:
+            dtypes[col] = "bool"
+        elif seen and seen <= {"i", "u"} and not has_nulls[col]:
+            dtypes[col] = "int64"
+        elif seen and seen <= {"i", "u", "f"}:
+            dtypes[col] = "float64"
+        else:
+            dtypes[col] = "string"
+    return dtypes
+
+
+def encode(values, ids):
+    """Int codes that stay stable across batches (new values get the next code); missing -> -1."""
+    codes, uniques = pd.factorize(values)
+    lookup = np.array([ids.setdefault(u, len(ids)) for u in uniques], dtype=np.int64)
+    return np.where(codes >= 0, lookup[np.maximum(codes, 0)] if len(lookup) else -1, -1)
+
+
+class ArrivalKeys:
+    """
+    Every landing's time, sorted once per grouping (airport, airport+runway)
+    with the group folded into the key; counts() gives a batch's
+    sliding-window arrivals against them, like density_features.
+    """
+
+    def __init__(self, times, airport_codes, airport_ids, pair_codes, pair_ids, windows_min):
+        self.windows_s = [int(w) * 60 for w in windows_min]
+        self.airport_ids, self.pair_ids = airport_ids, pair_ids
+        self.t0, self.stride = fold_params(times, self.windows_s) if len(times) else (0, 1)
+        self.airport_keys = np.sort(fold_keys(times, airport_codes, self.t0, self.stride))
+        self.pair_keys = None
+        if pair_codes is not None:
+            has = pair_codes >= 0
+            self.pair_keys = np.sort(fold_keys(times[has], pair_codes[has], self.t0, self.stride))
+
+    def _columns(self, prefix, sorted_key, times, codes, n):
+        valid = (times >= 0) & (codes >= 0)
+        counts = event_counts(sorted_key, fold_keys(times[valid], codes[valid], self.t0, self.stride), self.windows_s)
+        cols = {}
+        for (side, w), c in counts.items():
+            full = np.full(n, np.nan, dtype=np.float32)   # no time / no runway -> NaN
+            full[valid] = c
+            cols[f"{prefix}_{side}_{w // 60}m"] = full
+        return cols
+
+    def counts(self, chunk):
+        """arrivals_{prev,next}_{w}m (and rwy_...) columns for one batch from iter_chunks."""
+        times = chunk["epoch_s"].to_numpy()
+        codes = chunk["airport"].map(self.airport_ids).fillna(-1).to_numpy(dtype=np.int64)
+        cols = self._columns("arrivals", self.airport_keys, times, codes, len(chunk))
+        if self.pair_keys is not None:
+            pairs = (chunk["airport"] + "|" + chunk["runway"]).map(self.pair_ids)
+            cols.update(self._columns("rwy_arrivals", self.pair_keys, times,
+                                      pairs.fillna(-1).to_numpy(dtype=np.int64), len(chunk)))
+        return cols
+
+
+def count_landings(path, airports=None, chunk_rows=CHUNK_ROWS, windows_min=DEFAULT_WINDOWS_MIN):
+    """
+    Pass 1: landings per (airport, hour_key) and per (airport, hour_key, runway),
+    the landing times as ArrivalKeys for sliding windows and the dtype of
+    every other column (csv_dtypes).
+    """
+    hourly, by_runway = [], []
+    times, airport_codes, pair_codes = [], [], []
+    airport_ids, pair_ids = {}, {}
+    has_runway = False
+    kinds, has_nulls = {}, {}
+    for chunk in iter_chunks(path, airports, chunk_rows):
+        for col in chunk.columns.difference([*TEXT_COLUMNS, *DERIVED_COLUMNS]):
+            nulls = chunk[col].isna()
+            has_nulls[col] = has_nulls.get(col, False) or bool(nulls.any())
+            kinds.setdefault(col, set())
+            if not nulls.all():
+                kinds[col].add(chunk[col].dtype.kind)
+        valid = chunk[chunk["hour_key"] >= 0]
+        hourly.append(valid.groupby(["airport", "hour_key"]).size())
+        times.append(valid["epoch_s"].to_numpy())
+        airport_codes.append(encode(valid["airport"], airport_ids))
+        if "runway" in chunk.columns:
+            has_runway = True
+            by_runway.append(valid.groupby(["airport", "hour_key", "runway"]).size())
+            pair_codes.append(encode(valid["airport"] + "|" + valid["runway"], pair_ids))
+
+    def combine(parts):
+        # per-chunk partial counts for the same key are summed
+        return pd.concat(parts).groupby(level=list(range(parts[0].index.nlevels))).sum() if parts else None
+
+    arrivals = None
+    if times:
+        arrivals = ArrivalKeys(np.concatenate(times), np.concatenate(airport_codes), airport_ids,
+                               np.concatenate(pair_codes) if has_runway else None, pair_ids, windows_min)
+    return combine(hourly), combine(by_runway) if has_runway else None, arrivals, csv_dtypes(kinds, has_nulls)
+
+
+def lookup(counts, keys):
+    """Vectorized join of a count table onto row keys (missing -> 0)."""
+    idx = counts.index.get_indexer(pd.MultiIndex.from_arrays(keys))
+    return np.where(idx >= 0, counts.to_numpy()[idx], 0)
+
+
+def build_features(path=INPUT, out=OUTPUT, airports=None, chunk_rows=CHUNK_ROWS, windows_min=DEFAULT_WINDOWS_MIN):
+    hourly_counts, runway_counts, arrivals, dtypes = count_landings(path, airports, chunk_rows, windows_min)
+    if hourly_counts is None:
+        print("⚠️ No rows matched; nothing written.")
+        return
+
+    # mean traffic_density_hour over rows, per airport: sum(c^2) / sum(c) over hours
+    c = hourly_counts.astype(float)
+    mean_density = (c ** 2).groupby(level="airport").sum() / c.groupby(level="airport").sum()
+
+    # Synthetic Poisson traffic metric (adds small stochastic variation)
+    rng = np.random.default_rng(seed=42)
+    writer = None
+    rows = 0
+    for chunk in iter_chunks(path, airports, chunk_rows, dtypes):
+        # Hourly landing density (approximate traffic)
+        chunk["traffic_density_hour"] = lookup(hourly_counts, [chunk["airport"], chunk["hour_key"]])
+        chunk.loc[chunk["hour_key"] < 0, "traffic_density_hour"] = np.nan
+
+        # Runway-specific density
+        if runway_counts is not None:
+            chunk["runway_activity"] = lookup(runway_counts, [chunk["airport"], chunk["hour_key"], chunk["runway"]])
+            chunk.loc[(chunk["hour_key"] < 0) | chunk["runway"].isna(), "runway_activity"] = np.nan
+
+        # Sliding-window density (arrivals in the trailing/leading windows)
+        for col, values in arrivals.counts(chunk).items():
+            chunk[col] = values
+
+        # Training-flight indicator
+        chunk["is_training_flight"] = (chunk["n_approaches"] > 2).astype(int)
+
+        lam = chunk["traffic_density_hour"] / chunk["airport"].map(mean_density).to_numpy()
+        chunk["synthetic_density"] = rng.poisson(lam=lam.fillna(1))
+
+        table = pa.Table.from_pandas(chunk.drop(columns=["hour_key", "epoch_s"]), preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(out, table.schema, compression="zstd")
+            # Inspect results
+            print(chunk[[c for c in ["time", "airport", "runway", "has_ga", "traffic_density_hour",
+                                     "runway_activity", "synthetic_density"] if c in chunk.columns]].head())
+        writer.write_table(table.cast(writer.schema))
+        rows += len(chunk)
+
+    writer.close()
+    print(f"💾 Saved {rows} enriched rows -> {out}")
+
+
+def plot_activity(path=OUTPUT):
+    import matplotlib.pyplot as plt
+
+    sfo = pd.read_parquet(path, columns=["runway_activity", "has_ga"])
+    plt.figure(figsize=(6,4))
+    sfo.groupby("runway_activity")["has_ga"].mean().plot(marker="o")
+    plt.title("Go-around rate vs. runway traffic density")
+    plt.xlabel("Runway activity (flights/hour)")
+    plt.ylabel("Go-around rate")
+    plt.grid(True, alpha=0.3)
+    plt.show()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming traffic-density features for go-around records")
+    parser.add_argument("--input", default=INPUT)
+    parser.add_argument("--out", default=OUTPUT)
+    parser.add_argument("--airports", help="comma-separated ICAO codes (default: all)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--windows", default=",".join(map(str, DEFAULT_WINDOWS_MIN)),
+                        help="comma-separated sliding-window sizes in minutes")
+    parser.add_argument("--plot", action="store_true", help="plot go-around rate vs runway activity")
+    args = parser.parse_args()
+
+    build_features(args.input, args.out, args.airports.split(",") if args.airports else None, args.chunk_rows,
+                   [int(w) for w in args.windows.split(",")])
+    if args.plot:
+        plot_activity(args.out)
+
+
+if __name__ == "__main__":
+    main()
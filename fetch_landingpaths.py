@@ -1,29 +1,28 @@
-import requests
+import argparse
 import pandas as pd
 from datetime import datetime
 import os
-from time import sleep
+
+from fetcher import RateLimitedFetcher, OPENSKY_RATE_PER_SEC
+from response_cache import ResponseCache
 
 # --- Configuration ---
 API_BASE = "https://opensky-network.org/api"
 SFO_ICAO = "KSFO"
 DATA_PATH = "data/sfo_goarounds.csv"   # your filtered 2019 dataset
 OUT_DIR = "data/tracks_2019"
-os.makedirs(OUT_DIR, exist_ok=True)
 
 
-def fetch_historical_track(icao24, timestamp):
+def fetch_historical_track(fetcher, icao24, timestamp):
     """
     Fetch historical track for a given aircraft ICAO24 and UNIX timestamp (2019).
     """
-    url = f"{API_BASE}/tracks/all?icao24={icao24}&time={timestamp}"
-    response = requests.get(url)
+    data = fetcher.get_json(f"{API_BASE}/tracks/all", params={"icao24": icao24, "time": timestamp})
 
-    if response.status_code != 200:
-        print(f"⚠️ Error fetching track for {icao24}: {response.text}")
+    if data is None:
+        print(f"⚠️ Error fetching track for {icao24}")
         return None
 
-    data = response.json()
     if "path" not in data or data["path"] is None:
         print(f"⚠️ No path for {icao24} at {timestamp}")
         return None
@@ -39,6 +38,7 @@ def fetch_tracks_from_2019(n=10):
     """
     Fetch tracks for up to n flights from the 2019 dataset (for cross-checking runway info).
     """
+    os.makedirs(OUT_DIR, exist_ok=True)
     sfo_df = pd.read_csv(DATA_PATH)
     sfo_df["time"] = pd.to_datetime(sfo_df["time"], utc=True)
 
@@ -46,22 +46,32 @@ def fetch_tracks_from_2019(n=10):
     subset = sfo_df.sample(n)
     print(f"📆 Fetching tracks for {len(subset)} flights from 2019...")
 
-    for _, row in subset.iterrows():
+    def fetch_one(row):
         icao = row["icao24"]
         ts = int(row["time"].timestamp())
         callsign = str(row["callsign"]).strip().replace(" ", "_")
 
         print(f"➡️ Fetching {callsign or icao} @ {datetime.utcfromtimestamp(ts)}")
-        df_track = fetch_historical_track(icao, ts)
+        df_track = fetch_historical_track(fetcher, icao, ts)
 
         if df_track is None or df_track.empty:
-            continue
+            return
 
         file_path = os.path.join(OUT_DIR, f"track_{callsign or icao}_{ts}.csv")
         df_track.to_csv(file_path, index=False)
         print(f"💾 Saved {len(df_track)} points → {file_path}")
-        sleep(5)  # polite delay to avoid rate limits
+
+    # shared token bucket keeps all workers under the OpenSky rate limit
+    with RateLimitedFetcher(rate=OPENSKY_RATE_PER_SEC, max_workers=4, cache=ResponseCache()) as fetcher:
+        fetcher.map(fetch_one, [row for _, row in subset.iterrows()])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch OpenSky tracks for a sample of the 2019 KSFO landings")
+    parser.add_argument("-n", type=int, default=100, help="number of flights to sample")
+    args = parser.parse_args()
+    fetch_tracks_from_2019(n=args.n)
 
 
 if __name__ == "__main__":
-    fetch_tracks_from_2019(n=100)
+    main()
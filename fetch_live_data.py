@@ -1,33 +1,140 @@
 import json
-import requests
+import threading
+import time
+
+import numpy as np
 import pandas as pd
+import requests
+
+AUTH_URL = "https://auth.opensky-network.org/auth/realms/opensky-network/protocol/openid-connect/token"
+API_URL = "https://opensky-network.org/api"
+
+COLUMNS = [
+    "icao24", "callsign", "origin_country", "time_position", "last_contact",
+    "longitude", "latitude", "baro_altitude", "on_ground", "velocity",
+    "true_track", "vertical_rate", "sensors", "geo_altitude", "squawk",
+    "spi", "position_source"
+]
+# typed decoding of the /states/all arrays; None -> NaN / "" / False
+FLOAT_COLUMNS = [
+    "time_position", "last_contact", "longitude", "latitude", "baro_altitude",
+    "velocity", "true_track", "vertical_rate", "geo_altitude",
+]
+STRING_COLUMNS = {"icao24": "U6", "callsign": "U8", "origin_country": "U32", "squawk": "U4"}
+BOOL_COLUMNS = ["on_ground", "spi"]
+
+
+def decode_states(states):
+    """Decode the `states` list-of-lists into a dict of typed NumPy columns."""
+    if not states:
+        cols = {c: np.empty(0, dtype=float) for c in FLOAT_COLUMNS}
+        cols.update({c: np.empty(0, dtype=dt) for c, dt in STRING_COLUMNS.items()})
+        cols.update({c: np.empty(0, dtype=bool) for c in BOOL_COLUMNS})
+        cols["position_source"] = np.empty(0, dtype=np.int8)
+        return cols
+
+    raw = dict(zip(COLUMNS, zip(*states)))
+    cols = {c: np.array(raw[c], dtype=float) for c in FLOAT_COLUMNS}
+    for c, dt in STRING_COLUMNS.items():
+        cols[c] = np.array([v or "" for v in raw[c]], dtype=dt)
+    for c in BOOL_COLUMNS:
+        cols[c] = np.array([bool(v) for v in raw[c]], dtype=bool)
+    cols["position_source"] = np.array([v or 0 for v in raw["position_source"]], dtype=np.int8)
+    return cols
+
+
+class OpenSkyClient:
+    """
+    OpenSky API client that keeps one keep-alive session and caches the OAuth
+    token, refreshing it in the background `refresh_margin` seconds before it
+    expires so polls never wait on the auth server.
+    """
+
+    def __init__(self, credentials="credentials.json", auth_url=AUTH_URL, api_url=API_URL,
+                 refresh_margin=60, timeout=15):
+        with open(credentials) as f:
+            creds = json.load(f)
+        self.client_id = creds["clientId"]
+        self.client_secret = creds["clientSecret"]
+        self.auth_url = auth_url
+        self.api_url = api_url
+        self.refresh_margin = refresh_margin
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.token = None
+        self.expires_at = 0.0
+        self.lock = threading.Lock()
+        self.timer = None
+        self.token_requests = 0
+
+    def _refresh_token(self):
+        response = self.session.post(self.auth_url, data={
+            "grant_type": "client_credentials",
+            "client_id": self.client_id,
+            "client_secret": self.client_secret
+        }, timeout=self.timeout)
+        response.raise_for_status()
+        body = response.json()
+        expires_in = float(body.get("expires_in", 300))
+        with self.lock:
+            self.token = body["access_token"]
+            self.expires_at = time.monotonic() + expires_in
+            self.token_requests += 1
+        self._schedule_refresh(max(1.0, expires_in - self.refresh_margin))
+
+    def _schedule_refresh(self, delay):
+        if self.timer is not None:
+            self.timer.cancel()
+        self.timer = threading.Timer(delay, self._background_refresh)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def _background_refresh(self):
+        try:
+            self._refresh_token()
+        except requests.RequestException as e:
+            print(f"⚠️ Token refresh failed ({e}), retrying in 10s")
+            self._schedule_refresh(10)
+
+    def get_token(self):
+        with self.lock:
+            valid = self.token is not None and time.monotonic() < self.expires_at - 5
+        if not valid:
+            self._refresh_token()
+        return self.token
+
+    def fetch_states(self, bbox=(-123.5, -121.5, 36.5, 38.5)):
+        """One /states/all poll decoded to typed columns, plus the server `time`."""
+        params = {"lamin": bbox[2], "lomin": bbox[0], "lamax": bbox[3], "lomax": bbox[1]}
+        headers = {"Authorization": f"Bearer {self.get_token()}"}
+        response = self.session.get(f"{self.api_url}/states/all", params=params, headers=headers, timeout=self.timeout)
+        if response.status_code == 401:
+            # token revoked early; fetch a fresh one and retry once
+            self._refresh_token()
+            headers = {"Authorization": f"Bearer {self.token}"}
+            response = self.session.get(f"{self.api_url}/states/all", params=params, headers=headers, timeout=self.timeout)
+        response.raise_for_status()
+        flights = response.json()
+        cols = decode_states(flights.get("states"))
+        return flights.get("time"), cols
+
+    def fetch_flights(self, bbox=(-123.5, -121.5, 36.5, 38.5)):
+        _, cols = self.fetch_states(bbox)
+        return pd.DataFrame(cols, columns=[c for c in COLUMNS if c in cols])
+
+    def close(self):
+        if self.timer is not None:
+            self.timer.cancel()
+        self.session.close()
+
+
+_default_client = None
+
 
 def fetch_flights(bbox=(-123.5, -121.5, 36.5, 38.5)):
-    with open("credentials.json") as f:
-        creds = json.load(f)
-        client_id = creds["clientId"]
-        client_secret = creds["clientSecret"]
-
-    auth_url = "https://auth.opensky-network.org/auth/realms/opensky-network/protocol/openid-connect/token"
-    auth_data = {
-        "grant_type": "client_credentials",
-        "client_id": client_id,
-        "client_secret": client_secret
-    }
-
-    response = requests.post(auth_url, data=auth_data)
-    token = response.json()["access_token"]
-
-    url = f"https://opensky-network.org/api/states/all?lamin={bbox[2]}&lomin={bbox[0]}&lamax={bbox[3]}&lomax={bbox[1]}"
-    headers = {"Authorization": f"Bearer {token}"}
-    response = requests.get(url, headers=headers)
-    flights = response.json()
-
-    columns = [
-        "icao24", "callsign", "origin_country", "time_position", "last_contact",
-        "longitude", "latitude", "baro_altitude", "on_ground", "velocity",
-        "true_track", "vertical_rate", "sensors", "geo_altitude", "squawk",
-        "spi", "position_source"
-    ]
-    df_live = pd.DataFrame(flights["states"], columns=columns)
-    return df_live
+    """Live states in bbox as a DataFrame, via a shared OpenSkyClient."""
+    global _default_client
+    if _default_client is None:
+        _default_client = OpenSkyClient()
+    return _default_client.fetch_flights(bbox)
@@ -0,0 +1,189 @@
+import multiprocessing
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+from instrumentation import count, observe
+
+load_dotenv()
+
+# FR24 allows ~10 requests/minute on the basic plan (hence the old sleep(6));
+# override with FR24_RATE_PER_MIN in .env for higher tiers
+FR24_RATE_PER_SEC = float(os.getenv("FR24_RATE_PER_MIN", 10)) / 60
+OPENSKY_RATE_PER_SEC = 1 / 5
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens/sec, up to `capacity` banked."""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def penalize(self, seconds):
+        """Push the next token out by `seconds` (used on Retry-After)."""
+        with self.lock:
+            self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+
+class SharedTokenBucket(TokenBucket):
+    """
+    TokenBucket whose state lives in shared memory, so several worker
+    processes draw from one rate limit. Pass it to the workers at start-up
+    (e.g. a pool initializer), not per task.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.state = multiprocessing.Array("d", [float(capacity), time.monotonic()])
+        self.lock = self.state.get_lock()
+
+    @property
+    def tokens(self):
+        return self.state[0]
+
+    @tokens.setter
+    def tokens(self, value):
+        self.state[0] = value
+
+    @property
+    def updated(self):
+        return self.state[1]
+
+    @updated.setter
+    def updated(self, value):
+        self.state[1] = value
+
+
+class RateLimitedFetcher:
+    """
+    Pooled HTTP fetcher shared by all FR24/OpenSky scripts.
+
+    Every request (including retries) draws a token from one shared bucket, so
+    N worker threads together run at exactly `rate` requests/sec. With a
+    `cache` (response_cache.ResponseCache), get_json answers repeat historic
+    requests from disk without touching the network or the bucket. Pass a
+    SharedTokenBucket as `bucket` to share one limit across processes.
+    """
+
+    def __init__(self, headers=None, rate=FR24_RATE_PER_SEC, burst=1,
+                 max_workers=4, max_retries=5, backoff=1.0, timeout=30, cache=None, bucket=None):
+        self.bucket = bucket or TokenBucket(rate, burst)
+        self.cache = cache
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        if headers:
+            self.session.headers.update(headers)
+
+    def get(self, url, params=None):
+        """GET with rate limiting and retry/backoff on 429/5xx. Returns the last response."""
+        resp = None
+        parts = urlsplit(url)
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            started = time.perf_counter()
+            try:
+                resp = self.session.get(url, params=params, timeout=self.timeout)
+            except requests.RequestException as e:
+                count("http_errors", host=parts.netloc, error=type(e).__name__)
+                if attempt == self.max_retries:
+                    raise
+                print(f"      ⚠️ {type(e).__name__} on {url}, retrying...")
+                time.sleep(self._backoff(attempt))
+                continue
+            # every request that reached the API (retries included) is a billed call
+            observe("http_request_seconds", time.perf_counter() - started, host=parts.netloc)
+            count("http_responses", host=parts.netloc, endpoint=parts.path, status=resp.status_code)
+
+            if resp.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                return resp
+            count("http_retries", host=parts.netloc, status=resp.status_code)
+
+            retry_after = resp.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                self.bucket.penalize(int(retry_after))
+            else:
+                time.sleep(self._backoff(attempt))
+        return resp
+
+    def get_json(self, url, params=None, max_age=None):
+        """
+        GET and decode JSON; returns None on non-200 or undecodable body.
+        `max_age` (seconds) is passed to the cache: older entries are refetched.
+        """
+        if self.cache is not None:
+            cached = self.cache.get(url, params, max_age=max_age)
+            if cached is not None:
+                return cached
+
+        resp = self.get(url, params=params)
+        if resp.status_code != 200:
+            print(f"      ⚠️ Error {resp.status_code}: {resp.text[:150]}")
+            return None
+        try:
+            data = resp.json()
+        except ValueError as e:
+            print(f"      ⚠️ JSON decode error for {resp.url}: {e}")
+            return None
+
+        # empty bodies are often "not yet available" rather than final, so don't pin them
+        if self.cache is not None and data:
+            self.cache.put(url, params, data)
+        return data
+
+    def map(self, fn, items):
+        """Run fn(item) over items with bounded concurrency, preserving order."""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            return list(pool.map(fn, items))
+
+    def get_many(self, url, params_list, max_age=None):
+        """
+        Fetch many param sets against one endpoint; returns decoded JSON (or None) in order.
+        `max_age` is one value for every request or a list with one per param set.
+        """
+        ages = max_age if isinstance(max_age, (list, tuple)) else [max_age] * len(params_list)
+        return self.map(lambda job: self.get_json(url, job[0], max_age=job[1]), list(zip(params_list, ages)))
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _backoff(self, attempt):
+        return self.backoff * (2 ** attempt) * (0.5 + random.random())
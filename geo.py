@@ -0,0 +1,117 @@
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088  # mean Earth radius, same as the `haversine` package
+
+
+def haversine_km(lat, lon, refs):
+    """
+    Great-circle distance in km from every (lat, lon) to one or more reference points.
+
+    `lat`/`lon` are arrays of equal shape; `refs` is a single (lat, lon) pair or
+    a sequence of K pairs. Returns shape lat.shape for one reference, or
+    lat.shape + (K,) for several.
+    """
+    refs = np.asarray(refs, dtype=float)
+    single = refs.ndim == 1
+    refs = np.atleast_2d(refs)
+
+    lat1 = np.radians(np.asarray(lat, dtype=float))[..., None]
+    lon1 = np.radians(np.asarray(lon, dtype=float))[..., None]
+    lat2 = np.radians(refs[:, 0])
+    lon2 = np.radians(refs[:, 1])
+
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    d = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+    return d[..., 0] if single else d
+
+
+def bearing_deg(lat, lon, target):
+    """Initial great-circle bearing (0-360°) from every (lat, lon) to one target point."""
+    lat1, lon1 = np.radians(np.asarray(lat, dtype=float)), np.radians(np.asarray(lon, dtype=float))
+    lat2, lon2 = np.radians(target[0]), np.radians(target[1])
+    dlon = lon2 - lon1
+    y = np.sin(dlon) * np.cos(lat2)
+    x = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(dlon)
+    return np.degrees(np.arctan2(y, x)) % 360
+
+
+def angle_diff_deg(a, b):
+    """Smallest absolute difference between two headings, in degrees (0-180)."""
+    return np.abs((np.asarray(a, dtype=float) - b + 180) % 360 - 180)
+
+
+def to_local_xy(lat, lon, origin):
+    """Equirectangular projection to metres east/north of `origin` (fine within ~100 km)."""
+    lat0, lon0 = origin
+    k = np.radians(1.0) * EARTH_RADIUS_KM * 1000
+    x = (np.asarray(lon, dtype=float) - lon0) * k * np.cos(np.radians(lat0))
+    y = (np.asarray(lat, dtype=float) - lat0) * k
+    return x, y
+
+
+def segment_starts(keys):
+    """Start offsets of runs of equal values in an already-grouped key array."""
+    keys = np.asarray(keys)
+    if len(keys) == 0:
+        return np.array([], dtype=np.int64)
+    return np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+
+
+def segment_first(mask, starts, n):
+    """Global index of the first True per segment, or n where a segment has none."""
+    idx = np.where(mask, np.arange(n), n)
+    return np.minimum.reduceat(idx, starts) if len(starts) else idx[:0]
+
+
+def segment_accumulate(ufunc, values, starts, n):
+    """
+    Running np.minimum / np.maximum that restarts at every segment start.
+
+    Each segment is shifted by a multiple of the value range so earlier
+    segments can never win, then one global accumulate does all of them.
+    """
+    values = np.asarray(values, dtype=float)
+    if n == 0:
+        return values
+    seg = np.zeros(n, dtype=np.int64)
+    seg[starts[1:]] = 1
+    seg = np.cumsum(seg)
+    span = float(np.ptp(values)) + 1.0
+    sign = 1.0 if ufunc is np.maximum else -1.0
+    shift = sign * seg * span
+    return ufunc.accumulate(values + shift) - shift
+
+
+def segment_interp(codes, x, values, grid, hold=True):
+    """
+    Interpolate every segment's values at the same grid of x positions in one pass.
+
+    codes: segment codes 0..n_segments-1 (any order); values: (n, c). Points
+    are ordered by (segment, x) and each (segment, grid x) is located with
+    one searchsorted on segment * span + x. Outside a segment's x range the
+    nearest value is held, or NaN with hold=False. Returns (n_segments, len(grid), c).
+    """
+    x = np.asarray(x, dtype=float)
+    grid = np.asarray(grid, dtype=float)
+    values = np.asarray(values, dtype=float).reshape(len(x), -1)
+    offset = min(float(x.min(initial=0)), float(grid.min(initial=0)))
+    span = max(float(x.max(initial=0)), float(grid.max(initial=0))) - offset + 1.0
+    key = codes * span + (x - offset)
+    order = np.argsort(key)
+    key, values = key[order], values[order]
+
+    n_seg = int(codes.max()) + 1 if len(codes) else 0
+    starts = np.searchsorted(key, np.arange(n_seg) * span)
+    ends = np.r_[starts[1:], len(key)] - 1
+    q = (np.arange(n_seg)[:, None] * span + (grid - offset)[None, :]).ravel()
+    idx = np.searchsorted(key, q)
+    first, last = np.repeat(starts, len(grid)), np.repeat(ends, len(grid))
+    hi = np.clip(idx, first, last)
+    lo = np.clip(idx - 1, first, last)
+    gap = key[hi] - key[lo]
+    w = np.clip(np.divide(q - key[lo], gap, out=np.zeros_like(q), where=gap > 0), 0, 1)[:, None]
+    out = values[lo] * (1 - w) + values[hi] * w
+    if not hold:
+        out[(q < key[first]) | (q > key[last])] = np.nan
+    return out.reshape(n_seg, len(grid), values.shape[1])
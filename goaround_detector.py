@@ -0,0 +1,192 @@
+"""
+Bulk go-around detection on raw tracks.
+
+Works on segmented tracks (segmentation.segment_flights: one contiguous,
+time-ordered slice per flight) and labels every flight in a handful of
+whole-array passes, with no per-flight Python:
+
+  1. near-low points: airborne, within NEAR_KM of the airport, below LOW_FT,
+     after the flight has been above ARRIVAL_FT (so departures don't count)
+  2. a running per-flight minimum over those points gives the lowest
+     approach height so far; climbing CLIMB_FT above it for MIN_CLIMB_POINTS
+     points is a sustained climb-out
+  3. signals: sustained climb, a second approach (re-entering the near-low
+     zone after a climb-out), or leaving the final-approach area (EXIT_KM)
+     after the low point while still airborne
+
+A flight is a go-around if it climbs out and then re-approaches or leaves the
+approach area, or if the climb-out itself is sustained.
+
+    python goaround_detector.py                         # label the stored tracks
+    python goaround_detector.py --validate data/tracks_2019
+"""
+import argparse
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+from geo import haversine_km, segment_accumulate, segment_first, segment_starts
+from runways import DEFAULT_AIRPORT, get_airport
+from segmentation import on_ground, segment_flights
+from track_store import load_tracks, to_epoch_seconds
+
+M_TO_FT = 1 / 0.3048
+NEAR_KM = 10.0
+EXIT_KM = 15.0
+LOW_FT = 1000.0
+ARRIVAL_FT = 3000.0
+CLIMB_FT = 600.0
+MIN_CLIMB_POINTS = 2
+LABELS_PATH = "data/sfo_goarounds.csv"
+
+
+def altitude_ft(df):
+    """Altitude in feet from FR24 `alt` (ft) or OpenSky `baro_altitude` (m)."""
+    if "alt" in df.columns:
+        return df["alt"].to_numpy(dtype=float)
+    return df["baro_altitude"].to_numpy(dtype=float) * M_TO_FT
+
+
+def detect_goarounds(df, key="flight_id", airport=DEFAULT_AIRPORT, near_km=NEAR_KM, exit_km=EXIT_KM,
+                     low_ft=LOW_FT, arrival_ft=ARRIVAL_FT, climb_ft=CLIMB_FT, min_climb_points=MIN_CLIMB_POINTS):
+    """
+    Label go-arounds in segmented tracks.
+
+    Returns (row_ga, flights): a per-row bool array (True from the start of
+    the climb-out onwards in go-around flights) and one row per flight with
+    the signals and the `is_ga` label (plus, with timestamps, `ga_time` and
+    `low_time`: the climb-out and the lowest approach point before it).
+    """
+    n = len(df)
+    flight = df[key].to_numpy()
+    starts = segment_starts(flight)
+    sizes = np.diff(np.r_[starts, n])
+    rows = np.arange(n)
+
+    lat = df["lat"].to_numpy(dtype=float)
+    lon = df["lon"].to_numpy(dtype=float)
+    alt = np.nan_to_num(altitude_ft(df), nan=0.0)
+    airborne = ~on_ground(df) & (alt > 0)
+    dist = haversine_km(lat, lon, get_airport(airport).reference_point)
+
+    # --- 1. near-low points of an arrival (flight was high before) ---
+    prior_max = segment_accumulate(np.maximum, alt, starts, n)
+    near_low = airborne & (dist < near_km) & (alt < low_ft) & (prior_max >= arrival_ft)
+
+    # --- 2. height above the lowest approach point so far ---
+    sentinel = alt.max() + climb_ft + 1 if n else 0.0
+    low_so_far = segment_accumulate(np.minimum, np.where(near_low, alt, sentinel), starts, n)
+    seen_low = low_so_far < sentinel
+    climb = np.where(airborne & seen_low, alt - low_so_far, 0.0)
+    climbing = climb >= climb_ft
+
+    # --- 3. signals per flight ---
+    empty = not len(starts)
+    n_climb = np.add.reduceat(climbing.astype(np.int64), starts) if not empty else np.zeros(0, np.int64)
+    max_climb = np.maximum.reduceat(climb, starts) if not empty else np.zeros(0)
+    climbed_before = segment_accumulate(np.maximum, climbing.astype(float), starts, n) > 0
+    reentry = near_low & np.r_[False, ~near_low[:-1]] & np.r_[False, climbed_before[:-1]]
+    reentry[starts] = False
+    exited = airborne & seen_low & (dist > exit_km)
+    second_approach = np.add.reduceat(reentry.astype(np.int64), starts) > 0 if not empty else np.zeros(0, bool)
+    left_area = np.add.reduceat(exited.astype(np.int64), starts) > 0 if not empty else np.zeros(0, bool)
+
+    climbed_out = n_climb > 0
+    is_ga = climbed_out & ((n_climb >= min_climb_points) | second_approach | left_area)
+
+    ga_start = segment_first(climbing, starts, n)
+    row_ga = np.repeat(is_ga, sizes) & (rows >= np.repeat(ga_start, sizes))
+    # lowest approach point before the climb-out: the last row that lowered the running low
+    lowered = near_low & (alt <= low_so_far)
+    last_low = segment_accumulate(np.maximum, np.where(lowered, rows, -1), starts, n).astype(np.int64)
+    low_row = last_low[np.minimum(ga_start, n - 1)] if n else ga_start
+
+    flights = pd.DataFrame({
+        key: flight[starts],
+        "n_points": sizes,
+        "max_climb_ft": max_climb,
+        "climb_points": n_climb,
+        "second_approach": second_approach,
+        "left_area": left_area,
+        "is_ga": is_ga,
+    })
+    if "callsign" in df.columns:
+        flights.insert(1, "callsign", df["callsign"].to_numpy()[starts])
+    t = to_epoch_seconds(df["timestamp"]) if "timestamp" in df.columns else None
+    if t is not None and n:
+        flights["start"] = t[starts]
+        flights["ga_time"] = np.where(is_ga, t[np.minimum(ga_start, n - 1)], -1)
+        flights["low_time"] = np.where(is_ga, t[np.maximum(low_row, 0)], -1)
+    return row_ga, flights
+
+
+def load_opensky_tracks(tracks_dir):
+    """
+    Read fetch_landingpaths.py output (track_<callsign>_<ts>.csv) into one
+    frame, tagged with the file's callsign and reference time.
+    """
+    frames = []
+    for path in sorted(glob.glob(os.path.join(tracks_dir, "track_*.csv"))):
+        name = os.path.basename(path)[len("track_"):-len(".csv")]
+        callsign, ts = name.rsplit("_", 1)
+        df = pd.read_csv(path).rename(columns={"time": "timestamp"})
+        frames.append(df.assign(callsign=callsign, ref_time=int(ts)))
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+
+def validate(tracks_dir, labels_path=LABELS_PATH, **params):
+    """Compare detector output with the Zenodo `has_ga` labels for the fetched 2019 tracks."""
+    tracks = load_opensky_tracks(tracks_dir)
+    if tracks.empty:
+        print(f"⚠️ No tracks in {tracks_dir}; run fetch_landingpaths.py first.")
+        return None
+
+    # one flight per fetched file, already a single flight: just group and time-order
+    tracks["track_key"] = tracks["callsign"] + "_" + tracks["ref_time"].astype(str)
+    seg = tracks.sort_values(["track_key", "timestamp"], kind="stable").reset_index(drop=True)
+    seg["flight_id"] = pd.factorize(seg["track_key"])[0].astype(np.int32)
+    _, flights = detect_goarounds(seg, **params)
+    flights["track_key"] = seg["track_key"].to_numpy()[segment_starts(seg["flight_id"].to_numpy())]
+
+    labels = pd.read_csv(labels_path, usecols=["time", "callsign", "has_ga"])
+    labels["ref_time"] = to_epoch_seconds(labels["time"])
+    labels["track_key"] = (labels["callsign"].astype(str).str.strip().str.replace(" ", "_")
+                           + "_" + labels["ref_time"].astype(str))
+    merged = flights.merge(labels[["track_key", "has_ga"]], on="track_key", how="inner")
+
+    truth, pred = merged["has_ga"].astype(bool), merged["is_ga"]
+    tp, fp = int((truth & pred).sum()), int((~truth & pred).sum())
+    fn, tn = int((truth & ~pred).sum()), int((~truth & ~pred).sum())
+    precision = tp / max(tp + fp, 1)
+    recall = tp / max(tp + fn, 1)
+    print(f"🔎 {len(merged)} flights matched: TP {tp}, FP {fp}, FN {fn}, TN {tn} | "
+          f"precision {precision:.2f}, recall {recall:.2f}")
+    return merged
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vectorized go-around detection on tracks")
+    parser.add_argument("--validate", metavar="TRACKS_DIR", help="compare with Zenodo labels for fetched 2019 tracks")
+    parser.add_argument("--labels", default=LABELS_PATH)
+    parser.add_argument("--out", help="write the per-flight labels to CSV")
+    args = parser.parse_args()
+
+    if args.validate:
+        validate(args.validate, args.labels)
+        return
+
+    df, _ = segment_flights(load_tracks())
+    _, flights = detect_goarounds(df)
+    print(f"🛬 {len(flights)} flights, {int(flights['is_ga'].sum())} go-arounds detected")
+    print(flights[flights["is_ga"]].to_string(index=False))
+    if args.out:
+        flights.to_csv(args.out, index=False)
+        print(f"💾 Saved flight labels -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+"""
+Go-around model: training matrix, logistic regression, batched scoring.
+
+The training matrix has one row per track point on final (same cut as
+live_scorer: close to a reference path and inside max_along_m) with the
+live features, computed by live_scorer.approach_state from the historical
+tracks, plus trailing arrival counts (density_features.trailing_counts).
+Go-around flights keep only the rows before their lowest approach point
+(goaround_detector's low_time), so no row shows the climb-out itself and
+CV measures prediction rather than detection; the label is the flight's
+is_ga. It is stored as float32 .npy files in
+MATRIX_DIR, fingerprinted by the tracks and reference paths it was built
+from, and memory-mapped back, so training reruns and CV workers do not
+recompute or copy it.
+
+LogisticModel is an L2-regularised logistic regression fitted with
+L-BFGS. Go-arounds are rare, so rows are weighted to give every flight the
+same total weight and both classes the same total weight (the intercept
+is shifted back to the base rate afterwards). Evaluation is
+expanding-window time-split CV (train on earlier flights, test on the next
+block), one fold per worker process, scored per flight by its maximum risk.
+The artifact is a small JSON file with the standardisation folded into the
+coefficients, so predict is one matrix-vector product and serves both the
+nightly backfill (`score`) and live_scorer (`--model`).
+
+    python goaround_model.py build                 # (re)build the matrix
+    python goaround_model.py train --folds 5
+    python goaround_model.py score --out data/goaround_scores.csv
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from density_features import DEFAULT_WINDOWS_MIN, trailing_counts
+from geo import haversine_km, segment_first, segment_starts
+from goaround_detector import altitude_ft, detect_goarounds
+from instrumentation import timed
+from live_scorer import ARRIVAL_ALONG_M, DENSITY_FEATURES, FEATURES, MAX_ALONG_M, MAX_DIST_M, approach_state
+from ref_index import REF_PATHS, load_reference_paths
+from runways import DEFAULT_AIRPORT, get_airport
+from segmentation import on_ground, segment_flights
+from stability_features import flight_fingerprints
+from track_store import load_tracks, to_epoch_seconds
+
+MATRIX_DIR = "data/model_matrix"
+MODEL_PATH = "data/goaround_model.json"
+MATRIX_VERSION = 3
+MODEL_FEATURES = FEATURES + DENSITY_FEATURES
+LAG = 3                 # rows back for rates, like GoAroundScorer's lag in polls
+CANDIDATE_KM = 30       # only points this close to the airport are queried against the paths
+L2 = 1.0
+
+
+# --- Step 1: training matrix from segmented tracks ---
+def _tracks_fingerprint(df, key, ref_paths=REF_PATHS):
+    digest = hashlib.sha1(f"v{MATRIX_VERSION}".encode())
+    prints = flight_fingerprints(df, key)
+    digest.update(prints["flight_key"].str.cat(sep="|").encode())
+    digest.update(prints["fingerprint"].to_numpy().tobytes())
+    for path in sorted(ref_paths.values()):
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+@timed()
+def build_matrix(df, key="flight_id", index=None, airport=DEFAULT_AIRPORT):
+    """
+    Training rows for segmented tracks: (X float32 (rows, MODEL_FEATURES),
+    y int8, flight int32 per row, flights table with flight_key/runway/t0/is_ga).
+    """
+    index = index or load_reference_paths()
+    apt = get_airport(airport)
+    n = len(df)
+    flight = df[key].to_numpy()
+    starts = segment_starts(flight)
+    sizes = np.diff(np.r_[starts, n])
+    rows = np.arange(n)
+    first_row = np.repeat(starts, sizes)
+
+    t = to_epoch_seconds(df["timestamp"]).astype(float)
+    lat = df["lat"].to_numpy(dtype=float)
+    lon = df["lon"].to_numpy(dtype=float)
+    alt_m = altitude_ft(df) * 0.3048
+    _, labels = detect_goarounds(df, key=key, airport=airport)
+    # go-arounds are cut at the lowest approach point, before any climbing (not at the 600 ft climb)
+    climbing_away = np.repeat(labels["is_ga"].to_numpy(dtype=bool), sizes) & (t >= np.repeat(labels["low_time"].to_numpy(), sizes))
+
+    # --- state vectors from consecutive points (OpenSky reports these directly) ---
+    x, y = apt.to_local_xy(lat, lon)
+    prev1 = np.maximum(rows - 1, 0)
+    has_prev = rows > first_row
+    dt1 = np.where(has_prev, t - t[prev1], np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        velocity = np.hypot(x - x[prev1], y - y[prev1]) / dt1
+        vertical_rate = (alt_m - alt_m[prev1]) / dt1
+    track_deg = np.where(has_prev, np.degrees(np.arctan2(x - x[prev1], y - y[prev1])) % 360, np.nan)
+
+    # --- approach features for candidate points only (near the airport, airborne) ---
+    cand = np.flatnonzero(~on_ground(df) & (haversine_km(lat, lon, apt.reference_point) < CANDIDATE_KM))
+    lagged = cand - LAG
+    has_lag = lagged >= first_row[cand]
+    lagged = np.where(has_lag, lagged, cand)
+    prev = {f: np.where(has_lag, v[lagged], np.nan)
+            for f, v in (("t", t), ("lat", lat), ("lon", lon), ("velocity", velocity))}
+    feats = approach_state(index, t[cand], lat[cand], lon[cand], alt_m[cand], track_deg[cand],
+                           velocity[cand], vertical_rate[cand], prev)
+    dist_m = feats["dist_m"].to_numpy()
+    along = feats["along_track_m"].to_numpy()
+    near = dist_m < MAX_DIST_M
+
+    # --- arrivals: first point per flight on a path within ARRIVAL_ALONG_M (as the live scorer counts them) ---
+    arriving = np.zeros(n, dtype=bool)
+    arriving[cand[near & (along < ARRIVAL_ALONG_M)]] = True
+    first_arrival = segment_first(arriving, starts, n)
+    arrived = first_arrival < n
+    arrival_rows = first_arrival[arrived]
+    runway_of_row = np.full(n, None, dtype=object)
+    runway_of_row[cand] = feats["runway"].to_numpy()
+    rw_codes, _ = pd.factorize(pd.Series(np.r_[runway_of_row[arrival_rows], feats["runway"].to_numpy()]))
+    arrival_codes, cand_codes = rw_codes[:len(arrival_rows)], rw_codes[len(arrival_rows):]
+
+    keep = near & (along < MAX_ALONG_M) & ~climbing_away[cand]
+    rows_kept = cand[keep]
+    windows_s = [int(w) * 60 for w in DEFAULT_WINDOWS_MIN]
+    airport_counts = trailing_counts(t[arrival_rows], t[rows_kept], windows_s)
+    runway_counts = trailing_counts(t[arrival_rows], t[rows_kept], windows_s, arrival_codes, cand_codes[keep])
+    for w in DEFAULT_WINDOWS_MIN:
+        feats.loc[keep, f"arrivals_prev_{w}m"] = airport_counts[w * 60]
+        feats.loc[keep, f"rwy_arrivals_prev_{w}m"] = runway_counts[w * 60]
+    feats = feats[keep]
+
+    X = feats[MODEL_FEATURES].to_numpy(dtype=np.float32)
+    code = np.repeat(np.arange(len(starts), dtype=np.int32), sizes)[rows_kept]
+    is_ga = labels["is_ga"].to_numpy(dtype=bool)
+    prints = flight_fingerprints(df, key)
+    runway = np.full(len(starts), None, dtype=object)
+    runway[code] = feats["runway"].to_numpy()
+    flights = pd.DataFrame({
+        "flight_key": prints["flight_key"],
+        "runway": runway,
+        "t0": t[starts].astype(np.int64),
+        "is_ga": is_ga,
+    })
+    return X, is_ga[code].astype(np.int8), code, flights
+
+
+def save_matrix(path, X, y, flight, flights, fingerprint):
+    os.makedirs(path, exist_ok=True)
+    for name, arr in (("X", X), ("y", y), ("flight", flight)):
+        np.save(os.path.join(path, f"{name}.npy"), arr)
+    flights.to_parquet(os.path.join(path, "flights.parquet"), index=False)
+    meta = {"version": MATRIX_VERSION, "fingerprint": fingerprint, "columns": MODEL_FEATURES,
+            "rows": int(len(X)), "flights": int(len(flights))}
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+
+
+def load_matrix(path=MATRIX_DIR):
+    """Memory-mapped (X, y, flight, flights, meta) from save_matrix."""
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    X, y, flight = (np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in ("X", "y", "flight"))
+    return X, y, flight, pd.read_parquet(os.path.join(path, "flights.parquet")), meta
+
+
+def matrix_for_tracks(df, path=MATRIX_DIR, key="flight_id", rebuild=False):
+    """The cached matrix if it was built from these tracks and paths, else rebuild and save it."""
+    fingerprint = _tracks_fingerprint(df, key)
+    meta_path = os.path.join(path, "meta.json")
+    if not rebuild and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get("fingerprint") == fingerprint and meta.get("columns") == MODEL_FEATURES:
+            print(f"♻️ Feature matrix up to date ({meta['rows']} rows) in {path}")
+            return load_matrix(path)
+    t0 = time.perf_counter()
+    X, y, flight, flights = build_matrix(df, key)
+    save_matrix(path, X, y, flight, flights, fingerprint)
+    print(f"💾 Feature matrix: {len(X)} rows x {X.shape[1]} from {len(np.unique(flight))} approaches "
+          f"in {time.perf_counter() - t0:.1f}s -> {path}")
+    return load_matrix(path)
+
+
+# --- Step 2: model ---
+def _sigmoid(z):
+    """Logistic function without overflow warnings (scipy stays out of the scoring import path)."""
+    return np.exp(-np.logaddexp(0, -z))
+
+
+class LogisticModel:
+    """Logistic regression on raw feature values; NaNs are scored as the training mean."""
+
+    def __init__(self, features, coef, intercept, fill, meta=None):
+        self.features = list(features)
+        self.coef = np.asarray(coef, dtype=float)
+        self.intercept = float(intercept)
+        self.fill = np.asarray(fill, dtype=float)
+        self.meta = meta or {}
+
+    @classmethod
+    def fit(cls, X, y, weight=None, features=MODEL_FEATURES, l2=L2):
+        from scipy.optimize import minimize
+
+        X = np.asarray(X, dtype=float)
+        y = np.asarray(y, dtype=float)
+        weight = np.ones(len(y)) if weight is None else np.asarray(weight, dtype=float)
+        weight = weight / weight.mean()
+        mean = np.nanmean(X, axis=0)
+        scale = np.nanstd(X, axis=0)
+        scale[~(scale > 0)] = 1.0
+        Z = (np.where(np.isnan(X), mean, X) - mean) / scale
+
+        def loss(params):
+            w, b = params[:-1], params[-1]
+            z = Z @ w + b
+            # weighted log-loss: log(1 + e^z) - y z, computed stably
+            nll = np.sum(weight * (np.logaddexp(0, z) - y * z)) / len(y) + 0.5 * l2 * (w @ w) / len(y)
+            r = weight * (_sigmoid(z) - y) / len(y)
+            return nll, np.r_[Z.T @ r + l2 * w / len(y), r.sum()]
+
+        res = minimize(loss, np.zeros(Z.shape[1] + 1), jac=True, method="L-BFGS-B")
+        w, b = res.x[:-1] / scale, res.x[-1]
+        return cls(features, w, b - mean @ w, mean, {"converged": bool(res.success)})
+
+    def decision_function(self, X):
+        X = np.asarray(X, dtype=float)
+        if np.isnan(X).any():
+            X = np.where(np.isnan(X), self.fill, X)
+        return X @ self.coef + self.intercept
+
+    def predict(self, X):
+        """Go-around probability per row of X (columns in self.features order)."""
+        return _sigmoid(self.decision_function(X))
+
+    def save(self, path=MODEL_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"features": self.features, "coef": self.coef.tolist(), "intercept": self.intercept,
+                       "fill": self.fill.tolist(), "meta": self.meta}, f, indent=2)
+
+    @classmethod
+    def load(cls, path=MODEL_PATH):
+        with open(path) as f:
+            art = json.load(f)
+        return cls(art["features"], art["coef"], art["intercept"], art["fill"], art.get("meta"))
+
+
+def balanced_weights(y, flight):
+    """Row weights: each flight sums to one, and both classes to the same total."""
+    per_flight = np.bincount(flight)
+    w = 1.0 / per_flight[flight]
+    flight_ga = np.zeros(len(per_flight), dtype=bool)
+    flight_ga[flight] = y.astype(bool)
+    seen = per_flight > 0
+    n_ga, n_ok = int(flight_ga[seen].sum()), int((~flight_ga[seen]).sum())
+    if n_ga and n_ok:
+        w *= np.where(y.astype(bool), (n_ga + n_ok) / (2 * n_ga), (n_ga + n_ok) / (2 * n_ok))
+    return w
+
+
+# --- Step 3: time-split cross-validation ---
+def _auc(y, score):
+    """ROC AUC from ranks (Mann-Whitney U)."""
+    from scipy.stats import rankdata
+
+    y = np.asarray(y, dtype=bool)
+    n_pos, n_neg = y.sum(), (~y).sum()
+    if not n_pos or not n_neg:
+        return float("nan")
+    ranks = rankdata(score)
+    return float((ranks[y].sum() - n_pos * (n_pos + 1) / 2) / (n_pos * n_neg))
+
+
+def _average_precision(y, score):
+    y = np.asarray(y, dtype=bool)
+    if not y.any():
+        return float("nan")
+    hits = y[np.argsort(-score, kind="stable")]
+    precision = np.cumsum(hits) / np.arange(1, len(hits) + 1)
+    return float(precision[hits].mean())
+
+
+def flight_risk(risk, flight):
+    """Maximum risk per flight code (rows grouped by flight); returns (codes, risk)."""
+    starts = segment_starts(flight)
+    return np.asarray(flight)[starts], np.maximum.reduceat(risk, starts)
+
+
+def time_folds(flights, n_folds):
+    """Expanding-window folds over flights with rows, by start time: [(train_codes, test_codes)]."""
+    order = flights["t0"].to_numpy().argsort(kind="stable")
+    blocks = np.array_split(order, n_folds + 1)
+    return [(np.concatenate(blocks[:i + 1]), blocks[i + 1]) for i in range(n_folds)]
+
+
+def _cv_fold(path, train_codes, test_codes, l2):
+    X, y, flight, _, meta = load_matrix(path)
+    flight = np.asarray(flight)
+    train = np.isin(flight, train_codes)
+    test = np.isin(flight, test_codes)
+    model = LogisticModel.fit(X[train], y[train], balanced_weights(y[train], flight[train]), meta["columns"], l2)
+    codes, risk = flight_risk(model.predict(X[test]), flight[test])
+    is_ga = np.zeros(flight.max() + 1, dtype=bool)
+    is_ga[flight] = np.asarray(y, dtype=bool)
+    return {"train_flights": int(len(np.unique(flight[train]))), "test_flights": int(len(codes)),
+            "test_ga": int(is_ga[codes].sum()), "auc": _auc(is_ga[codes], risk),
+            "avg_precision": _average_precision(is_ga[codes], risk)}
+
+
+@timed()
+def cross_validate(path=MATRIX_DIR, n_folds=5, l2=L2, workers=None):
+    """Time-split CV with one fold per worker process (each memory-maps the matrix)."""
+    _, _, flight, flights, _ = load_matrix(path)
+    with_rows = flights.iloc[np.unique(flight)]
+    folds = [(with_rows.index.to_numpy()[tr], with_rows.index.to_numpy()[te])
+             for tr, te in time_folds(with_rows, n_folds)]
+    with ProcessPoolExecutor(max_workers=workers or min(n_folds, os.cpu_count())) as pool:
+        futures = [pool.submit(_cv_fold, path, tr, te, l2) for tr, te in folds]
+        return [f.result() for f in futures]
+
+
+@timed()
+def train(path=MATRIX_DIR, n_folds=5, l2=L2, workers=None):
+    """Cross-validate, then fit on every row; returns the model with the CV results in meta."""
+    _, y, _, _, _ = load_matrix(path)
+    if not np.any(y):
+        print("⚠️ No go-arounds in the training matrix; the model will only learn the base rate")
+    cv = cross_validate(path, n_folds, l2, workers) if n_folds else []
+    for i, fold in enumerate(cv):
+        print(f"📊 fold {i}: train {fold['train_flights']} / test {fold['test_flights']} flights "
+              f"({fold['test_ga']} GA)  AUC {fold['auc']:.3f}  AP {fold['avg_precision']:.3f}")
+    X, y, flight, flights, meta = load_matrix(path)
+    model = LogisticModel.fit(X, y, balanced_weights(y, np.asarray(flight)), meta["columns"], l2)
+    # class weighting fits balanced odds; shift back to the base rate so risk reads as a probability
+    is_ga = flights["is_ga"].to_numpy()[np.unique(flight)]
+    if 0 < is_ga.sum() < len(is_ga):
+        model.intercept -= float(np.log((~is_ga).sum() / is_ga.sum()))
+    model.meta.update({
+        "trained_at": pd.Timestamp.now(tz="UTC").isoformat(),
+        "matrix": meta["fingerprint"], "rows": meta["rows"], "l2": l2,
+        "flights": int(len(is_ga)), "go_arounds": int(is_ga.sum()),
+        "cv": cv,
+    })
+    return model
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train and apply the go-around risk model")
+    parser.add_argument("command", choices=["build", "train", "score"])
+    parser.add_argument("--matrix", default=MATRIX_DIR)
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--rebuild", action="store_true", help="rebuild the feature matrix even if up to date")
+    parser.add_argument("--folds", type=int, default=5, help="time-split CV folds (0 = skip CV)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--l2", type=float, default=L2)
+    parser.add_argument("--out", default="data/goaround_scores.csv", help="score: per-flight output CSV")
+    args = parser.parse_args()
+
+    df, _ = segment_flights(load_tracks())
+    matrix_for_tracks(df, args.matrix, rebuild=args.rebuild)
+    if args.command == "train":
+        model = train(args.matrix, args.folds, args.l2, args.workers)
+        model.save(args.model)
+        print(f"💾 Model ({model.meta['flights']} approaches, {model.meta['go_arounds']} go-arounds) -> {args.model}")
+    elif args.command == "score":
+        model = LogisticModel.load(args.model)
+        X, _, flight, flights, _ = load_matrix(args.matrix)
+        t0 = time.perf_counter()
+        risk = model.predict(X)
+        elapsed = time.perf_counter() - t0
+        codes, max_risk = flight_risk(risk, np.asarray(flight))
+        scores = flights.iloc[codes].assign(max_risk=max_risk).sort_values("max_risk", ascending=False)
+        scores.to_csv(args.out, index=False)
+        print(f"🛬 Scored {len(X)} rows in {elapsed * 1e3:.1f} ms; {len(scores)} approaches -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Streaming reference-path builder.
+
+Instead of re-cropping the whole history, each runway keeps a sparse 2D
+histogram of approach points on a fixed 1e-5° (~1 m) lat/lon grid, as sorted
+cell keys with counts. Histograms merge by adding counts (a searchsorted merge,
+so a fold costs about the new day's cells, not the whole history); folding in
+a day only crops the flights that started that UTC day, whole, even when they
+cross midnight. The median path can be re-emitted at any time with any bin
+count, to the registry's ref_path per runway. State is saved to
+data/ref_sketch.npz together with the list of folded dates.
+
+    python incremental_reference.py fold --date 2025-11-12
+    python incremental_reference.py emit
+    python incremental_reference.py check   # compare with a full rebuild
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from build_path import approach_points, build_dense_reference, filter_classified, MERGE_POINTS
+from geo import EARTH_RADIUS_KM
+from runways import DEFAULT_AIRPORT, get_runway
+from segmentation import segment_flights
+from track_store import load_tracks, to_epoch_seconds
+
+SKETCH_PATH = "data/ref_sketch.npz"
+CELL_DEG = 1e-5
+MAX_FLIGHT_S = 6 * 3600   # loaded either side of a folded day so flights crossing midnight stay whole
+
+
+class ApproachSketch:
+    """Mergeable per-runway count of approach points per (lon_cell, lat_cell)."""
+
+    def __init__(self, keys=None, counts=None):
+        self.keys = np.zeros(0, dtype=np.int64) if keys is None else keys
+        self.counts = np.zeros(0, dtype=np.int64) if counts is None else counts
+
+    @staticmethod
+    def cells(lat, lon):
+        lat_cell = np.round((np.asarray(lat, dtype=float) + 90) / CELL_DEG).astype(np.int64)
+        lon_cell = np.round((np.asarray(lon, dtype=float) + 180) / CELL_DEG).astype(np.int64)
+        return (lon_cell << 32) | lat_cell
+
+    def add(self, lat, lon):
+        new_keys, new_counts = np.unique(self.cells(lat, lon), return_counts=True)
+        self.merge(ApproachSketch(new_keys, new_counts))
+
+    def merge(self, other):
+        """Add another sketch's counts; both key arrays are sorted and unique."""
+        pos = np.searchsorted(self.keys, other.keys)
+        found = pos < len(self.keys)
+        found[found] = self.keys[pos[found]] == other.keys[found]
+        self.counts[pos[found]] += other.counts[found]
+        new = ~found
+        if new.any():
+            # other.keys is sorted, so cells inserted at the same position stay in order
+            self.keys = np.insert(self.keys, pos[new], other.keys[new])
+            self.counts = np.insert(self.counts, pos[new], other.counts[new])
+
+    @property
+    def n_points(self):
+        return int(self.counts.sum())
+
+    def emit(self, bins=250):
+        """Median path over `bins` equal-width longitude bins, like build_dense_reference."""
+        if not len(self.keys):
+            return pd.DataFrame()
+        lon = (self.keys >> 32) * CELL_DEG - 180
+        lat = (self.keys & 0xFFFFFFFF) * CELL_DEG - 90
+
+        # same edges as pd.cut(bins=N): equal width, left edge widened by 0.1%
+        lo, hi = lon.min(), lon.max()
+        edges = np.linspace(lo, hi, bins + 1)
+        edges[0] -= (hi - lo) * 0.001
+        lon_bin = np.clip(np.searchsorted(edges, lon, side="left") - 1, 0, bins - 1)
+
+        return pd.DataFrame({
+            "lat": _weighted_median(lon_bin, lat, self.counts),
+            "lon": _weighted_median(lon_bin, lon, self.counts),
+        }).dropna().reset_index(drop=True)
+
+
+def _weighted_median(groups, values, weights):
+    """Per-group median of values repeated `weights` times (mean of the two middles if even)."""
+    order = np.lexsort((values, groups))
+    groups, values, weights = groups[order], values[order], weights[order]
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    cum = np.cumsum(weights)
+    before = np.r_[0, cum[starts[1:] - 1]]
+    total = np.add.reduceat(weights, starts)
+    # 0-based ranks of the lower/upper middle elements, mapped to global cumulative positions
+    lo = np.searchsorted(cum, before + (total - 1) // 2, side="right")
+    hi = np.searchsorted(cum, before + total // 2, side="right")
+    return (values[lo] + values[hi]) / 2
+
+
+def load_state(path=SKETCH_PATH):
+    """Return ({runway: ApproachSketch}, folded_dates) from disk, or empty state."""
+    if not os.path.exists(path):
+        return {rw: ApproachSketch() for rw in MERGE_POINTS}, []
+    data = np.load(path)
+    sketches = {
+        rw: ApproachSketch(data[f"{rw}_keys"], data[f"{rw}_counts"]) if f"{rw}_keys" in data else ApproachSketch()
+        for rw in MERGE_POINTS
+    }
+    return sketches, json.loads(str(data["folded"]))
+
+
+def save_state(sketches, folded, path=SKETCH_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    arrays = {"folded": np.array(json.dumps(sorted(set(folded))))}
+    for rw, sketch in sketches.items():
+        arrays[f"{rw}_keys"] = sketch.keys
+        arrays[f"{rw}_counts"] = sketch.counts
+    tmp = path + ".tmp.npz"
+    np.savez_compressed(tmp, **arrays)
+    os.replace(tmp, path)
+
+
+def flight_start_days(df):
+    """Segment raw track points; returns (df, UTC start date of each point's flight)."""
+    df, offsets = segment_flights(df)
+    t0 = to_epoch_seconds(df["timestamp"].iloc[offsets[:-1]])
+    start = np.repeat(t0, np.diff(offsets))
+    return df, pd.to_datetime(start, unit="s", utc=True).date
+
+
+def fold_tracks(sketches, df):
+    """Segment, classify, crop and add one batch of raw track points to the sketches."""
+    df, _ = segment_flights(df)
+    df_clean, _ = filter_classified(df)
+    for rw, sketch in sketches.items():
+        points = approach_points(df_clean, rw)
+        if not points.empty:
+            sketch.add(points["lat"].to_numpy(), points["lon"].to_numpy())
+            print(f"   {rw}: +{len(points)} approach points ({sketch.n_points} total)")
+    return sketches
+
+
+def max_deviation_m(path_a, path_b):
+    """Largest north-south gap (m) between two lon-sorted paths over their common lon span."""
+    lo = max(path_a.lon.min(), path_b.lon.min())
+    hi = min(path_a.lon.max(), path_b.lon.max())
+    lon = np.linspace(lo, hi, 500)
+    gap_deg = np.interp(lon, path_a.lon, path_a.lat) - np.interp(lon, path_b.lon, path_b.lat)
+    return float(np.abs(gap_deg).max() * np.radians(1.0) * EARTH_RADIUS_KM * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("command", choices=["fold", "emit", "check"])
+    parser.add_argument("--date", help="UTC day (YYYY-MM-DD) to fold from the track store")
+    parser.add_argument("--csv", help="fold a track CSV instead of a store partition")
+    parser.add_argument("--bins", type=int, default=250)
+    parser.add_argument("--force", action="store_true", help="fold even if already folded")
+    parser.add_argument("--state", default=SKETCH_PATH)
+    args = parser.parse_args()
+
+    sketches, folded = load_state(args.state)
+
+    if args.command == "fold":
+        source = args.csv or args.date
+        if not source:
+            parser.error("fold needs --date or --csv")
+        if source in folded and not args.force:
+            print(f"⏭️ {source} already folded, skipping (use --force to refold)")
+            return
+        if args.csv:
+            df = pd.read_csv(args.csv)
+        else:
+            day = pd.Timestamp(args.date, tz="UTC")
+            pad = pd.Timedelta(seconds=MAX_FLIGHT_S)
+            df, start_day = flight_start_days(load_tracks(start=day - pad, end=day + pd.Timedelta(days=1) + pad))
+            df = df[start_day == day.date()]
+        print(f"📥 Folding {len(df)} points from {source}...")
+        fold_tracks(sketches, df)
+        save_state(sketches, folded + [source], args.state)
+        print(f"💾 Saved sketch state -> {args.state}")
+
+    elif args.command == "emit":
+        for rw, sketch in sketches.items():
+            path = sketch.emit(args.bins)
+            if path.empty:
+                print(f"⚠️ No approach points folded for {rw}.")
+                continue
+            path.to_csv(get_runway(DEFAULT_AIRPORT, rw).ref_path, index=False)
+            print(f"✅ Emitted reference path for {rw}: {len(path)} points from {sketch.n_points} approach points.")
+
+    elif args.command == "check":
+        # fold the history one UTC day of flight starts at a time, then compare with a one-shot rebuild
+        df, start_day = flight_start_days(load_tracks())
+        daily = {rw: ApproachSketch() for rw in MERGE_POINTS}
+        for d, df_day in df.groupby(start_day):
+            print(f"📥 Folding {d}...")
+            fold_tracks(daily, df_day)
+
+        df_clean, _ = filter_classified(segment_flights(df)[0])
+        for rw, sketch in daily.items():
+            full = build_dense_reference(df_clean, rw, bins=args.bins)
+            incremental = sketch.emit(args.bins)
+            if full.empty or incremental.empty:
+                print(f"⚠️ {rw}: nothing to compare")
+                continue
+            print(f"   {rw}: {len(full)} vs {len(incremental)} points, "
+                  f"max deviation {max_deviation_m(incremental, full):.2f} m")
+
+
+if __name__ == "__main__":
+    main()
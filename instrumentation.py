@@ -0,0 +1,337 @@
+"""
+Pipeline instrumentation: stage timers, counters and histograms.
+
+Off by default: every call checks one module global and returns, and
+stage() hands back a shared no-op context manager, so instrumented code
+pays a function call when nothing is recording. enable() starts recording
+and optionally names a JSON-lines event log and a Prometheus textfile
+(node_exporter textfile collector format), both written by flush() and at
+exit. Stages named in `profile` / `trace_memory` also run under cProfile
+(a .prof file per run) or tracemalloc (peak bytes and top allocation sites
+in the stage's event).
+
+    import instrumentation as inst
+
+    inst.enable(jsonl="data/metrics/metrics.jsonl", prom="data/metrics/goaround.prom",
+                profile={"classify_flights"})
+    with inst.stage("classify_flights", airport="KSFO"):
+        ...
+    inst.count("excluded_flights", reason="no_touchdown_pass")
+    inst.observe("http_request_seconds", 0.21, host="fr24api.flightradar24.com")
+
+From the CLI: goaround --metrics data/metrics --profile classify_flights build-paths
+
+Worker processes keep their own registry; drain() returns and resets it so
+the parent can merge() it (see backfill).
+"""
+import atexit
+import contextlib
+import cProfile
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from bisect import bisect_left
+from collections import defaultdict
+
+import numpy as np
+
+PREFIX = "goaround"
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 10000)
+
+_REGISTRY = None
+_NULL = contextlib.nullcontext()
+_EXIT_HOOKED = False
+
+
+class Registry:
+    """Recorded metrics of one process; all updates take one lock (fetcher threads share it)."""
+
+    def __init__(self, jsonl=None, prom=None, profile=(), trace_memory=(), profile_dir=None, run=None):
+        self.jsonl = jsonl
+        self.prom = prom
+        self.profile = set(profile or ())
+        self.trace_memory = set(trace_memory or ())
+        self.profile_dir = profile_dir or os.path.dirname(jsonl or prom or "") or "."
+        self.run = run or time.strftime("%Y%m%dT%H%M%S")
+        self.lock = threading.Lock()
+        self.profiling = False
+        self.reset()
+
+    def reset(self):
+        self.counters = defaultdict(float)       # (name, labels) -> value
+        self.histograms = {}                     # (name, labels) -> [bounds, bucket counts, sum]
+        self.stages = defaultdict(lambda: [0, 0.0])  # (name, labels) -> [runs, seconds]
+        self.events = []
+
+    def snapshot(self):
+        """JSON-able copy of every counter, histogram and stage total."""
+        with self.lock:
+            return {
+                "counters": [[n, dict(l), v] for (n, l), v in self.counters.items()],
+                "histograms": [[n, dict(l), list(b), c.tolist(), s] for (n, l), (b, c, s) in self.histograms.items()],
+                "stages": [[n, dict(l), r, sec] for (n, l), (r, sec) in self.stages.items()],
+                "events": list(self.events),
+            }
+
+
+def _labels(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def enabled():
+    return _REGISTRY is not None
+
+
+def enable(jsonl=None, prom=None, profile=(), trace_memory=(), profile_dir=None, run=None):
+    """Start recording (replacing any current registry); returns the registry."""
+    global _REGISTRY, _EXIT_HOOKED
+    _REGISTRY = Registry(jsonl, prom, profile, trace_memory, profile_dir, run)
+    if not _EXIT_HOOKED:
+        atexit.register(flush)
+        _EXIT_HOOKED = True
+    return _REGISTRY
+
+
+def disable():
+    global _REGISTRY
+    _REGISTRY = None
+
+
+def count(name, value=1, **labels):
+    """Add value to the counter `name` with these labels."""
+    reg = _REGISTRY
+    if reg is None:
+        return
+    key = (name, _labels(labels))
+    with reg.lock:
+        reg.counters[key] += value
+
+
+def _histogram(reg, name, labels, buckets):
+    key = (name, _labels(labels))
+    hist = reg.histograms.get(key)
+    if hist is None:
+        hist = reg.histograms[key] = [tuple(buckets), np.zeros(len(buckets) + 1, dtype=np.int64), 0.0]
+    return hist
+
+
+def observe(name, value, buckets=LATENCY_BUCKETS, **labels):
+    """Record one value in the histogram `name` (bucket i counts values <= buckets[i])."""
+    reg = _REGISTRY
+    if reg is None:
+        return
+    with reg.lock:
+        hist = _histogram(reg, name, labels, buckets)
+        hist[1][bisect_left(hist[0], value)] += 1
+        hist[2] += value
+
+
+def observe_many(name, values, buckets=SIZE_BUCKETS, **labels):
+    """Record an array of values in one pass (e.g. points per flight)."""
+    reg = _REGISTRY
+    if reg is None:
+        return
+    values = np.asarray(values, dtype=float).ravel()
+    with reg.lock:
+        hist = _histogram(reg, name, labels, buckets)
+        hist[1] += np.bincount(np.searchsorted(hist[0], values, side="left"), minlength=len(hist[1]))
+        hist[2] += float(values.sum())
+
+
+class _Stage:
+    def __init__(self, reg, name, labels):
+        self.reg = reg
+        self.name = name
+        self.labels = labels
+        self.profiler = None
+        self.traced = None
+
+    def __enter__(self):
+        reg = self.reg
+        if self.name in reg.profile and not reg.profiling:
+            # one cProfile at a time; a nested profiled stage is covered by the outer one
+            reg.profiling = True
+            self.profiler = cProfile.Profile()
+        if self.name in reg.trace_memory:
+            started = not tracemalloc.is_tracing()
+            if started:
+                tracemalloc.start()
+            self.traced = (started, tracemalloc.get_traced_memory()[0])
+            tracemalloc.reset_peak()
+        self.t0 = time.perf_counter()
+        if self.profiler is not None:
+            self.profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.profiler is not None:
+            self.profiler.disable()
+        seconds = time.perf_counter() - self.t0
+        reg = self.reg
+        event = {"ts": time.time(), "run": reg.run, "type": "stage", "stage": self.name,
+                 "labels": self.labels, "seconds": seconds, "ok": exc_type is None}
+
+        if self.traced is not None:
+            started, base = self.traced
+            event["peak_bytes"] = tracemalloc.get_traced_memory()[1] - base
+            top = tracemalloc.take_snapshot().statistics("lineno")[:5]
+            event["top_allocations"] = [f"{s.traceback[0].filename}:{s.traceback[0].lineno} {s.size}" for s in top]
+            if started:
+                tracemalloc.stop()
+        if self.profiler is not None:
+            os.makedirs(reg.profile_dir, exist_ok=True)
+            path = os.path.join(reg.profile_dir, f"{self.name}-{reg.run}-{int(time.time() * 1000) % 100000}.prof")
+            self.profiler.dump_stats(path)
+            event["profile"] = path
+            reg.profiling = False
+
+        key = (self.name, _labels(self.labels))
+        with reg.lock:
+            totals = reg.stages[key]
+            totals[0] += 1
+            totals[1] += seconds
+            reg.events.append(event)
+        return False
+
+
+def stage(name, **labels):
+    """Context manager timing one pipeline stage (no-op when disabled)."""
+    reg = _REGISTRY
+    if reg is None:
+        return _NULL
+    return _Stage(reg, name, labels)
+
+
+def timed(name=None):
+    """Decorator: run the function as a stage (named after it by default)."""
+    def wrap(fn):
+        stage_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if _REGISTRY is None:
+                return fn(*args, **kwargs)
+            with stage(stage_name):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def drain():
+    """Snapshot and reset this process's metrics (None when disabled); for worker processes."""
+    reg = _REGISTRY
+    if reg is None:
+        return None
+    snap = reg.snapshot()
+    with reg.lock:
+        reg.reset()
+    return snap
+
+
+def merge(snap):
+    """Fold a drain() snapshot from another process into this registry."""
+    reg = _REGISTRY
+    if reg is None or not snap:
+        return
+    with reg.lock:
+        for name, labels, value in snap["counters"]:
+            reg.counters[(name, _labels(labels))] += value
+        for name, labels, bounds, counts, total in snap["histograms"]:
+            hist = _histogram(reg, name, labels, bounds)
+            hist[1] += np.asarray(counts, dtype=np.int64)
+            hist[2] += total
+        for name, labels, runs, seconds in snap["stages"]:
+            totals = reg.stages[(name, _labels(labels))]
+            totals[0] += runs
+            totals[1] += seconds
+        reg.events.extend(snap["events"])
+
+
+# --- export ---
+def _metric_name(name):
+    clean = "".join(c if c.isalnum() or c == "_" else "_" for c in name)
+    return f"{PREFIX}_{clean}"
+
+
+def _label_text(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    esc = [(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in pairs]
+    return "{" + ",".join(f'{k}="{v}"' for k, v in esc) + "}"
+
+
+def prometheus_text(reg=None):
+    """Current metrics in the Prometheus text exposition format."""
+    reg = reg or _REGISTRY
+    if reg is None:
+        return ""
+    lines = []
+    with reg.lock:
+        if reg.stages:
+            for suffix, idx, help_text in (("stage_seconds_total", 1, "Wall time spent in each pipeline stage."),
+                                           ("stage_runs_total", 0, "Completed runs of each pipeline stage.")):
+                metric = _metric_name(suffix)
+                lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+                lines += [f"{metric}{_label_text((('stage', n),) + l)} {v[idx]}" for (n, l), v in reg.stages.items()]
+        by_name = defaultdict(list)
+        for (name, labels), value in reg.counters.items():
+            by_name[name].append((labels, value))
+        for name, series in sorted(by_name.items()):
+            metric = _metric_name(name) + "_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines += [f"{metric}{_label_text(l)} {v:g}" for l, v in series]
+        hists = defaultdict(list)
+        for (name, labels), hist in reg.histograms.items():
+            hists[name].append((labels, hist))
+        for name, series in sorted(hists.items()):
+            metric = _metric_name(name)
+            lines.append(f"# TYPE {metric} histogram")
+            for labels, (bounds, counts, total) in series:
+                cumulative = np.cumsum(counts)
+                for le, c in zip([f"{b:g}" for b in bounds] + ["+Inf"], cumulative):
+                    lines.append(f"{metric}_bucket{_label_text(labels, [('le', le)])} {c}")
+                lines.append(f"{metric}_sum{_label_text(labels)} {total:g}")
+                lines.append(f"{metric}_count{_label_text(labels)} {cumulative[-1]}")
+    return "\n".join(lines) + "\n"
+
+
+def summary(reg=None, top=10):
+    """Short text report: slowest stages and every counter."""
+    reg = reg or _REGISTRY
+    if reg is None:
+        return "instrumentation disabled"
+    snap = reg.snapshot()
+    lines = [f"{'stage':<40}{'runs':>6}{'seconds':>10}"]
+    for name, labels, runs, seconds in sorted(snap["stages"], key=lambda s: -s[3])[:top]:
+        tag = name + (f" [{','.join(labels.values())}]" if labels else "")
+        lines.append(f"{tag[:40]:<40}{runs:>6}{seconds:>10.2f}")
+    for name, labels, value in sorted(snap["counters"], key=lambda c: (c[0], sorted(c[1].items()))):
+        lines.append(f"  {name} {labels or ''}: {value:g}")
+    return "\n".join(lines)
+
+
+def flush():
+    """Append pending events plus a totals record to the JSON-lines log and rewrite the textfile."""
+    reg = _REGISTRY
+    if reg is None:
+        return
+    if reg.jsonl:
+        os.makedirs(os.path.dirname(reg.jsonl) or ".", exist_ok=True)
+        snap = reg.snapshot()
+        with reg.lock:
+            reg.events = []
+        with open(reg.jsonl, "a") as f:
+            for event in snap.pop("events"):
+                f.write(json.dumps(event, default=str) + "\n")
+            f.write(json.dumps({"ts": time.time(), "run": reg.run, "type": "totals", **snap}, default=str) + "\n")
+    if reg.prom:
+        os.makedirs(os.path.dirname(reg.prom) or ".", exist_ok=True)
+        tmp = reg.prom + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(prometheus_text(reg))
+        os.replace(tmp, reg.prom)   # the textfile collector must never read a partial file
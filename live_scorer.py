@@ -0,0 +1,359 @@
+"""
+Live go-around risk scoring.
+
+Polls the OpenSky API (fetch_live_data.OpenSkyClient) on an interval (or replays recorded
+snapshots: a snapshot_log file or a directory of per-poll Parquet files), keeps a short ring buffer of state vectors per icao24, and
+scores every aircraft established on a 28L/28R approach with a pluggable
+model (a trained goaround_model artifact via --model, else a heuristic).
+End-to-end latency (poll start -> scores ready) is tracked as p50/p99.
+
+    python live_scorer.py --interval 10 --record data/live.snap
+    python live_scorer.py --replay data/live.snap --speed 0   # offline load test
+    python live_scorer.py --model data/goaround_model.json
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from bbox_utils import get_bbox
+from density_features import DEFAULT_WINDOWS_MIN, LiveDensity
+from instrumentation import count, observe
+from ref_index import load_reference_paths, query_all
+
+GLIDE_SLOPE = np.tan(np.radians(3.0))
+THRESHOLD_CROSSING_M = 50 * 0.3048   # 3° path crosses the threshold at 50 ft, as in stability_features
+MAX_DIST_M = 2000        # on final: this close to a reference path...
+MAX_ALONG_M = 14000      # ...and at most ~7.5 NM before its threshold (both 28L/28R paths reach this far)
+FEATURES = [
+    "cross_track_m", "cross_track_rate", "heading_err_deg", "glide_dev_m",
+    "vertical_rate", "velocity", "speed_trend", "along_track_m",
+]
+# trailing arrival counts (airport-wide and same runway), as density_features names them
+DENSITY_FEATURES = ([f"arrivals_prev_{w}m" for w in DEFAULT_WINDOWS_MIN]
+                    + [f"rwy_arrivals_prev_{w}m" for w in DEFAULT_WINDOWS_MIN])
+ARRIVAL_ALONG_M = 2000     # on final, airborne and within this of the threshold (or past it) = one arrival
+REARRIVAL_S = 1800         # the same icao24 arriving again after this long counts again
+
+
+class HeuristicModel:
+    """Placeholder risk model: logistic of how far the approach is from stabilized."""
+
+    features = FEATURES
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=float)
+        f = dict(zip(FEATURES, X.T))
+        z = (-4.0
+             + np.abs(f["cross_track_m"]) / 300
+             + np.abs(f["cross_track_rate"]) / 5
+             + np.abs(f["heading_err_deg"]) / 30
+             + np.abs(f["glide_dev_m"]) / 150
+             + np.maximum(f["vertical_rate"], 0) / 5
+             + np.maximum(-f["speed_trend"], 0) / 2)
+        return 1 / (1 + np.exp(-z))
+
+
+class StateBuffer:
+    """
+    Fixed-size ring buffers of recent state vectors for every tracked icao24.
+
+    Stored as (max_aircraft, history) arrays so a whole poll is written and
+    read with fancy indexing; slots of aircraft unseen for `ttl` seconds are
+    recycled.
+    """
+
+    FIELDS = ["t", "lat", "lon", "alt", "velocity", "track", "vertical_rate"]
+
+    def __init__(self, max_aircraft=2048, history=16, ttl=300):
+        self.history = history
+        self.ttl = ttl
+        self.data = {f: np.full((max_aircraft, history), np.nan) for f in self.FIELDS}
+        self.head = np.zeros(max_aircraft, dtype=np.int64)   # number of writes per slot
+        self.last_seen = np.full(max_aircraft, -np.inf)
+        self.slots = {}
+        self.free = list(range(max_aircraft - 1, -1, -1))
+
+    def _slot_for(self, icao24s, now):
+        if not self.free:
+            stale = [k for k, s in self.slots.items() if now - self.last_seen[s] > self.ttl]
+            for k in stale:
+                self.free.append(self.slots.pop(k))
+        out = np.empty(len(icao24s), dtype=np.int64)
+        for i, k in enumerate(icao24s):
+            slot = self.slots.get(k)
+            if slot is None:
+                if not self.free:
+                    raise RuntimeError("StateBuffer full; raise max_aircraft")
+                slot = self.slots[k] = self.free.pop()
+                self.head[slot] = 0
+                for arr in self.data.values():
+                    arr[slot] = np.nan
+            out[i] = slot
+        return out
+
+    def update(self, icao24s, now, **columns):
+        """Append one row per aircraft; returns the slot index of each."""
+        slots = self._slot_for(icao24s, now)
+        pos = self.head[slots] % self.history
+        for f, values in columns.items():
+            self.data[f][slots, pos] = values
+        self.head[slots] += 1
+        self.last_seen[slots] = now
+        return slots
+
+    def lagged(self, field, slots, lag):
+        """Value `lag` polls ago for each slot (NaN if not that much history)."""
+        pos = (self.head[slots] - 1 - lag) % self.history
+        vals = self.data[field][slots, pos]
+        return np.where(self.head[slots] > lag, vals, np.nan)
+
+
+def approach_state(index, t, lat, lon, alt_m, track_deg, velocity, vertical_rate, prev):
+    """
+    Approach features for a batch of positions against the reference paths.
+
+    `prev` holds t/lat/lon/velocity of the same aircraft `lag` samples back
+    (NaN where there is no history); live polls and historical tracks
+    (goaround_model) both go through here so the model sees one definition.
+    Returns runway, dist_m and FEATURES per position.
+    """
+    geo = query_all(index, lat, lon)
+    dt = t - prev["t"]
+    prev_geo = query_all(index, np.where(np.isnan(prev["lat"]), lat, prev["lat"]),
+                         np.where(np.isnan(prev["lon"]), lon, prev["lon"]))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cross_rate = (geo["cross_track_m"].to_numpy() - prev_geo["cross_track_m"].to_numpy()) / dt
+        speed_trend = (velocity - prev["velocity"]) / dt
+
+    return pd.DataFrame({
+        "runway": geo["runway"].to_numpy(),
+        "dist_m": geo["dist_m"].to_numpy(),
+        "cross_track_m": geo["cross_track_m"].to_numpy(),
+        "cross_track_rate": np.nan_to_num(cross_rate),
+        "heading_err_deg": (track_deg - geo["heading_deg"].to_numpy() + 180) % 360 - 180,
+        "glide_dev_m": alt_m - (THRESHOLD_CROSSING_M + np.maximum(geo["along_track_m"].to_numpy(), 0) * GLIDE_SLOPE),
+        "vertical_rate": np.nan_to_num(vertical_rate),
+        "velocity": np.nan_to_num(velocity),
+        "speed_trend": np.nan_to_num(speed_trend),
+        "along_track_m": geo["along_track_m"].to_numpy(),
+    })
+
+
+class GoAroundScorer:
+    def __init__(self, model=None, index=None, lag=3, max_dist_m=MAX_DIST_M, max_along_m=MAX_ALONG_M):
+        self.model = model or HeuristicModel()
+        self.index = index or load_reference_paths()
+        self.buffer = StateBuffer()
+        self.lag = lag
+        self.max_dist_m = max_dist_m
+        self.max_along_m = max_along_m
+        self.density = LiveDensity()
+        self.arrived = {}   # icao24 -> time it was last counted as an arrival
+
+    def features(self, states, now):
+        """Update buffers with one poll and return features for aircraft on final."""
+        states = states.dropna(subset=["latitude", "longitude"])
+        states = states[~states["on_ground"].astype(bool)]
+        if states.empty:
+            return pd.DataFrame(columns=["icao24", "callsign", "runway"] + FEATURES + DENSITY_FEATURES)
+
+        t = states["time_position"].fillna(states["last_contact"]).to_numpy(dtype=float)
+        lat, lon = states["latitude"].to_numpy(dtype=float), states["longitude"].to_numpy(dtype=float)
+        slots = self.buffer.update(
+            states["icao24"].tolist(), now,
+            t=t,
+            lat=lat,
+            lon=lon,
+            alt=states["baro_altitude"].to_numpy(dtype=float),
+            velocity=states["velocity"].to_numpy(dtype=float),
+            track=states["true_track"].to_numpy(dtype=float),
+            vertical_rate=states["vertical_rate"].to_numpy(dtype=float),
+        )
+        # rates against the state `lag` polls back
+        prev = {f: self.buffer.lagged(f, slots, self.lag) for f in ("t", "lat", "lon", "velocity")}
+        feats = approach_state(
+            self.index, t, lat, lon,
+            alt_m=states["baro_altitude"].to_numpy(dtype=float),
+            track_deg=states["true_track"].to_numpy(dtype=float),
+            velocity=states["velocity"].to_numpy(dtype=float),
+            vertical_rate=states["vertical_rate"].to_numpy(dtype=float),
+            prev=prev,
+        )
+        feats.insert(0, "icao24", states["icao24"].to_numpy())
+        feats.insert(1, "callsign", states["callsign"].astype(str).str.strip().to_numpy())
+        on_final = (feats["dist_m"].to_numpy() < self.max_dist_m) & (feats["along_track_m"].to_numpy() < self.max_along_m)
+        feats = feats[on_final].drop(columns="dist_m").reset_index(drop=True)
+
+        # traffic density: an aircraft counts as one arrival when it first gets within ARRIVAL_ALONG_M
+        if len(self.arrived) > len(self.buffer.head):
+            self.arrived = {k: v for k, v in self.arrived.items() if now - v <= REARRIVAL_S}
+        for icao24, runway, along in zip(feats["icao24"], feats["runway"], feats["along_track_m"]):
+            if along < ARRIVAL_ALONG_M and now - self.arrived.get(icao24, -np.inf) > REARRIVAL_S:
+                self.arrived[icao24] = now
+                self.density.add(now, runway=runway)
+        # no track or baro altitude (common in OpenSky states): counted as an arrival, not scored
+        scorable = np.isfinite(feats[["heading_err_deg", "glide_dev_m"]].to_numpy()).all(axis=1)
+        feats = feats[scorable].reset_index(drop=True)
+        counts = [self.density.counts(now, runway=rw) for rw in feats["runway"]]
+        for col in DENSITY_FEATURES:
+            feats[col] = np.array([c[col] for c in counts], dtype=float)
+        return feats
+
+    def score(self, states, now):
+        feats = self.features(states, now)
+        feats["risk"] = self.model.predict(feats[list(self.model.features)].to_numpy()) if len(feats) else []
+        return feats
+
+
+class LatencyTracker:
+    def __init__(self, window=1000):
+        self.samples = []
+        self.window = window
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        del self.samples[:-self.window]
+
+    def summary(self):
+        if not self.samples:
+            return "no samples"
+        p50, p99 = np.percentile(self.samples, [50, 99]) * 1000
+        return f"p50 {p50:.1f} ms, p99 {p99:.1f} ms over {len(self.samples)} polls"
+
+
+def is_snapshot_log(path):
+    return path.endswith(".snap")
+
+
+async def live_source(bbox, interval, record=None):
+    """
+    Yield (poll_time, states, t_start) every `interval` seconds from the OpenSky API.
+
+    `record` saves every poll: a *.snap path appends to a snapshot_log, anything
+    else is a directory of per-poll Parquet files.
+    """
+    from fetch_live_data import OpenSkyClient
+
+    client = OpenSkyClient()  # cached token + keep-alive session across polls
+    writer = None
+    if record and is_snapshot_log(record):
+        from snapshot_log import SnapshotWriter
+
+        writer = SnapshotWriter(record)
+    elif record:
+        os.makedirs(record, exist_ok=True)
+    try:
+        while True:
+            started = time.time()
+            t_start = time.perf_counter()
+            try:
+                states = await asyncio.to_thread(client.fetch_flights, bbox)
+            except Exception as e:  # keep polling through transient API errors
+                print(f"⚠️ Poll failed: {e}")
+                states = None
+            if states is not None:
+                if writer is not None:
+                    writer.append(started, states)
+                elif record:
+                    states.assign(poll_time=started).to_parquet(
+                        os.path.join(record, f"snap_{int(started)}.parquet"), index=False
+                    )
+                yield started, states, t_start
+            await asyncio.sleep(max(0.0, interval - (time.time() - started)))
+    finally:  # flush the last delta block on Ctrl-C
+        if writer is not None:
+            writer.close()
+
+
+def _recorded_polls(record):
+    """(poll_time, states) from a snapshot_log file or a directory of snap_*.parquet files."""
+    if is_snapshot_log(record):
+        from snapshot_log import SnapshotReader
+
+        with SnapshotReader(record) as reader:
+            yield from reader.read()
+        return
+    for path in sorted(glob.glob(os.path.join(record, "snap_*.parquet"))):
+        states = pd.read_parquet(path)
+        yield float(states["poll_time"].iloc[0]) if "poll_time" in states else float(states["last_contact"].max()), states
+
+
+async def replay_source(record, speed=0.0):
+    """Yield recorded snapshots in time order; speed=1 is real time, 0 is as fast as possible."""
+    polls = _recorded_polls(record)
+    prev = None
+    while True:
+        t_start = time.perf_counter()
+        poll_time, states = next(polls, (None, None))
+        if states is None:
+            break
+        if speed and prev is not None:
+            await asyncio.sleep(max(0.0, (poll_time - prev) / speed))
+            t_start = time.perf_counter()
+        prev = poll_time
+        yield poll_time, states, t_start
+
+
+async def run(source, scorer, out=None, quiet=False):
+    latency = LatencyTracker()
+    polls = 0
+    async for poll_time, states, t_start in source:
+        scores = scorer.score(states, poll_time)
+        elapsed = time.perf_counter() - t_start
+        latency.add(elapsed)  # live: includes the fetch; replay: read + score
+        polls += 1
+        observe("poll_seconds", elapsed)
+        count("aircraft_scored", len(scores))
+
+        if out is not None:
+            for rec in scores.assign(poll_time=poll_time).to_dict("records"):
+                out.write(json.dumps(rec, default=float, allow_nan=False) + "\n")
+        if not quiet and len(scores):
+            top = scores.sort_values("risk", ascending=False).head(5)
+            print(f"🛬 {pd.Timestamp(poll_time, unit='s')}: {len(scores)} on final | "
+                  + ", ".join(f"{r.callsign or r.icao24} {r.runway} {r.risk:.2f}" for r in top.itertuples()))
+        if polls % 50 == 0:
+            print(f"⏱️ {latency.summary()}")
+    print(f"⏱️ {latency.summary()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--bbox", default="balanced", help="bbox_utils level")
+    parser.add_argument("--interval", type=float, default=10.0, help="poll interval, seconds")
+    parser.add_argument("--record", help="save each live poll: a .snap snapshot log or a directory")
+    parser.add_argument("--replay", help="recorded .snap log or snapshot directory to replay instead of polling")
+    parser.add_argument("--speed", type=float, default=0.0, help="replay speed (1 = real time, 0 = max)")
+    parser.add_argument("--out", help="append scores as JSON lines")
+    parser.add_argument("--model", help="trained goaround_model artifact (default: heuristic)")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args()
+
+    if args.replay:
+        source = replay_source(args.replay, args.speed)
+    else:
+        source = live_source(get_bbox(args.bbox), args.interval, args.record)
+
+    model = None
+    if args.model:
+        from goaround_model import LogisticModel
+
+        model = LogisticModel.load(args.model)
+    out = open(args.out, "a") if args.out else None
+    try:
+        asyncio.run(run(source, GoAroundScorer(model), out, args.quiet))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if out:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,16 @@
 import os
-import requests
 import time
 import pandas as pd
-import matplotlib.pyplot as plt
-import cartopy.crs as ccrs
 from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
-import ssl
 
-ssl._create_default_https_context = ssl._create_unverified_context
+from fetcher import RateLimitedFetcher, FR24_RATE_PER_SEC
+from instrumentation import SIZE_BUCKETS, count, observe, timed
+from render import draw_density, frame_version, render_grid
+from response_cache import ResponseCache
+from segmentation import segment_flights
+from track_filter import format_report, shrink_tracks
+from track_store import drop_stored, write_tracks
 
 # -----------------------------
 # Setup
@@ -26,81 +28,91 @@ HEADERS = {
 HISTORIC_URL = "https://fr24api.flightradar24.com/api/historic/flight-positions/full"
 TRACK_URL = "https://fr24api.flightradar24.com/api/flight-tracks"
 
+# A track fetched this soon after the flight was seen inbound may still be growing
+TRACK_SETTLE_S = 2 * 3600
+
+# Only the SFO region is kept; cruise/early approach is thinned to 25 m
+CLIP_LEVEL = "balanced"
+SIMPLIFY_TOLERANCE_M = 25.0
+
+
 # -----------------------------
 # Step 1: Fetch inbound flights from recent intervals
 # -----------------------------
-tracks = []
-now = datetime.now(timezone.utc)
-intervals = [now - timedelta(hours=h) for h in range(1, 6, 1)] 
-
-for ts in intervals:
-    unix_ts = int(ts.timestamp())
-    print(f"\n🕒 Fetching inbound flights at {ts.isoformat()}...")
-    params = {
-        "airports": "inbound:KSFO",
-        "bounds": "38.3,36.8,-123.2,-121.5",
-        "timestamp": unix_ts,
-        "limit": 20
-    }
-
-    resp = requests.get(HISTORIC_URL, headers=HEADERS, params=params)
-    if resp.status_code != 200:
-        print("❌ Error fetching inbound flights:", resp.text)
-        continue
-
-    flights = resp.json().get("data", [])
-    print(f"→ Found {len(flights)} flights")
-
-    # -----------------------------
-    # Step 2: For each flight, fetch its track
-    # -----------------------------
-    for i, f in enumerate(flights):
-        fr24_id = f.get("fr24_id")
-        callsign = f.get("callsign")
-        if not fr24_id:
+@timed()
+def fetch_inbound_jobs(fetcher, intervals):
+    """[(callsign, fr24_id, seen_at)] for every inbound flight seen at the given (UTC) times."""
+    print(f"\n🕒 Fetching inbound flights at {len(intervals)} intervals...")
+    snapshots = fetcher.get_many(HISTORIC_URL, [
+        {
+            "airports": "inbound:KSFO",
+            "bounds": "38.3,36.8,-123.2,-121.5",
+            "timestamp": int(ts.timestamp()),
+            "limit": 20
+        }
+        for ts in intervals
+    ])
+
+    jobs = []
+    for ts, snapshot in zip(intervals, snapshots):
+        if snapshot is None:
+            print(f"❌ Error fetching inbound flights at {ts.isoformat()}")
+            count("snapshots", result="failed")
             continue
+        count("snapshots", result="ok")
 
-        date_str = ts.strftime("%Y-%m-%d")
-        print(f"   ({i+1}/{len(flights)}) Track for {callsign} ({fr24_id})...")
-
-        t_resp = requests.get(
-            TRACK_URL,
-            headers=HEADERS,
-            params={"flight_id": fr24_id, "date": date_str}
-        )
-        print(f"      URL: {t_resp.url}")
-        print(f"      Status: {t_resp.status_code}")
-        print(f"      Body: {t_resp.text[:400]}")
-
-        if t_resp.status_code != 200:
-            print(f"      ⚠️ Failed: {t_resp.status_code} {t_resp.text[:150]}")
-            time.sleep(6)
-            continue
+        flights = snapshot.get("data", [])
+        print(f"→ Found {len(flights)} flights at {ts.isoformat()}")
+        for f in flights:
+            if f.get("fr24_id"):
+                jobs.append((f.get("callsign"), f["fr24_id"], ts))
+    return jobs
 
-        try:
-            t_json = t_resp.json()
-        except Exception as e:
-            print(f"      ⚠️ JSON decode error for {callsign}: {e}")
-            continue
 
-        if not t_json or t_json == []:
+# -----------------------------
+# Step 2: For each flight, fetch its track
+# -----------------------------
+def extract_track_points(t_json):
+    """FR24 sometimes returns a list, sometimes {"tracks": [...]}"""
+    if isinstance(t_json, list):
+        points = []
+        for obj in t_json:
+            if isinstance(obj, dict) and "tracks" in obj:
+                points.extend(obj["tracks"])
+        return points
+    if isinstance(t_json, dict):
+        return t_json.get("tracks", [])
+    return []
+
+
+@timed()
+def fetch_tracks(fetcher, jobs):
+    """One row per track point of every job's flight."""
+    print(f"\n🛰️ Fetching {len(jobs)} tracks...")
+    # a cached track counts only if it was stored once the flight had settled (landed);
+    # anything cached earlier may be partial, so it is fetched again
+    now = time.time()
+    track_responses = fetcher.get_many(
+        TRACK_URL,
+        [{"flight_id": fr24_id, "date": seen_at.strftime("%Y-%m-%d")} for _, fr24_id, seen_at in jobs],
+        max_age=[now - (seen_at.timestamp() + TRACK_SETTLE_S) for _, _, seen_at in jobs],
+    )
+
+    tracks = []
+    for (callsign, fr24_id, seen_at), t_json in zip(jobs, track_responses):
+        date_str = seen_at.strftime("%Y-%m-%d")
+        if not t_json:
             print(f"      ⚠️ Empty response for {callsign} ({fr24_id}) on {date_str}")
+            count("tracks", result="empty_response")
             continue
 
-        # FR24 sometimes returns a list, sometimes {"tracks": [...]}
-        if isinstance(t_json, list):
-            points = []
-            for obj in t_json:
-                if isinstance(obj, dict) and "tracks" in obj:
-                    points.extend(obj["tracks"])
-        elif isinstance(t_json, dict):
-            points = t_json.get("tracks", [])
-        else:
-            points = []
-
+        points = extract_track_points(t_json)
         if not points:
             print(f"      ⚠️ No track points for {callsign}")
+            count("tracks", result="no_points")
             continue
+        count("tracks", result="ok")
+        observe("points_per_track", len(points), buckets=SIZE_BUCKETS)
 
         for p in points:
             if all(k in p for k in ["lat", "lon", "alt", "timestamp"]):
@@ -111,30 +123,62 @@ for ts in intervals:
                     "alt": p["alt"],
                     "timestamp": p["timestamp"]
                 })
+    return pd.DataFrame(tracks)
 
-        time.sleep(6)  # stay under 10 req/min
 
 # -----------------------------
 # Step 3: Save & visualize
 # -----------------------------
-df_tracks = pd.DataFrame(tracks)
-print(f"\n✅ Saved {len(df_tracks)} points from {df_tracks['callsign'].nunique() if not df_tracks.empty else 0} flights.")
-df_tracks.to_csv("sfo_landing_paths.csv", index=False)
+def plot_tracks(df_tracks, n_flights, bbox=(-123.2, -121.5, 36.8, 38.3)):
+    """One density image over all flights instead of a line artist (and legend entry) per callsign."""
+    import ssl
+
+    import cartopy.crs as ccrs
+    import matplotlib.pyplot as plt
+
+    # cartopy downloads coastlines over HTTPS; some setups lack the CA bundle
+    ssl._create_default_https_context = ssl._create_unverified_context
+
+    lon, lat = df_tracks["lon"].to_numpy(dtype=float), df_tracks["lat"].to_numpy(dtype=float)
+    grid = render_grid(lon, lat, bbox, zoom=11, flight=df_tracks["flight_id"].to_numpy(),
+                       version=frame_version(lon, lat))
+
+    plt.figure(figsize=(8, 8))
+    ax = plt.axes(projection=ccrs.PlateCarree())
+    ax.set_extent(bbox)
+    ax.coastlines()
+    ax.gridlines(draw_labels=True)
+    draw_density(ax, grid, bbox, transform=ccrs.PlateCarree())
+
+    plt.title(f"Inbound Flight Paths to SFO (Historical Data, {n_flights} flights)")
+    plt.show()
+
+
+def main():
+    cache = ResponseCache()
+    now = datetime.now(timezone.utc)
+    intervals = [now - timedelta(hours=h) for h in range(1, 6, 1)]
+
+    with RateLimitedFetcher(headers=HEADERS, rate=FR24_RATE_PER_SEC, max_workers=4, cache=cache) as fetcher:
+        jobs = fetch_inbound_jobs(fetcher, intervals)
+        df_tracks = fetch_tracks(fetcher, jobs)
+    print(f"🗄️ Cache: {cache.stats()}")
 
-if df_tracks.empty:
-    print("⚠️ No track data found to plot.")
-    exit()
+    df_tracks, report = shrink_tracks(df_tracks, CLIP_LEVEL, SIMPLIFY_TOLERANCE_M)
+    print(f"✂️ {format_report(report)}")
+    df_tracks.to_csv("sfo_landing_paths.csv", index=False)
+    # overlapping fetch windows return the same points again
+    write_tracks(drop_stored(df_tracks))
 
-plt.figure(figsize=(8, 8))
-ax = plt.axes(projection=ccrs.PlateCarree())
-ax.set_extent([-123.2, -121.5, 36.8, 38.3])
-ax.coastlines()
-ax.gridlines(draw_labels=True)
+    if df_tracks.empty:
+        print("⚠️ No track data found to plot.")
+        return
 
+    # Split callsigns into individual flights (tracks often include the previous leg)
+    df_tracks, offsets = segment_flights(df_tracks)
+    print(f"\n✅ Saved {len(df_tracks)} points from {len(offsets) - 1} flights.")
+    plot_tracks(df_tracks, len(offsets) - 1)
 
-for callsign, group in df_tracks.groupby("callsign"):
-    plt.plot(group["lon"], group["lat"], linewidth=1, transform=ccrs.PlateCarree(), label=callsign)
 
-plt.title("Inbound Flight Paths to SFO (Historical Data)")
-plt.legend(fontsize=6, loc="lower left")
-plt.show()
+if __name__ == "__main__":
+    main()
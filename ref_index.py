@@ -0,0 +1,147 @@
+import numpy as np
+import pandas as pd
+
+from geo import to_local_xy
+from runways import get_airport
+
+REF_PATHS = {name: rw.ref_path for name, rw in get_airport().approach_runways().items()}
+THRESHOLDS = {name: rw.threshold for name, rw in get_airport().approach_runways().items()}
+
+
+class ReferencePath:
+    """
+    Segment index over one reference polyline in a local metric frame.
+
+    Vertices are ordered from the runway end outward (the ref_path_*.csv files
+    are binned west->east, so row 0 is nearest the runway for the 28s).
+    along_track_m is measured from the projection of `threshold` onto the
+    path (negative past it), or from vertex 0 when no threshold is given.
+    Each segment is sampled every `spacing` metres into a KD-tree; a query
+    takes the k nearest samples as candidate segments and measures exact
+    point-to-segment distance on those. Every point of a segment lies within
+    spacing/2 of one of its samples, so the returned distance is never more
+    than spacing/2 above the true minimum. With exact=True, points where a
+    non-candidate segment could still be closer are re-checked by full scan.
+    """
+
+    def __init__(self, lat, lon, name=None, threshold=None, k=4, spacing=10.0):
+        from scipy.spatial import cKDTree
+
+        lat = np.asarray(lat, dtype=float)
+        lon = np.asarray(lon, dtype=float)
+        if len(lat) < 2:
+            raise ValueError("reference path needs at least two vertices")
+        self.name = name
+        self.origin = (lat[0], lon[0])
+        x, y = to_local_xy(lat, lon, self.origin)
+
+        self.ax, self.ay = x[:-1], y[:-1]
+        self.dx, self.dy = np.diff(x), np.diff(y)
+        self.length = np.hypot(self.dx, self.dy)
+        self.len2 = np.maximum(self.length ** 2, 1e-12)
+        self.cum = np.r_[0.0, np.cumsum(self.length)[:-1]]  # along-track distance at segment start
+        # course flown along the segment toward the runway (vertex i+1 -> i), degrees true
+        self.heading = (np.degrees(np.arctan2(-self.dx, -self.dy)) + 360) % 360
+
+        per_seg = np.maximum(np.ceil(self.length / spacing).astype(int), 1)
+        self.sample_seg = np.repeat(np.arange(len(self.length)), per_seg)
+        frac = (np.arange(len(self.sample_seg)) - np.repeat(np.cumsum(per_seg) - per_seg, per_seg) + 0.5)
+        frac /= per_seg[self.sample_seg]
+        self.tree = cKDTree(np.column_stack([
+            self.ax[self.sample_seg] + frac * self.dx[self.sample_seg],
+            self.ay[self.sample_seg] + frac * self.dy[self.sample_seg],
+        ]))
+        self.slack = (self.length / per_seg).max() / 2
+        self.k = min(k, len(self.sample_seg))
+
+        self.threshold_along = 0.0
+        if threshold is not None:
+            self.threshold_along = float(self.query([threshold[0]], [threshold[1]], exact=True)["along_track_m"][0])
+
+    @classmethod
+    def from_csv(cls, path, name=None, **kwargs):
+        ref = pd.read_csv(path)
+        return cls(ref["lat"].to_numpy(), ref["lon"].to_numpy(), name=name, **kwargs)
+
+    def _project(self, px, py, seg):
+        """Exact projection of points onto candidate segments (seg broadcastable to px)."""
+        t = ((px - self.ax[seg]) * self.dx[seg] + (py - self.ay[seg]) * self.dy[seg]) / self.len2[seg]
+        t = np.clip(t, 0.0, 1.0)
+        qx = self.ax[seg] + t * self.dx[seg] - px
+        qy = self.ay[seg] + t * self.dy[seg] - py
+        return t, np.hypot(qx, qy)
+
+    def _result(self, px, py, seg, t, dist):
+        # sign: + when the point is right of the course flown (toward the runway)
+        cross = (self.dx[seg] * (py - self.ay[seg]) - self.dy[seg] * (px - self.ax[seg]))
+        return {
+            "segment": seg,
+            "dist_m": dist,
+            "cross_track_m": np.where(cross >= 0, dist, -dist),
+            "along_track_m": self.cum[seg] + t * self.length[seg] - self.threshold_along,
+            "heading_deg": self.heading[seg],
+        }
+
+    def query(self, lat, lon, exact=False):
+        """Nearest segment for every point; returns a dict of arrays (see _result)."""
+        px, py = to_local_xy(lat, lon, self.origin)
+        px, py = np.atleast_1d(px), np.atleast_1d(py)
+        d_sample, nearest = self.tree.query(np.column_stack([px, py]), k=self.k, workers=-1)
+        d_sample = d_sample.reshape(len(px), -1)
+        cand = self.sample_seg[nearest.reshape(len(px), -1)]
+
+        t, dist = self._project(px[:, None], py[:, None], cand)
+        best = dist.argmin(axis=1)
+        rows = np.arange(len(px))
+        seg, t, dist = cand[rows, best], t[rows, best], dist[rows, best]
+
+        # a non-candidate segment is at least (kth sample distance - slack) away
+        unsure = []
+        if exact and self.k < len(self.sample_seg):
+            unsure = np.flatnonzero(d_sample[:, -1] - self.slack < dist)
+        if len(unsure):
+            seg[unsure], t[unsure], dist[unsure] = self._brute(px[unsure], py[unsure])
+        return self._result(px, py, seg, t, dist)
+
+    def _brute(self, px, py, chunk=4096):
+        segs, ts, dists = [], [], []
+        all_seg = np.arange(len(self.length))
+        for i in range(0, len(px), chunk):
+            t, dist = self._project(px[i:i + chunk, None], py[i:i + chunk, None], all_seg)
+            best = dist.argmin(axis=1)
+            rows = np.arange(len(best))
+            segs.append(best)
+            ts.append(t[rows, best])
+            dists.append(dist[rows, best])
+        if not segs:
+            return np.array([], int), np.array([]), np.array([])
+        return np.concatenate(segs), np.concatenate(ts), np.concatenate(dists)
+
+    def query_brute(self, lat, lon):
+        """Reference O(n_segments) scan, used to validate and benchmark query()."""
+        px, py = to_local_xy(lat, lon, self.origin)
+        px, py = np.atleast_1d(px), np.atleast_1d(py)
+        seg, t, dist = self._brute(px, py)
+        return self._result(px, py, seg, t, dist)
+
+
+def load_reference_paths(paths=REF_PATHS, thresholds=THRESHOLDS, **kwargs):
+    """Index every ref_path_*.csv, keyed by runway, with along-track measured from its threshold."""
+    return {rw: ReferencePath.from_csv(path, name=rw, threshold=thresholds.get(rw), **kwargs)
+            for rw, path in paths.items()}
+
+
+def query_all(index, lat, lon):
+    """
+    Query every runway's path and keep the closest for each point.
+    Returns a DataFrame with a `runway` column plus the ReferencePath.query fields.
+    """
+    names = list(index)
+    results = [index[rw].query(lat, lon) for rw in names]
+    dist = np.column_stack([r["dist_m"] for r in results])
+    best = dist.argmin(axis=1)
+    rows = np.arange(len(best))
+    out = {"runway": np.array(names, dtype=object)[best]}
+    for field in results[0]:
+        out[field] = np.column_stack([r[field] for r in results])[rows, best]
+    return pd.DataFrame(out)
@@ -0,0 +1,223 @@
+"""
+Rasterized density rendering for track maps.
+
+Instead of one marker or line artist per point/flight, points (or the line
+segments between consecutive points of a flight) are binned into a 2D
+count grid with np.bincount, shaded with log or histogram-equalized scaling
+and drawn as a single image. Reference paths are overlaid as vectors on top.
+Grids are cached on disk by (bbox, zoom, data version, mode) so re-rendering
+an unchanged map is a file read. No network basemap is needed.
+
+    python render.py --zoom 11 --out approach_density.png
+"""
+import argparse
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from bbox_utils import get_bbox
+
+TILE_CACHE = "data/tiles"
+MAX_STEPS = 4096   # cap on samples per rasterized segment (bounds memory on huge jumps)
+CHUNK_SAMPLES = 1 << 22   # segment samples generated per batch
+
+
+def grid_shape(bbox, zoom):
+    """(rows, cols) for a bbox at a web-map-like zoom (256 * 2**zoom px per 360°)."""
+    px_per_deg = 256 * 2 ** zoom / 360
+    lon_min, lon_max, lat_min, lat_max = bbox
+    cols = max(1, int(round((lon_max - lon_min) * px_per_deg)))
+    rows = max(1, int(round((lat_max - lat_min) * px_per_deg / np.cos(np.radians((lat_min + lat_max) / 2)))))
+    return rows, cols
+
+
+def _pixel_coords(lon, lat, bbox, shape):
+    lon_min, lon_max, lat_min, lat_max = bbox
+    rows, cols = shape
+    px = (np.asarray(lon, dtype=float) - lon_min) / (lon_max - lon_min) * cols
+    py = (lat_max - np.asarray(lat, dtype=float)) / (lat_max - lat_min) * rows  # row 0 = north
+    return px, py
+
+
+def _bin(px, py, shape):
+    rows, cols = shape
+    ok = (px >= 0) & (px < cols) & (py >= 0) & (py < rows)
+    idx = py[ok].astype(np.int64) * cols + px[ok].astype(np.int64)
+    return np.bincount(idx, minlength=rows * cols).reshape(shape).astype(np.float32)
+
+
+def accumulate_points(lon, lat, bbox, shape):
+    """Count of points per pixel."""
+    px, py = _pixel_coords(lon, lat, bbox, shape)
+    return _bin(px, py, shape)
+
+
+def accumulate_segments(lon, lat, flight, bbox, shape):
+    """
+    Rasterize the segments between consecutive points of each flight.
+
+    Every segment is sampled about once per pixel it crosses; the samples of
+    a batch of segments are generated with one np.repeat, so there is no
+    Python loop over flights or segments, and batches of ~CHUNK_SAMPLES keep
+    memory flat. `flight` is a grouped id column (one contiguous run per
+    flight); segments never join two flights, and points with a NaN lat/lon
+    (dropouts) are skipped, breaking the line there rather than bridging it.
+    """
+    px, py = _pixel_coords(lon, lat, bbox, shape)
+    flight = np.asarray(flight)
+    finite = np.isfinite(px) & np.isfinite(py)
+    same = (flight[1:] == flight[:-1]) & finite[1:] & finite[:-1]
+    # float32 pixel coords are exact enough (sub-pixel) and halve the sample traffic
+    px, py = px.astype(np.float32), py.astype(np.float32)
+    x0, y0 = px[:-1][same], py[:-1][same]
+    dx, dy = px[1:][same] - x0, py[1:][same] - y0
+
+    steps = np.clip(np.ceil(np.maximum(np.abs(dx), np.abs(dy))), 1, MAX_STEPS).astype(np.int64)
+    ends = np.cumsum(steps)
+    bounds = np.r_[0, np.searchsorted(ends, np.arange(CHUNK_SAMPLES, ends[-1] if len(ends) else 0, CHUNK_SAMPLES)), len(steps)]
+    grid = np.zeros(shape, dtype=np.float32)
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        if hi <= lo:
+            continue
+        n_steps = steps[lo:hi]
+        seg = np.repeat(np.arange(lo, hi, dtype=np.int32), n_steps)
+        # position of each sample within its segment, as a 0..1 fraction
+        first = np.cumsum(n_steps) - n_steps
+        local = np.arange(first[-1] + n_steps[-1], dtype=np.int32) - np.repeat(first.astype(np.int32), n_steps)
+        t = local.astype(np.float32) / n_steps.astype(np.float32)[seg - lo]
+        grid += _bin(x0[seg] + t * dx[seg], y0[seg] + t * dy[seg], shape)
+    return grid
+
+
+def shade(grid, how="eq_hist", cmap="inferno"):
+    """Map counts to RGBA (uint8); empty pixels are transparent."""
+    import matplotlib
+
+    filled = grid > 0
+    norm = np.zeros(grid.shape, dtype=float)
+    if filled.any():
+        values = grid[filled]
+        if how == "log":
+            v = np.log1p(values)
+            norm[filled] = v / v.max()
+        elif how == "eq_hist":
+            # rank of each count among the distinct non-empty counts -> uniform colour use
+            levels, inverse, counts = np.unique(values, return_inverse=True, return_counts=True)
+            cdf = np.cumsum(counts) / counts.sum()
+            norm[filled] = cdf[inverse]
+        elif how == "linear":
+            norm[filled] = values / values.max()
+        else:
+            raise ValueError(f"Unknown shading {how!r}; use 'log', 'eq_hist' or 'linear'")
+    rgba = matplotlib.colormaps[cmap](norm, bytes=True)
+    rgba[~filled, 3] = 0
+    return rgba
+
+
+def frame_version(*arrays):
+    """Content hash of the given arrays, for use as the cache data version."""
+    h = hashlib.sha1()
+    for arr in arrays:
+        arr = np.ascontiguousarray(arr)
+        if arr.dtype == object:  # hash the values, not the object pointers
+            arr = arr.astype(str)
+        h.update(str((arr.dtype.str, arr.shape)).encode())
+        h.update(arr.data)
+    return h.hexdigest()[:16]
+
+
+def _tile_path(bbox, zoom, version, mode, cache_dir):
+    key = json.dumps([list(map(float, bbox)), zoom, version, mode])
+    return os.path.join(cache_dir, hashlib.sha1(key.encode()).hexdigest() + ".npz")
+
+
+def render_grid(lon, lat, bbox, zoom=10, flight=None, version=None, cache_dir=TILE_CACHE):
+    """
+    Accumulation grid for the bbox, rasterizing segments when `flight` ids
+    are given and points otherwise. With a `version` (e.g. frame_version or a
+    store snapshot id) the grid is cached under cache_dir, keyed on the
+    version, the mode and, in segment mode, the flight ids themselves, since
+    re-segmenting the same points changes which segments are drawn. Shading
+    is applied after the cache, so the cached grid holds raw counts.
+    """
+    mode = "segments" if flight is not None else "points"
+    if version and flight is not None:
+        version = f"{version}:{frame_version(flight)}"
+    path = _tile_path(bbox, zoom, version, mode, cache_dir) if version else None
+    if path and os.path.exists(path):
+        return np.load(path)["grid"]
+
+    shape = grid_shape(bbox, zoom)
+    if flight is not None:
+        grid = accumulate_segments(lon, lat, flight, bbox, shape)
+    else:
+        grid = accumulate_points(lon, lat, bbox, shape)
+
+    if path:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = path + ".tmp.npz"
+        np.savez_compressed(tmp, grid=grid)
+        os.replace(tmp, path)
+    return grid
+
+
+def draw_density(ax, grid, bbox, how="eq_hist", cmap="inferno", ref_paths=None, transform=None):
+    """
+    Draw a shaded grid on `ax` as one image, plus reference paths as lines.
+
+    ref_paths: {label: DataFrame with lat/lon}. Pass a cartopy `transform`
+    (ccrs.PlateCarree()) when ax is a GeoAxes.
+    """
+    lon_min, lon_max, lat_min, lat_max = bbox
+    kw = {"transform": transform} if transform is not None else {}
+    ax.imshow(shade(grid, how, cmap), extent=(lon_min, lon_max, lat_min, lat_max),
+              origin="upper", interpolation="nearest", **kw)
+    colors = ["cyan", "lime", "magenta", "yellow"]
+    for i, (label, path) in enumerate((ref_paths or {}).items()):
+        ax.plot(path["lon"], path["lat"], color=colors[i % len(colors)], linewidth=2, label=label, **kw)
+    if ref_paths:
+        ax.legend(loc="lower left")
+    return ax
+
+
+def main():
+    import matplotlib.pyplot as plt
+    import pandas as pd
+
+    from runways import get_airport
+    from segmentation import segment_flights
+    from track_store import load_tracks
+
+    parser = argparse.ArgumentParser(description="Render a density map of the stored tracks")
+    parser.add_argument("--bbox", default="balanced", help="bbox_utils level")
+    parser.add_argument("--zoom", type=int, default=10)
+    parser.add_argument("--how", default="eq_hist", choices=["eq_hist", "log", "linear"])
+    parser.add_argument("--points", action="store_true", help="bin points instead of line segments")
+    parser.add_argument("--out", help="save the figure instead of showing it")
+    args = parser.parse_args()
+
+    bbox = get_bbox(args.bbox)
+    df, _ = segment_flights(load_tracks(bbox=bbox))
+    lon, lat = df["lon"].to_numpy(dtype=float), df["lat"].to_numpy(dtype=float)
+    flight = None if args.points else df["flight_id"].to_numpy()
+    grid = render_grid(lon, lat, bbox, args.zoom, flight, version=frame_version(lon, lat))
+
+    ref_paths = {}
+    for name, rw in get_airport().approach_runways().items():
+        if rw.ref_path and os.path.exists(rw.ref_path):
+            ref_paths[f"Runway {name} Path"] = pd.read_csv(rw.ref_path)
+
+    fig, ax = plt.subplots(figsize=(9, 9))
+    draw_density(ax, grid, bbox, args.how, ref_paths=ref_paths)
+    ax.set_title(f"Track density ({len(df)} points, {int(grid.sum())} samples)")
+    if args.out:
+        fig.savefig(args.out, dpi=150)
+        print(f"💾 Saved {args.out}")
+    else:
+        plt.show()
+
+
+if __name__ == "__main__":
+    main()
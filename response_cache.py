@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from instrumentation import count
+
+# Resolved next to this file so scripts and notebooks share one cache regardless of cwd
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "api_cache.sqlite")
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3  # 2 GB of compressed bodies
+
+
+def normalize_params(params):
+    """Canonical form of a query dict: sorted keys, no Nones, numbers in one spelling."""
+    def norm(v):
+        if isinstance(v, bool):
+            return str(v).lower()
+        if isinstance(v, (int, float)):
+            return repr(float(v)) if isinstance(v, float) and not v.is_integer() else str(int(v))
+        if isinstance(v, str) and "," in v:
+            # bounds like "38.3,36.8,-123.2,-121.5" vs "38.30, 36.80, ..."
+            parts = [p.strip() for p in v.split(",")]
+            try:
+                return ",".join(norm(float(p)) for p in parts)
+            except ValueError:
+                return ",".join(parts)
+        return str(v).strip()
+
+    return sorted((str(k), norm(v)) for k, v in (params or {}).items() if v is not None)
+
+
+def cache_key(url, params=None):
+    """Content address for a request: sha256 of endpoint + normalized params."""
+    endpoint = url.split("?", 1)[0].rstrip("/")
+    payload = json.dumps([endpoint, normalize_params(params)], separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    SQLite-backed cache of decoded JSON responses for historic endpoints.
+
+    Bodies are stored zlib-compressed; once the total exceeds `max_bytes` the
+    least recently read entries are evicted. Safe to share across threads.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                   key TEXT PRIMARY KEY,
+                   endpoint TEXT NOT NULL,
+                   body BLOB NOT NULL,
+                   size INTEGER NOT NULL,
+                   created REAL NOT NULL,
+                   last_access REAL NOT NULL
+               )"""
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON responses(last_access)")
+
+    def get(self, url, params=None, max_age=None):
+        """
+        Return the cached JSON for (url, params), or None on a miss. With
+        `max_age` (seconds), entries stored longer ago than that are misses too,
+        for responses that may still change (e.g. tracks of airborne flights).
+        """
+        key = cache_key(url, params)
+        with self.lock:
+            row = self.conn.execute("SELECT body, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                count("cache_lookups", result="miss")
+                return None
+            if max_age is not None and time.time() - row[1] > max_age:
+                self.misses += 1
+                count("cache_lookups", result="stale")
+                return None
+            self.hits += 1
+            count("cache_lookups", result="hit")
+            self.conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, url, params, data):
+        """Store decoded JSON for (url, params) and evict LRU entries past the size cap."""
+        key = cache_key(url, params)
+        body = zlib.compress(json.dumps(data, separators=(",", ":")).encode(), 6)
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, url.split("?", 1)[0], body, len(body), now, now),
+            )
+            self._evict()
+        count("cache_writes")
+        count("cache_write_bytes", len(body))
+
+    def _evict(self):
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        freed = 0
+        victims = []
+        for key, size in self.conn.execute("SELECT key, size FROM responses ORDER BY last_access"):
+            victims.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self.conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+        count("cache_evictions", len(victims))
+
+    def stats(self):
+        with self.lock:
+            entries, size = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM responses")
+            self.conn.execute("VACUUM")
+        self.hits = self.misses = 0
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,156 @@
+"""
+Runway geometry registry.
+
+Airports, runway thresholds/merge fixes, classification radii and crop rules
+live in runways.json; this module loads them once and precomputes a local
+equirectangular projection per airport so array code can work in metres.
+Runways without a merge fix / touchdown point (e.g. SFO 10s/19s/01s) are
+only used for heading-based guesses.
+"""
+import json
+import os
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from geo import EARTH_RADIUS_KM, angle_diff_deg, bearing_deg
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "runways.json")
+DEFAULT_AIRPORT = "KSFO"
+
+
+@dataclass(frozen=True)
+class Runway:
+    airport: str
+    name: str
+    heading_deg: float
+    merge_fix: tuple = None
+    touchdown: tuple = None
+    threshold: tuple = None   # glide-path anchor; defaults to touchdown
+    radius_deg: float = None
+    inbound_turn: bool = False
+    min_lat: float = None
+    ref_path: str = None
+
+    @property
+    def has_approach(self):
+        """True if this runway has the geometry needed to classify and build references."""
+        return self.merge_fix is not None and self.touchdown is not None
+
+
+@dataclass(frozen=True)
+class Airport:
+    icao: str
+    reference_point: tuple
+    approach_window_km: tuple
+    runways: dict = field(default_factory=dict)
+    # local projection scale, fixed per airport (set in __post_init__)
+    m_per_deg_lat: float = field(init=False, repr=False, compare=False)
+    m_per_deg_lon: float = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        m_per_deg_lat = float(np.radians(1.0) * EARTH_RADIUS_KM * 1000)
+        object.__setattr__(self, "m_per_deg_lat", m_per_deg_lat)
+        object.__setattr__(self, "m_per_deg_lon", m_per_deg_lat * float(np.cos(np.radians(self.reference_point[0]))))
+
+    def to_local_xy(self, lat, lon):
+        """Metres east/north of the airport reference point."""
+        x = (np.asarray(lon, dtype=float) - self.reference_point[1]) * self.m_per_deg_lon
+        y = (np.asarray(lat, dtype=float) - self.reference_point[0]) * self.m_per_deg_lat
+        return x, y
+
+    def approach_runways(self):
+        return {name: rw for name, rw in self.runways.items() if rw.has_approach}
+
+    def runway_pairs(self):
+        """Parallel runways grouped by heading, e.g. {"28L/28R": 298.0, ...}."""
+        by_heading = {}
+        for name, rw in self.runways.items():
+            by_heading.setdefault(rw.heading_deg, []).append(name)
+        return {"/".join(sorted(names)): heading for heading, names in by_heading.items()}
+
+
+def _tuple(v):
+    return tuple(v) if v is not None else None
+
+
+def load_registry(path=CONFIG_PATH):
+    """
+    Parse the runway config into {icao: Airport}. Relative ref_path values
+    are resolved against the config file's directory, not the cwd.
+    """
+    with open(path) as f:
+        raw = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+    registry = {}
+    for icao, spec in raw.items():
+        runways = {
+            name: Runway(
+                airport=icao,
+                name=name,
+                heading_deg=float(rw["heading_deg"]),
+                merge_fix=_tuple(rw.get("merge_fix")),
+                touchdown=_tuple(rw.get("touchdown")),
+                threshold=_tuple(rw.get("threshold", rw.get("touchdown"))),
+                radius_deg=rw.get("radius_deg"),
+                inbound_turn=bool(rw.get("inbound_turn", False)),
+                min_lat=rw.get("min_lat"),
+                ref_path=os.path.join(base, rw.get("ref_path", f"ref_path_{icao}_{name}.csv")),
+            )
+            for name, rw in spec["runways"].items()
+        }
+        registry[icao] = Airport(
+            icao=icao,
+            reference_point=tuple(spec["reference_point"]),
+            approach_window_km=tuple(spec.get("approach_window_km", (1, 20))),
+            runways=runways,
+        )
+    return registry
+
+
+REGISTRY = load_registry()
+
+
+def get_airport(icao=DEFAULT_AIRPORT):
+    try:
+        return REGISTRY[icao]
+    except KeyError:
+        raise ValueError(f"Unknown airport {icao!r}; add it to {CONFIG_PATH}") from None
+
+
+def guess_runway(lat, lon, track=None, airport=DEFAULT_AIRPORT, tolerance_deg=30.0, track_weight=2.0):
+    """
+    Vectorized runway-pair guess for inbound aircraft positions.
+
+    The expected final-approach course is the bearing from each position to
+    the airport; where the aircraft's own `track` is known it is weighted in
+    by `track_weight`. Each row gets the runway pair whose heading is closest
+    in weighted mean angular error (a lookup over the registry headings, so
+    windows can't overlap), or "Unknown" if that error exceeds `tolerance_deg`.
+    """
+    apt = get_airport(airport)
+    pairs = apt.runway_pairs()
+    labels = np.array(list(pairs) + ["Unknown"], dtype=object)
+    headings = np.array(list(pairs.values()))
+
+    # (n, n_pairs) angular errors against every runway heading at once
+    err = angle_diff_deg(bearing_deg(lat, lon, apt.reference_point)[:, None], headings)
+    weight = np.ones(len(err))
+    if track is not None:
+        track = np.asarray(track, dtype=float)
+        has_track = ~np.isnan(track)
+        track_err = angle_diff_deg(np.where(has_track, track, 0.0)[:, None], headings)
+        err = err + np.where(has_track, track_weight, 0.0)[:, None] * track_err
+        weight = weight + np.where(has_track, track_weight, 0.0)
+
+    best = err.argmin(axis=1)
+    best_err = err[np.arange(len(err)), best] / weight
+    return labels[np.where(best_err <= tolerance_deg, best, len(pairs))]
+
+
+def get_runway(icao, name):
+    airport = get_airport(icao)
+    try:
+        return airport.runways[name]
+    except KeyError:
+        raise ValueError(f"Unknown runway {name!r} at {icao}") from None
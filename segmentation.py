@@ -0,0 +1,95 @@
+"""
+Split raw track points into individual flights.
+
+A callsign is reused every day and FR24 tracks often include the previous
+leg, so grouping by callsign merges unrelated flights. segment_flights sorts
+the points by (callsign, time) once and starts a new flight wherever the
+callsign changes, the time gap exceeds GAP_S, or the aircraft goes from the
+ground to airborne (a takeoff). Flights get compact int32 ids in sorted
+order, so each flight is the contiguous slice offsets[i]:offsets[i + 1].
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from geo import segment_starts
+from instrumentation import observe_many, timed
+from track_store import load_tracks, to_epoch_seconds
+
+GAP_S = 30 * 60        # a longer silence starts a new flight
+GROUND_ALT_FT = 0      # FR24 reports alt 0 while on the ground
+
+
+def on_ground(df, ground_alt=GROUND_ALT_FT):
+    """Per-row ground flag from `on_ground` (OpenSky) or `alt` (FR24); all False if neither."""
+    if "on_ground" in df.columns:
+        return df["on_ground"].fillna(False).to_numpy(dtype=bool)
+    if "alt" in df.columns:
+        return (df["alt"].to_numpy(dtype=float) <= ground_alt)
+    return np.zeros(len(df), dtype=bool)
+
+
+@timed()
+def segment_flights(df, key="callsign", gap_s=GAP_S, ground_alt=GROUND_ALT_FT):
+    """
+    Return (df, offsets): df sorted by flight then time with an int32
+    `flight_id` column (0..F-1, ascending), and offsets of length F+1 so
+    flight i is df.iloc[offsets[i]:offsets[i + 1]]. Rows with no key are dropped.
+    """
+    codes = pd.factorize(df[key])[0]
+    t = to_epoch_seconds(df["timestamp"])
+    keep = codes >= 0
+    order = np.lexsort((t[keep], codes[keep]))
+    rows = np.flatnonzero(keep)[order]
+
+    codes, t = codes[rows], t[rows]
+    ground = on_ground(df, ground_alt)[rows]
+
+    # --- flight boundaries: key change | long gap | ground -> airborne ---
+    new_flight = np.ones(len(rows), dtype=bool)
+    new_flight[1:] = (
+        (codes[1:] != codes[:-1])
+        | (np.diff(t) > gap_s)
+        | (ground[:-1] & ~ground[1:])
+    )
+    flight_id = (np.cumsum(new_flight) - 1).astype(np.int32)
+
+    out = df.iloc[rows].reset_index(drop=True)
+    out["flight_id"] = flight_id
+    offsets = flight_offsets(flight_id)
+    observe_many("points_per_flight", np.diff(offsets))
+    return out, offsets
+
+
+def flight_offsets(flight_id):
+    """Offsets (length F+1) of the contiguous runs in a grouped flight_id column."""
+    flight_id = np.asarray(flight_id)
+    return np.r_[segment_starts(flight_id), len(flight_id)].astype(np.int64)
+
+
+def flight_summary(df, offsets, key="callsign"):
+    """One row per flight: id, key, first/last timestamp and point count."""
+    starts, ends = offsets[:-1], offsets[1:] - 1
+    return pd.DataFrame({
+        "flight_id": np.arange(len(starts), dtype=np.int32),
+        key: df[key].to_numpy()[starts],
+        "start": df["timestamp"].to_numpy()[starts],
+        "end": df["timestamp"].to_numpy()[ends],
+        "n_points": np.diff(offsets),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize flight segmentation of the stored tracks")
+    parser.add_argument("--gap", type=float, default=GAP_S, help="gap in seconds that starts a new flight")
+    args = parser.parse_args()
+
+    df = load_tracks()
+    segmented, offsets = segment_flights(df, gap_s=args.gap)
+    print(f"✂️ {df['callsign'].nunique()} callsigns -> {len(offsets) - 1} flights")
+    print(flight_summary(segmented, offsets).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
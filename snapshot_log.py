@@ -0,0 +1,319 @@
+"""
+Compact append-only log of live OpenSky polls.
+
+Every poll becomes one frame of fixed-width typed columns. Strings
+(icao24, callsign, country, squawk) are interned to uint32 ids shared by
+the whole log; new strings are appended in a STRS record just before the
+first frame that uses them. Numeric columns are quantized to the
+resolution OpenSky reports (QUANT: 1e-5 deg, cm, cm/s, 0.01 deg, whole
+seconds) and stored as int32 deltas from the same aircraft's previous
+values, plus a NaN bitmask. Every KEYFRAME_EVERY frames a keyframe resets
+the state (deltas from zero), so a reader can start there. Frame payloads
+are byte-shuffled and zlib-compressed: about 13 bytes per state vector,
+~10x smaller than a Parquet file per poll (benchmarks/bench_snapshot_log.py).
+
+Layout: MAGIC, then records of RECORD header (kind, payload bytes,
+poll_time, rows) + payload. SnapshotReader memory-maps the file, walks
+the headers once to build the keyframe index and string table, and
+decodes frames from the nearest keyframe before the requested time. A
+truncated last record (crash mid-write) is ignored.
+
+    python snapshot_log.py record data/live.snap --interval 10
+    python snapshot_log.py info data/live.snap
+"""
+import argparse
+import mmap
+import os
+import struct
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from fetch_live_data import BOOL_COLUMNS, COLUMNS, FLOAT_COLUMNS, STRING_COLUMNS
+
+MAGIC = b"GASNAP1\n"
+RECORD = struct.Struct("<4sIdI")     # kind, payload bytes, poll_time, rows
+KEYFRAME_EVERY = 60                  # 10 minutes of 10-second polls
+ZLIB_LEVEL = 6
+
+STRING_COLS = list(STRING_COLUMNS)   # interned; icao24 is the aircraft key
+# float column -> units per stored integer step (OpenSky's own resolution)
+QUANT = {
+    "time_position": 1, "last_contact": 1,   # whole seconds, relative to the poll
+    "longitude": 1e5, "latitude": 1e5,
+    "baro_altitude": 100, "geo_altitude": 100,
+    "velocity": 100, "true_track": 100, "vertical_rate": 100,
+}
+RELATIVE_TO_POLL = {"time_position", "last_contact"}
+INT_COLS = ["position_source"] + BOOL_COLUMNS
+# delta-coded int32 columns, in payload order
+DELTA_COLS = STRING_COLS[1:] + FLOAT_COLUMNS + INT_COLS
+OUTPUT_COLUMNS = [c for c in COLUMNS if c in STRING_COLUMNS or c in QUANT or c in INT_COLS]
+
+
+def _shuffle(a):
+    """Byte planes of a fixed-width array (all low bytes, then the next...), for zlib."""
+    return np.ascontiguousarray(a.view(np.uint8).reshape(-1, a.itemsize).T).tobytes()
+
+
+def _unshuffle(buf, dtype, n):
+    dtype = np.dtype(dtype)
+    planes = np.frombuffer(buf, dtype=np.uint8, count=n * dtype.itemsize).reshape(dtype.itemsize, n)
+    return np.ascontiguousarray(planes.T).view(dtype).ravel()
+
+
+class _State:
+    """Last quantized values per interned aircraft id (writer and reader keep identical copies)."""
+
+    def __init__(self):
+        self.values = np.zeros((0, len(DELTA_COLS)), dtype=np.int64)
+
+    def reset(self):
+        self.values[:] = 0
+
+    def rows(self, ids):
+        if len(ids) and ids.max() >= len(self.values):
+            grown = np.zeros((max(int(ids.max()) + 1, 2 * len(self.values)), len(DELTA_COLS)), dtype=np.int64)
+            grown[:len(self.values)] = self.values
+            self.values = grown
+        return self.values[ids]
+
+
+class SnapshotWriter:
+    """
+    Appends polls to a snapshot log. Reopening an existing log reloads its
+    string table and starts with a keyframe.
+    """
+
+    def __init__(self, path, keyframe_every=KEYFRAME_EVERY):
+        self.path = path
+        self.keyframe_every = keyframe_every
+        self.state = _State()
+        self.strings = {}
+        self.since_keyframe = keyframe_every   # first frame written is a keyframe
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            reader = SnapshotReader(path)
+            self.strings = {s: i for i, s in enumerate(reader.strings)}
+            end = reader.end
+            reader.close()
+            self.file = open(path, "r+b")
+            self.file.truncate(end)   # drop a torn last record
+            self.file.seek(end)
+        else:
+            self.file = open(path, "wb")
+            self.file.write(MAGIC)
+
+    def _intern(self, values):
+        """uint32 ids for an array of strings, writing a STRS record for unseen ones."""
+        uniques, inverse = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+        new = [s for s in uniques.tolist() if s not in self.strings]
+        if new:
+            for s in new:
+                self.strings[s] = len(self.strings)
+            encoded = [s.encode() for s in new]
+            lengths = np.array([len(b) for b in encoded], dtype=np.uint16)
+            payload = lengths.tobytes() + b"".join(encoded)
+            self.file.write(RECORD.pack(b"STRS", len(payload), 0.0, len(new)) + payload)
+        lookup = np.array([self.strings[s] for s in uniques.tolist()], dtype=np.uint32)
+        return lookup[inverse.ravel()]
+
+    def append(self, poll_time, states):
+        """Record one poll: a DataFrame (or dict of columns) as returned by fetch_live_data."""
+        states = pd.DataFrame(states)
+        n = len(states)
+        ids = {c: self._intern(states[c].fillna("") if c in states else np.full(n, "")) for c in STRING_COLS}
+        base = int(np.floor(poll_time))
+
+        q = np.zeros((n, len(DELTA_COLS)), dtype=np.int64)
+        nan = np.zeros((n, len(FLOAT_COLUMNS)), dtype=bool)
+        for j, c in enumerate(DELTA_COLS):
+            if c in ids:
+                q[:, j] = ids[c]
+            elif c in QUANT:
+                v = states[c].to_numpy(dtype=float) if c in states else np.full(n, np.nan)
+                if c in RELATIVE_TO_POLL:
+                    v = v - base
+                k = FLOAT_COLUMNS.index(c)
+                nan[:, k] = np.isnan(v)
+                q[:, j] = np.round(np.where(nan[:, k], 0.0, v) * QUANT[c])
+            else:
+                q[:, j] = states[c].fillna(0).to_numpy(dtype=np.int64) if c in states else 0
+
+        keyframe = self.since_keyframe >= self.keyframe_every
+        if keyframe:
+            self.state.reset()
+            self.since_keyframe = 0
+        key = ids["icao24"].astype(np.int64)
+        delta = (q - self.state.rows(key)).astype(np.int32)
+        self.state.values[key] = q
+        self.since_keyframe += 1
+
+        payload = zlib.compress(
+            ids["icao24"].tobytes() + np.packbits(nan.T, axis=1).tobytes() + _shuffle(delta.T.ravel()),
+            ZLIB_LEVEL,
+        )
+        self.file.write(RECORD.pack(b"KEYF" if keyframe else b"DELT", len(payload), float(poll_time), n) + payload)
+        self.file.flush()
+        return len(payload) + RECORD.size
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SnapshotReader:
+    """Memory-mapped snapshot log: frame times, keyframe index and string table built from one header walk."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        self.buf = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        if self.buf[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a snapshot log")
+
+        times, offsets, keyframes, self.strings = [], [], [], []
+        pos = len(MAGIC)
+        while pos + RECORD.size <= size:
+            kind, length, poll_time, rows = RECORD.unpack_from(self.buf, pos)
+            body = pos + RECORD.size
+            if body + length > size:
+                break   # torn last record
+            if kind == b"STRS":
+                lengths = np.frombuffer(self.buf, dtype=np.uint16, count=rows, offset=body)
+                blob = bytes(self.buf[body + 2 * rows:body + length])
+                ends = np.cumsum(lengths)
+                self.strings += [blob[e - l:e].decode() for l, e in zip(lengths.tolist(), ends.tolist())]
+            else:
+                if kind == b"KEYF":
+                    keyframes.append(len(times))
+                times.append(poll_time)
+                offsets.append(pos)
+            pos = body + length
+        self.end = pos
+        self.times = np.array(times, dtype=float)
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self.keyframes = np.array(keyframes, dtype=np.int64)   # frame numbers of keyframes
+        self._strings = np.array(self.strings + [""], dtype=object)
+
+    def __len__(self):
+        return len(self.times)
+
+    def _decode(self, frame, state):
+        kind, length, poll_time, n = RECORD.unpack_from(self.buf, self.offsets[frame])
+        start = self.offsets[frame] + RECORD.size
+        raw = zlib.decompress(self.buf[start:start + length])
+        if kind == b"KEYF":
+            state.reset()
+        ids = np.frombuffer(raw, dtype=np.uint32, count=n)
+        mask_bytes = (n + 7) // 8
+        mask_len = len(FLOAT_COLUMNS) * mask_bytes
+        mask = np.frombuffer(raw, dtype=np.uint8, count=mask_len, offset=4 * n).reshape(len(FLOAT_COLUMNS), mask_bytes)
+        nan = np.unpackbits(mask, axis=1, count=n).astype(bool)
+        delta = _unshuffle(raw[4 * n + mask_len:], np.int32, n * len(DELTA_COLS)).reshape(len(DELTA_COLS), n).T
+        key = ids.astype(np.int64)
+        q = state.rows(key) + delta
+        state.values[key] = q
+        return poll_time, ids, q, nan
+
+    def _frame(self, poll_time, ids, q, nan):
+        base = int(np.floor(poll_time))
+        cols = {"icao24": self._strings[ids]}
+        for j, c in enumerate(DELTA_COLS):
+            if c in STRING_COLUMNS:
+                cols[c] = self._strings[q[:, j]]
+            elif c in QUANT:
+                v = q[:, j] / QUANT[c] + (base if c in RELATIVE_TO_POLL else 0)
+                v[nan[FLOAT_COLUMNS.index(c)]] = np.nan
+                cols[c] = v
+            elif c in BOOL_COLUMNS:
+                cols[c] = q[:, j].astype(bool)
+            else:
+                cols[c] = q[:, j].astype(np.int8)
+        return pd.DataFrame(cols, columns=OUTPUT_COLUMNS)
+
+    def read(self, start=None, end=None):
+        """Yield (poll_time, states DataFrame) for frames with start <= poll_time < end."""
+        first = 0 if start is None else int(np.searchsorted(self.times, start, side="left"))
+        last = len(self) if end is None else int(np.searchsorted(self.times, end, side="left"))
+        if first >= last:
+            return
+        # decode from the last keyframe at or before `first`
+        k = np.searchsorted(self.keyframes, first, side="right") - 1
+        frame = int(self.keyframes[k]) if k >= 0 else 0
+        state = _State()
+        for i in range(frame, last):
+            decoded = self._decode(i, state)
+            if i >= first:
+                yield decoded[0], self._frame(*decoded)
+
+    def at(self, t):
+        """The last poll at or before t, as (poll_time, states) (None before the first poll)."""
+        i = int(np.searchsorted(self.times, t, side="right"))
+        if i == 0:
+            return None
+        return next(self.read(self.times[i - 1], self.times[i - 1] + 1e-6))
+
+    def close(self):
+        if isinstance(self.buf, mmap.mmap):
+            self.buf.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record live OpenSky polls to a snapshot log, or inspect one")
+    parser.add_argument("command", choices=["record", "info"])
+    parser.add_argument("path")
+    parser.add_argument("--bbox", default="balanced", help="bbox_utils level")
+    parser.add_argument("--interval", type=float, default=10.0, help="record: poll interval, seconds")
+    args = parser.parse_args()
+
+    if args.command == "info":
+        with SnapshotReader(args.path) as reader:
+            if not len(reader):
+                print(f"📭 {args.path}: no polls")
+                return
+            span = reader.times[-1] - reader.times[0]
+            print(f"📼 {args.path}: {len(reader)} polls over {span / 3600:.1f} h "
+                  f"({pd.Timestamp(reader.times[0], unit='s')} -> {pd.Timestamp(reader.times[-1], unit='s')}), "
+                  f"{len(reader.keyframes)} keyframes, {len(reader.strings)} strings, "
+                  f"{reader.end / 1e6:.2f} MB")
+        return
+
+    from bbox_utils import get_bbox
+    from fetch_live_data import OpenSkyClient
+
+    client = OpenSkyClient()
+    bbox = get_bbox(args.bbox)
+    with SnapshotWriter(args.path) as writer:
+        try:
+            while True:
+                started = time.time()
+                try:
+                    nbytes = writer.append(started, client.fetch_flights(bbox))
+                    print(f"📼 {pd.Timestamp(started, unit='s')}: {nbytes} bytes")
+                except Exception as e:  # keep recording through transient API errors
+                    print(f"⚠️ Poll failed: {e}")
+                time.sleep(max(0.0, args.interval - (time.time() - started)))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            client.close()
+
+
+if __name__ == "__main__":
+    main()
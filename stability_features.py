@@ -0,0 +1,292 @@
+"""
+Per-approach stability features from raw tracks.
+
+Every classified flight is cropped to its approach leg (build_path) and
+measured in a runway frame anchored at the threshold: along-track distance
+to go and lateral offset from the extended centreline. All per-flight
+statistics are segmented reductions (np.add/maximum.reduceat over the
+flight offsets) and the gate values one segmented interpolation, so there
+is no per-flight Python or pandas groupby:
+
+  - descent rate (ft/min): mean, max, std
+  - groundspeed (kt): mean, variance, deceleration (least-squares slope)
+  - glide-path deviation (ft) from a 3° profile crossing the threshold at
+    THRESHOLD_CROSSING_FT: mean, rms, max |dev|
+  - lateral deviation (m): rms, max |dev|
+  - lateral and glide deviation at the GATES_NM gates, sampled from the
+    full track's final leg (the cropped leg starts at the merge fixes,
+    inside 10 NM); NaN where the track does not cover a gate
+
+Results are cached in a versioned Parquet file keyed by flight
+(callsign + first timestamp) with a fingerprint of the flight's points, so
+a rerun only recomputes new or changed flights; bumping FEATURE_VERSION
+invalidates the cache.
+
+    python stability_features.py
+    python stability_features.py --rebuild --out data/stability.csv
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from build_path import approach_leg, approach_points, filter_classified
+from geo import haversine_km, segment_interp, segment_starts
+from goaround_detector import altitude_ft
+from instrumentation import count, timed
+from runways import DEFAULT_AIRPORT, get_airport
+from segmentation import segment_flights
+from track_store import load_tracks, to_epoch_seconds
+
+CACHE_PATH = "data/stability_features.parquet"
+FEATURE_VERSION = 2
+GLIDE_DEG = 3.0
+THRESHOLD_CROSSING_FT = 50.0
+GATES_NM = (10, 5, 2)
+M_PER_NM = 1852.0
+MS_TO_KT = 1.943844
+
+
+def flight_fingerprints(df, key="flight_id"):
+    """
+    One row per flight of segmented tracks: a stable `flight_key`
+    (callsign_firsttimestamp) and a uint64 fingerprint of its points.
+    """
+    n = len(df)
+    flight = df[key].to_numpy()
+    starts = segment_starts(flight)
+    sizes = np.diff(np.r_[starts, n])
+    cols = [c for c in ("lat", "lon", "alt", "timestamp") if c in df.columns]
+    row_hash = pd.util.hash_pandas_object(df[cols], index=False).to_numpy()
+    # position-weighted sum (wraps mod 2**64), so reordering points changes the fingerprint
+    pos = (np.arange(n) - np.repeat(starts, sizes)).astype(np.uint64)
+    mixed = row_hash * (2 * pos + np.uint64(1))
+    fingerprint = np.add.reduceat(mixed, starts) ^ sizes.astype(np.uint64) if n else np.zeros(0, np.uint64)
+
+    t0 = to_epoch_seconds(df["timestamp"].iloc[starts]) if n else np.zeros(0, np.int64)
+    name = df["callsign"].astype(str).to_numpy()[starts] if "callsign" in df.columns else flight[starts].astype(str)
+    return pd.DataFrame({
+        "flight_key": pd.Series(name, dtype=object) + "_" + pd.Series(t0).astype(str),
+        key: flight[starts],
+        "fingerprint": fingerprint,
+    })
+
+
+def _approaches(df, key, airport):
+    """
+    (classified, approaches): the classified flights' full tracks, and the
+    approach legs of every classified flight, grouped by flight in time order.
+    """
+    df_clean, _ = filter_classified(df, key=key, airport=airport)
+    parts = [approach_points(df_clean, rw, key=key, airport=airport)
+             for rw in get_airport(airport).approach_runways()]
+    parts = [p for p in parts if not p.empty]
+    if not parts:
+        return df_clean, pd.DataFrame()
+    pts = pd.concat(parts, ignore_index=True)
+    dist = pts["dist_to_rwy"].to_numpy()
+    leg = approach_leg(dist, segment_starts(pts[key].to_numpy()), len(pts))
+    return df_clean, pts[leg].reset_index(drop=True)
+
+
+def _runway_frame(pts, apt):
+    """(along, lateral, glide_dev): metres to go before the threshold, metres right of course, ft above 3°."""
+    rw_codes, rw_names = pd.factorize(pts["runway"])
+    runways = [apt.runways[r] for r in rw_names]
+    thr = np.array([r.threshold for r in runways]).reshape(-1, 2)[rw_codes]
+    course = np.radians(np.array([r.heading_deg for r in runways]))[rw_codes]
+    x = (pts["lon"].to_numpy(dtype=float) - thr[:, 1]) * apt.m_per_deg_lon
+    y = (pts["lat"].to_numpy(dtype=float) - thr[:, 0]) * apt.m_per_deg_lat
+    along = -(x * np.sin(course) + y * np.cos(course))
+    lateral = x * np.cos(course) - y * np.sin(course)    # + = right of course
+    alt = altitude_ft(pts)
+    glide_dev = alt - (THRESHOLD_CROSSING_FT + np.maximum(along, 0) * np.tan(np.radians(GLIDE_DEG)) / 0.3048)
+    return along, lateral, glide_dev, x, y
+
+
+def _gate_values(df_clean, key, apt):
+    """
+    Lateral / glide deviation at every GATES_NM gate per classified flight.
+
+    Sampled from the full track rather than the cropped approach leg (which
+    starts at the merge fix, inside 10 NM): the rows up to the closest point
+    to the airport, from the last one beyond the outermost gate, so an
+    overflight or earlier pass through the gate range is not mixed in.
+    Returns (flight ids, (n_flights, len(GATES_NM), 2) array; NaN where a gate was not flown).
+    """
+    n = len(df_clean)
+    flight = df_clean[key].to_numpy()
+    starts = segment_starts(flight)
+    rows = np.arange(n)
+    along, lateral, glide_dev, _, _ = _runway_frame(df_clean, apt)
+    dist = haversine_km(df_clean["lat"].to_numpy(dtype=float), df_clean["lon"].to_numpy(dtype=float), apt.reference_point)
+    final = approach_leg(dist, starts, n)
+    outer = max(GATES_NM) * M_PER_NM
+    sizes = np.diff(np.r_[starts, n])
+    last_beyond = np.maximum.reduceat(np.where(final & (along > outer), rows, -1), starts) if n else rows
+    final &= rows >= np.repeat(last_beyond, sizes)
+    codes = np.repeat(np.arange(len(starts)), sizes)[final]
+    gates = segment_interp(codes, along[final], np.column_stack([lateral[final], glide_dev[final]]),
+                           np.array(GATES_NM, dtype=float) * M_PER_NM, hold=False)
+    return flight[starts], gates
+
+
+def _seg_mean_var(values, valid, starts):
+    """Per-segment count, mean and variance of values where valid (NaN when empty)."""
+    v = np.where(valid, values, 0.0)
+    count = np.add.reduceat(valid.astype(np.int64), starts)
+    total = np.add.reduceat(v, starts)
+    total_sq = np.add.reduceat(v * v, starts)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / count
+        var = np.maximum(total_sq / count - mean * mean, 0.0)
+    return count, mean, var
+
+
+def _seg_max(values, valid, starts):
+    out = np.maximum.reduceat(np.where(valid, values, -np.inf), starts)
+    return np.where(np.isfinite(out), out, np.nan)
+
+
+@timed()
+def compute_features(df, key="flight_id", airport=DEFAULT_AIRPORT):
+    """Stability features for every classified approach in segmented tracks (one row per flight)."""
+    df_clean, pts = _approaches(df, key, airport)
+    if pts.empty:
+        return pd.DataFrame(columns=[key, "runway"])
+    apt = get_airport(airport)
+    n = len(pts)
+    flight = pts[key].to_numpy()
+    starts = segment_starts(flight)
+    codes = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, n]))
+
+    # --- runway frame: along-track distance to the threshold and lateral offset ---
+    along, lateral, glide_dev, x, y = _runway_frame(pts, apt)
+    alt = altitude_ft(pts)
+
+    # --- per-step rates, assigned to the later point; first point of a flight has none ---
+    t = to_epoch_seconds(pts["timestamp"]).astype(float)
+    dt = np.r_[np.nan, np.diff(t)]
+    step = np.r_[np.nan, np.hypot(np.diff(x), np.diff(y))]
+    valid = np.r_[False, flight[1:] == flight[:-1]] & (dt > 0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        descent_fpm = -np.r_[np.nan, np.diff(alt)] / dt * 60
+        gs_kt = step / dt * MS_TO_KT
+
+    _, vs_mean, vs_var = _seg_mean_var(descent_fpm, valid, starts)
+    gs_n, gs_mean, gs_var = _seg_mean_var(gs_kt, valid, starts)
+
+    # deceleration: least-squares slope of groundspeed against time since the flight's first point
+    tt = np.where(valid, t - t[starts][codes], 0.0)
+    gs0 = np.where(valid, gs_kt, 0.0)
+    s_t, s_tt = np.add.reduceat(tt, starts), np.add.reduceat(tt * tt, starts)
+    s_v, s_tv = np.add.reduceat(gs0, starts), np.add.reduceat(tt * gs0, starts)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        slope = (gs_n * s_tv - s_t * s_v) / (gs_n * s_tt - s_t * s_t)
+    slope[gs_n < 2] = np.nan
+
+    all_rows = np.ones(n, dtype=bool)
+    _, glide_mean, glide_var = _seg_mean_var(glide_dev, all_rows, starts)
+    _, lat_mean, lat_var = _seg_mean_var(lateral, all_rows, starts)
+
+    out = pd.DataFrame({
+        key: flight[starts],
+        "runway": pts["runway"].to_numpy()[starts],
+        "n_points": np.diff(np.r_[starts, n]),
+        "duration_s": np.maximum.reduceat(t, starts) - t[starts],
+        "descent_rate_mean_fpm": vs_mean,
+        "descent_rate_max_fpm": _seg_max(descent_fpm, valid, starts),
+        "descent_rate_std_fpm": np.sqrt(vs_var),
+        "gs_mean_kt": gs_mean,
+        "gs_var_kt2": gs_var,
+        "decel_kt_per_min": -slope * 60,
+        "glide_dev_mean_ft": glide_mean,
+        "glide_dev_rms_ft": np.sqrt(glide_var + glide_mean ** 2),
+        "glide_dev_max_ft": _seg_max(np.abs(glide_dev), all_rows, starts),
+        "lateral_dev_rms_m": np.sqrt(lat_var + lat_mean ** 2),
+        "lateral_dev_max_m": _seg_max(np.abs(lateral), all_rows, starts),
+    })
+
+    # --- gate values from the full track's final leg (NaN if not flown) ---
+    gate_flights, gates = _gate_values(df_clean, key, apt)
+    at = pd.Index(gate_flights).get_indexer(out[key])
+    for g, nm in enumerate(GATES_NM):
+        out[f"lateral_dev_{nm}nm_m"] = gates[at, g, 0]
+        out[f"glide_dev_{nm}nm_ft"] = gates[at, g, 1]
+    return out
+
+
+def load_cache(path=CACHE_PATH):
+    """Cached feature rows of the current FEATURE_VERSION (empty frame if none)."""
+    if not os.path.exists(path):
+        return pd.DataFrame()
+    cached = pd.read_parquet(path)
+    return cached[cached["feature_version"] == FEATURE_VERSION].reset_index(drop=True)
+
+
+def save_cache(features, path=CACHE_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    features.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def stability_features(df, key="flight_id", airport=DEFAULT_AIRPORT, cache_path=CACHE_PATH):
+    """
+    Feature matrix for the approaches in segmented tracks, reusing cached rows
+    of flights whose points are unchanged. The cache is rewritten to hold only
+    the flights in `df`. With cache_path=None nothing is cached.
+    """
+    prints = flight_fingerprints(df, key)
+    cached = load_cache(cache_path) if cache_path else pd.DataFrame()
+    if not cached.empty:
+        current = prints[["flight_key", "fingerprint"]].merge(cached, on=["flight_key", "fingerprint"])
+    else:
+        current = pd.DataFrame(columns=["flight_key", "fingerprint"])
+    todo = ~prints["flight_key"].isin(current["flight_key"]).to_numpy()
+
+    computed = pd.DataFrame(columns=["flight_key", "fingerprint"])
+    if todo.any():
+        sizes = np.diff(np.r_[segment_starts(df[key].to_numpy()), len(df)])
+        subset = df[np.repeat(todo, sizes)]
+        feats = compute_features(subset, key=key, airport=airport)
+        # every recomputed flight gets a row, approaches or not, so non-approaches are not redone
+        computed = prints.loc[todo, ["flight_key", key, "fingerprint"]].merge(feats, on=key, how="left")
+        computed = computed.drop(columns=key).assign(feature_version=FEATURE_VERSION)
+    print(f"♻️ {len(current)} flights from cache, {int(todo.sum())} recomputed")
+    count("stability_cache_flights", len(current), result="hit")
+    count("stability_cache_flights", int(todo.sum()), result="recomputed")
+
+    # rows of flights no longer in the tracks (e.g. a flight that gained earlier points has a new key) are pruned
+    stale = ~cached["flight_key"].isin(prints["flight_key"]) if not cached.empty else np.zeros(0, dtype=bool)
+    if cache_path and (todo.any() or stale.any()):
+        keep = cached[~stale & ~cached["flight_key"].isin(computed["flight_key"])] if not cached.empty else cached
+        save_cache(pd.concat([keep, computed], ignore_index=True), cache_path)
+
+    result = pd.concat([current, computed], ignore_index=True)
+    result = prints[["flight_key", key]].merge(result.drop(columns=key, errors="ignore"), on="flight_key")
+    result = result[result["runway"].notna()].drop(columns=["fingerprint", "feature_version"], errors="ignore")
+    return result.reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-approach stability features from stored tracks")
+    parser.add_argument("--cache", default=CACHE_PATH)
+    parser.add_argument("--rebuild", action="store_true", help="ignore and overwrite the cache")
+    parser.add_argument("--out", help="also write the feature matrix to CSV")
+    args = parser.parse_args()
+
+    if args.rebuild and os.path.exists(args.cache):
+        os.remove(args.cache)
+    df, _ = segment_flights(load_tracks())
+    features = stability_features(df, cache_path=args.cache)
+    print(f"🛬 {len(features)} approaches x {features.shape[1] - 3} features")
+    print(features.describe().T[["mean", "min", "max"]].to_string())
+    if args.out:
+        features.to_csv(args.out, index=False)
+        print(f"💾 Saved -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
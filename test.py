@@ -1,13 +1,23 @@
-import requests, os, pprint
-HEADERS = {
-    "Authorization": f"Bearer {os.getenv('FR24_API_KEY')}",
-    "Accept": "application/json",
-    "Accept-Version": "v1"
-}
-r = requests.get(
-    "https://fr24api.flightradar24.com/api/flight-tracks",
-    headers=HEADERS,
-    params={"flight_id":"3d0d1cc7", "date":"2025-11-10"}
-)
-print(r.status_code, r.text[:500])
-pprint.pprint(r.json())
+import os, pprint
+from fetcher import RateLimitedFetcher
+from response_cache import ResponseCache
+
+
+def main():
+    headers = {
+        "Authorization": f"Bearer {os.getenv('FR24_API_KEY')}",
+        "Accept": "application/json",
+        "Accept-Version": "v1"
+    }
+    cache = ResponseCache()
+    with RateLimitedFetcher(headers=headers, cache=cache) as fetcher:
+        data = fetcher.get_json(
+            "https://fr24api.flightradar24.com/api/flight-tracks",
+            params={"flight_id":"3d0d1cc7", "date":"2025-11-10"}
+        )
+    print(cache.stats())
+    pprint.pprint(data)
+
+
+if __name__ == "__main__":
+    main()
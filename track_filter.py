@@ -0,0 +1,161 @@
+"""
+Ingestion-time clipping and simplification of FR24 tracks.
+
+Tracks arrive with every point from the departure gate onwards, but
+everything downstream only looks at the SFO region. shrink_tracks keeps the
+points inside a bbox_utils.get_bbox level and, outside the final-approach
+circle around the airport, thins them with Douglas–Peucker in local metres
+(lat/lon/alt), so no dropped point is further than `tolerance_m` from the
+stored polyline. Points within `final_km` of the airport keep full resolution.
+
+    python track_filter.py --input sfo_landing_paths.csv --level balanced --tolerance 25
+"""
+import argparse
+import io
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from bbox_utils import get_bbox
+from geo import haversine_km, to_local_xy
+from runways import DEFAULT_AIRPORT, get_airport
+from segmentation import segment_flights
+from track_store import LEGACY_CSV, to_table, write_tracks
+
+DEFAULT_LEVEL = "balanced"
+TOLERANCE_M = 25.0
+FINAL_KM = 25.0      # beyond the 20 km approach window build_path crops to
+FT_TO_M = 0.3048
+
+
+def douglas_peucker(xyz, tolerance):
+    """Keep-mask for one polyline (n, 3): endpoints always kept, max deviation <= tolerance."""
+    n = len(xyz)
+    keep = np.zeros(n, dtype=bool)
+    if n == 0:
+        return keep
+    keep[[0, -1]] = True
+    stack = [(0, n - 1)]
+    while stack:
+        lo, hi = stack.pop()
+        if hi - lo < 2:
+            continue
+        dist = _point_segment_dist(xyz[lo + 1:hi], xyz[lo], xyz[hi])
+        k = int(np.argmax(dist))
+        if dist[k] > tolerance:
+            mid = lo + 1 + k
+            keep[mid] = True
+            stack += [(lo, mid), (mid, hi)]
+    return keep
+
+
+def _point_segment_dist(p, a, b):
+    """Distance from points p (m, 3) to segments a-b (broadcastable (3,) or (m, 3))."""
+    ab = b - a
+    denom = np.einsum("...i,...i", ab, ab)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        u = np.clip(np.einsum("...i,...i", p - a, ab) / denom, 0, 1)
+    u = np.where(denom > 0, u, 0)
+    return np.linalg.norm(p - (a + u[..., None] * ab), axis=-1)
+
+
+def _local_xyz(df, origin):
+    """East/north/up metres around origin (FR24 alt is in feet)."""
+    x, y = to_local_xy(df["lat"].to_numpy(), df["lon"].to_numpy(), origin)
+    z = df["alt"].to_numpy(dtype=float) * FT_TO_M if "alt" in df.columns else np.zeros(len(df))
+    return np.column_stack([x, y, z])
+
+
+def max_error_m(xyz, keep, runs):
+    """Largest distance of a dropped point from the chord between its kept neighbours (same run)."""
+    n = len(xyz)
+    dropped = ~keep
+    if not dropped.any():
+        return 0.0
+    idx = np.arange(n)
+    prev_kept = np.maximum.accumulate(np.where(keep, idx, 0))
+    next_kept = np.minimum.accumulate(np.where(keep, idx, n - 1)[::-1])[::-1]
+    d = dropped & (runs[prev_kept] == runs) & (runs[next_kept] == runs)
+    dist = _point_segment_dist(xyz[d], xyz[prev_kept[d]], xyz[next_kept[d]])
+    return float(dist.max()) if len(dist) else 0.0
+
+
+def shrink_tracks(df, level=DEFAULT_LEVEL, tolerance_m=TOLERANCE_M, final_km=FINAL_KM, airport=DEFAULT_AIRPORT):
+    """
+    Clip tracks to a get_bbox level and simplify outside the final approach.
+
+    tolerance_m=None or 0 disables simplification. Returns (df_small, report)
+    where report has points/bytes before and after and the max positional error.
+    """
+    if df.empty:
+        return df, {"points_in": 0, "points_out": 0, "bytes_in": 0, "bytes_out": 0, "max_error_m": 0.0}
+    lon_min, lon_max, lat_min, lat_max = get_bbox(level)
+    origin = get_airport(airport).reference_point
+
+    # --- per-flight order so runs are contiguous along each track ---
+    seg, _ = segment_flights(df)
+    lat = seg["lat"].to_numpy(dtype=float)
+    lon = seg["lon"].to_numpy(dtype=float)
+    inside = (lon >= lon_min) & (lon <= lon_max) & (lat >= lat_min) & (lat <= lat_max)
+    final = haversine_km(lat, lon, origin) <= final_km
+    keep = inside.copy()
+
+    # --- Douglas–Peucker over each run of in-region points outside the final approach ---
+    candidate = inside & ~final
+    flight = seg["flight_id"].to_numpy()
+    boundary = np.r_[True, (candidate[1:] != candidate[:-1]) | (flight[1:] != flight[:-1])]
+    runs = np.cumsum(boundary)
+    xyz = _local_xyz(seg, origin)
+    if tolerance_m:
+        starts = np.flatnonzero(boundary)
+        ends = np.r_[starts[1:], len(seg)]
+        for s, e in zip(starts, ends):
+            if candidate[s] and e - s > 2:
+                keep[s:e] = douglas_peucker(xyz[s:e], tolerance_m)
+
+    out = seg[keep].drop(columns=["flight_id"]).reset_index(drop=True)
+    report = {
+        "points_in": len(df),
+        "points_out": len(out),
+        "bytes_in": _parquet_bytes(df),
+        "bytes_out": _parquet_bytes(out),
+        "max_error_m": max_error_m(xyz[candidate], keep[candidate], runs[candidate]),
+    }
+    return out, report
+
+
+def _parquet_bytes(df):
+    """Size of df written the way track_store writes it (zstd Parquet)."""
+    buf = io.BytesIO()
+    pq.write_table(to_table(df).drop_columns(["date", "runway"]), buf, compression="zstd")
+    return buf.tell()
+
+
+def format_report(report):
+    saved = report["bytes_in"] - report["bytes_out"]
+    ratio = report["bytes_in"] / max(report["bytes_out"], 1)
+    return (f"{report['points_in']} -> {report['points_out']} points, "
+            f"{report['bytes_in'] / 1e6:.2f} -> {report['bytes_out'] / 1e6:.2f} MB "
+            f"({saved / 1e6:.2f} MB saved, {ratio:.1f}x), max error {report['max_error_m']:.1f} m")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Clip and simplify stored FR24 tracks")
+    parser.add_argument("--input", default=LEGACY_CSV)
+    parser.add_argument("--level", default=DEFAULT_LEVEL, help="bbox_utils level to clip to")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE_M, help="simplification tolerance, m (0 = off)")
+    parser.add_argument("--final-km", type=float, default=FINAL_KM, help="full resolution within this radius")
+    parser.add_argument("--write", action="store_true", help="write the result to the track store")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.input)
+    small, report = shrink_tracks(df, args.level, args.tolerance, args.final_km)
+    print(f"✂️ {format_report(report)}")
+    if args.write:
+        write_tracks(small)
+        print(f"💾 Wrote {len(small)} points to the track store")
+
+
+if __name__ == "__main__":
+    main()
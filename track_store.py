@@ -0,0 +1,209 @@
+import argparse
+import glob
+import os
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+DEFAULT_STORE = "data/track_store"
+LEGACY_CSV = "sfo_landing_paths.csv"
+ROWS_PER_GROUP = 64 * 1024
+
+# Typed layout for track points; anything else in the frame is passed through as-is
+TRACK_TYPES = {
+    "callsign": pa.dictionary(pa.int32(), pa.string()),
+    "lat": pa.float32(),
+    "lon": pa.float32(),
+    "alt": pa.int32(),
+    "timestamp": pa.int64(),  # epoch seconds, UTC
+}
+PARTITIONING = ds.partitioning(
+    pa.schema([("date", pa.string()), ("runway", pa.string())]), flavor="hive"
+)
+
+
+def to_epoch_seconds(ts):
+    """ISO strings / datetimes / epoch numbers -> int64 epoch seconds."""
+    ts = pd.Series(ts)
+    if pd.api.types.is_numeric_dtype(ts):
+        return ts.to_numpy(dtype="int64")
+    parsed = pd.to_datetime(ts, utc=True)
+    return ((parsed - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(seconds=1)).to_numpy(dtype="int64")
+
+
+def to_table(df):
+    """Cast a track-point frame to the store schema and add date/runway partition keys."""
+    df = df.copy()
+    df["timestamp"] = to_epoch_seconds(df["timestamp"])
+    if "runway" not in df.columns:
+        df["runway"] = None
+    df["date"] = pd.to_datetime(df["timestamp"], unit="s", utc=True).dt.strftime("%Y-%m-%d")
+    # time-sorted row groups give tight min/max stats for timestamp pushdown
+    df = df.sort_values("timestamp", kind="stable")
+
+    arrays, names = [], []
+    for col in df.columns:
+        values = df[col]
+        if col == "callsign":
+            arr = pa.array(values.astype("string").to_numpy(na_value=None), pa.string()).dictionary_encode()
+        elif col == "alt":
+            # nullable: a missing altitude must not read as 0 ft (on the ground)
+            arr = pa.array(pd.to_numeric(values).round(), pa.int32(), from_pandas=True)
+        elif col in TRACK_TYPES:
+            arr = pa.array(values.to_numpy(), TRACK_TYPES[col])
+        else:
+            arr = pa.array(values, from_pandas=True)
+        arrays.append(arr)
+        names.append(col)
+    return pa.Table.from_arrays(arrays, names=names)
+
+
+def conform(table, schema):
+    """Cast a to_table() result to a fixed schema (missing columns as nulls), keeping date/runway."""
+    columns = [table.column(f.name).cast(f.type) if f.name in table.column_names else pa.nulls(table.num_rows, f.type)
+               for f in schema]
+    columns += [table.column(k) for k in ("date", "runway")]
+    return pa.Table.from_arrays(columns, names=schema.names + ["date", "runway"])
+
+
+def delete_batch(root, basename):
+    """Remove every file written under `basename`, in any partition."""
+    for path in glob.glob(os.path.join(root, "**", f"{glob.escape(basename)}-*.parquet"), recursive=True):
+        os.remove(path)
+
+
+def write_tracks(df, root=DEFAULT_STORE, basename=None, schema=None):
+    """
+    Append track points as Parquet under root/date=YYYY-MM-DD/runway=XX/.
+
+    A fixed `basename` makes the write idempotent: the batch's previous files
+    are deleted first, so a rewrite never leaves duplicates or stale partitions.
+    `schema` pins the column types (see conform) so every batch of a store
+    agrees, even when a batch has a column that is all null.
+    """
+    if basename is not None:
+        delete_batch(root, basename)
+    if df.empty:
+        return
+    table = to_table(df)
+    if schema is not None:
+        table = conform(table, schema)
+    ds.write_dataset(
+        table,
+        root,
+        format="parquet",
+        partitioning=PARTITIONING,
+        basename_template=f"{basename or 'part-' + uuid.uuid4().hex}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        max_rows_per_group=ROWS_PER_GROUP,
+        min_rows_per_group=min(ROWS_PER_GROUP, table.num_rows),
+    )
+
+
+def drop_stored(df, root=DEFAULT_STORE, keys=("callsign", "timestamp")):
+    """
+    Rows of df whose `keys` are not already in the store (nor repeated in df),
+    so re-running a fetch or fetching overlapping windows appends no duplicates.
+    """
+    if df.empty:
+        return df
+
+    def index(frame):
+        return pd.MultiIndex.from_arrays([to_epoch_seconds(frame[k]) if k == "timestamp" else frame[k].astype(str)
+                                          for k in keys])
+
+    new = index(df)
+    keep = ~new.duplicated()
+    if os.path.isdir(root):
+        t = to_epoch_seconds(df["timestamp"])
+        stored = read_tracks(root, start=int(t.min()), end=int(t.max()) + 1, columns=list(keys))
+        if len(stored):
+            keep &= ~new.isin(index(stored))
+    return df[keep]
+
+
+def _filter(start=None, end=None, bbox=None, runway=None):
+    expr = None
+
+    def conj(e):
+        return e if expr is None else expr & e
+
+    if start is not None:
+        start = int(to_epoch_seconds([start])[0])
+        expr = conj((ds.field("timestamp") >= start)
+                    & (ds.field("date") >= pd.Timestamp(start, unit="s").strftime("%Y-%m-%d")))
+    if end is not None:
+        end = int(to_epoch_seconds([end])[0])
+        expr = conj((ds.field("timestamp") < end)
+                    & (ds.field("date") <= pd.Timestamp(end, unit="s").strftime("%Y-%m-%d")))
+    if bbox is not None:
+        lon_min, lon_max, lat_min, lat_max = bbox  # bbox_utils.get_bbox order
+        expr = conj(
+            (ds.field("lon") >= pc.scalar(np.float32(lon_min)))
+            & (ds.field("lon") <= pc.scalar(np.float32(lon_max)))
+            & (ds.field("lat") >= pc.scalar(np.float32(lat_min)))
+            & (ds.field("lat") <= pc.scalar(np.float32(lat_max)))
+        )
+    if runway is not None:
+        runways = [runway] if isinstance(runway, str) else list(runway)
+        expr = conj(ds.field("runway").isin(runways))
+    return expr
+
+
+def read_tracks(root=DEFAULT_STORE, start=None, end=None, bbox=None, runway=None, columns=None):
+    """
+    Load track points with partition pruning on date/runway and row-group
+    pushdown on timestamp and bbox. `start`/`end` accept anything
+    to_epoch_seconds understands; `bbox` is (lon_min, lon_max, lat_min, lat_max).
+    """
+    dataset = ds.dataset(root, format="parquet", partitioning=PARTITIONING)
+    table = dataset.to_table(columns=columns, filter=_filter(start, end, bbox, runway))
+    return table.to_pandas()
+
+
+def load_tracks(root=DEFAULT_STORE, csv_path=LEGACY_CSV, **filters):
+    """
+    Read from the columnar store if it exists, else fall back to the legacy CSV.
+
+    Both paths return `timestamp` as int64 epoch seconds.
+    """
+    if os.path.isdir(root):
+        return read_tracks(root, **filters)
+    print(f"⚠️ No track store at {root}, reading {csv_path} (run `python track_store.py` to convert)")
+    df = pd.read_csv(csv_path)
+    df["timestamp"] = to_epoch_seconds(df["timestamp"])
+    start, end, bbox = filters.get("start"), filters.get("end"), filters.get("bbox")
+    if start is not None or end is not None:
+        keep = np.ones(len(df), dtype=bool)
+        if start is not None:
+            keep &= df["timestamp"].to_numpy() >= to_epoch_seconds([start])[0]
+        if end is not None:
+            keep &= df["timestamp"].to_numpy() < to_epoch_seconds([end])[0]
+        df = df[keep]
+    if bbox is not None:
+        df = df[df.lon.between(bbox[0], bbox[1]) & df.lat.between(bbox[2], bbox[3])]
+    return df.reset_index(drop=True)
+
+
+def convert_csv(csv_path=LEGACY_CSV, root=DEFAULT_STORE):
+    """One-shot conversion of the monolithic landing-paths CSV into the store."""
+    df = pd.read_csv(csv_path)
+    write_tracks(df, root)
+    print(f"💾 Converted {len(df)} points from {csv_path} -> {root}")
+    return len(df)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the legacy landing-paths CSV into the Parquet track store")
+    parser.add_argument("--csv", default=LEGACY_CSV)
+    parser.add_argument("--store", default=DEFAULT_STORE)
+    args = parser.parse_args()
+    convert_csv(args.csv, args.store)
+
+
+if __name__ == "__main__":
+    main()